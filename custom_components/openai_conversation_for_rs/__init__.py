@@ -3,44 +3,94 @@
 import asyncio
 import json
 import logging
+import time
 import traceback
 import uuid
 from collections.abc import Callable
-from typing import Any
+from typing import Any, Optional
 
-import aiofiles
 import aiohttp
 import netifaces
-import yaml
+import voluptuous as vol
 from homeassistant.components import conversation, mqtt
 from homeassistant.components.automation import DOMAIN as AUTOMATION_DOMAIN
 from homeassistant.config_entries import ConfigEntry
-from homeassistant.const import CONF_API_KEY
+from homeassistant.const import CONF_API_KEY, CONF_ID, SERVICE_RELOAD, Platform
 from homeassistant.core import HomeAssistant, callback
 from homeassistant.helpers import intent
 from homeassistant.helpers.condition import async_from_config
 from homeassistant.helpers.typing import ConfigType
 from openai import AsyncAzureOpenAI
 
-from .chat_manager import ChatManager
+from .automation_store import AutomationStore
+from .chat_history_store import ChatHistoryStore
+from .chat_manager import ChatManager, to_request_dict
+from .circuit_breaker import CircuitBreakers
 from .const import (
+    API_VERSION,
     CACHE_ENDPOINT,
+    CONF_CACHE_FRIENDLY_PROMPT,
+    CONF_CACHE_LOOKUP_BUDGET,
+    CONF_CACHE_SIMILARITY_THRESHOLD,
+    CONF_CHAT_HISTORY_TOKEN_BUDGET,
+    CONF_COMPLETION_BUDGET,
     CONF_DEPLOYMENT_NAME,
+    CONF_ENTITY_RETRIEVAL_TOP_K,
+    CONF_PIPELINE_TOOL_CALLS,
+    CONF_RESPONSE_BUDGET,
+    CONF_SPECULATIVE_COMPLETION,
+    CONF_SPECULATIVE_MAX_HIT_RATE,
+    CONF_STREAM_RESPONSE,
+    CONF_TOOL_CALL_CONCURRENCY,
+    CONF_TOOL_CALL_TIMEOUT,
+    DEFAULT_CACHE_FRIENDLY_PROMPT,
+    DEFAULT_CACHE_LOOKUP_BUDGET,
+    DEFAULT_CACHE_SIMILARITY_THRESHOLD,
+    DEFAULT_CHAT_HISTORY_TOKEN_BUDGET,
+    DEFAULT_COMPLETION_BUDGET,
+    DEFAULT_ENTITY_RETRIEVAL_TOP_K,
+    DEFAULT_PIPELINE_TOOL_CALLS,
+    DEFAULT_RESPONSE_BUDGET,
+    DEFAULT_SPECULATIVE_COMPLETION,
+    DEFAULT_SPECULATIVE_MAX_HIT_RATE,
+    DEFAULT_STREAM_RESPONSE,
+    DEFAULT_TOOL_CALL_CONCURRENCY,
+    DEFAULT_TOOL_CALL_TIMEOUT,
     DOMAIN,
+    ENTITY_RETRIEVAL_FULL_COUNT_INTERVAL,
+    ENTITY_RETRIEVAL_HISTORY_TURNS,
     FIXED_ENDPOINT,
     INIT_CONVERSATION_WORD,
-    PATTERN_ENDPOINT,
     REGISTER_CACHE_ENDPOINT,
     REGISTER_CACHE_WORD,
+    RESPONSE_STREAM_TOPIC,
 )
+from .deadline import Deadline
+from .entity_retriever import EntityRetriever, tool_call_entity_ids
 from .ha_crawler import HaCrawler
-from .message_model import AssistantMessage, SystemMessage, ToolMessage, UserMessage
-from .prompt_generator import GptHaAssistant, PromptGenerator
+from .http_client import EndpointTimings, create_client_session
+from .message_model import (
+    AssistantMessage,
+    AssistantMessageToolCall,
+    SystemMessage,
+    ToolMessage,
+    UserMessage,
+)
+from .pattern_store import UserPatternStore
+from .prompt_generator import ChatRequest, EntitiesPromptRenderer, GptHaAssistant, PromptGenerator
 from .prompt_manager import PromptManager
+from .response_cache import LocalResponseCache
+from .speculation import SideEffectGate, Speculation
+from .stats import DeadlineStats, EntityRetrievalStats, PromptCacheStats, SpeculationStats
+from .token_counter import TokenCounter
+from .tool_call_scheduler import ToolCallResult, ToolCallScheduler
 
 _LOGGER = logging.getLogger(__name__)
 _LOGGER.setLevel(logging.DEBUG)
 SYSTEM_MAC_ADDRESS = netifaces.ifaddresses("end0")[netifaces.AF_PACKET][0]["addr"]
+PLATFORMS = [Platform.SENSOR]
+COMMAND_SENT_MESSAGE = "요청하신 명령을 전송했습니다."
+RESPONSE_TIMEOUT_MESSAGE = "응답이 지연되고 있습니다. 잠시 후 다시 시도해주세요."
 
 
 async def async_setup(hass: HomeAssistant, config: ConfigType) -> bool:
@@ -51,35 +101,129 @@ async def async_setup(hass: HomeAssistant, config: ConfigType) -> bool:
 
 async def async_setup_entry(hass: HomeAssistant, entry: ConfigEntry) -> bool:
     """Set up Azure OpenAI from a config entry."""
-    client = AsyncAzureOpenAI(
-        api_key=entry.data[CONF_API_KEY], api_version="2024-08-01-preview", azure_endpoint=FIXED_ENDPOINT
-    )
-    hass.data[DOMAIN][entry.entry_id] = client
-    agent = AzureOpenAIAgent(hass, entry, client)
+    client = AsyncAzureOpenAI(api_key=entry.data[CONF_API_KEY], api_version=API_VERSION, azure_endpoint=FIXED_ENDPOINT)
+    endpoint_timings = EndpointTimings()
+    session = create_client_session(endpoint_timings)
+    agent = None
+    try:
+        agent = AzureOpenAIAgent(hass, entry, client, session, endpoint_timings)
+        agent.ha_crawler.async_start()
+        agent.pattern_store.async_start([SYSTEM_MAC_ADDRESS])
+        await agent.response_cache.async_load()
+        await agent.token_counter.async_load(hass)
+    except Exception:
+        # 설정이 실패하면 unload가 호출되지 않으므로 시작한 작업과 세션을 여기서 정리
+        await _async_stop_agent(agent, session)
+        raise
+
+    hass.data[DOMAIN][entry.entry_id] = {"client": client, "session": session, "agent": agent}
     conversation.async_set_agent(hass, entry, agent)
+    await hass.config_entries.async_forward_entry_setups(entry, PLATFORMS)
+    entry.async_on_unload(entry.add_update_listener(async_update_options))
     return True
 
 
+async def async_update_options(hass: HomeAssistant, entry: ConfigEntry) -> None:
+    """Reload the config entry when its options change."""
+    await hass.config_entries.async_reload(entry.entry_id)
+
+
 async def async_unload_entry(hass: HomeAssistant, entry: ConfigEntry) -> bool:
     """Unload a config entry."""
+    if not await hass.config_entries.async_unload_platforms(entry, PLATFORMS):
+        return False
+
     conversation.async_unset_agent(hass, entry)
-    hass.data[DOMAIN].pop(entry.entry_id)
+    entry_data = hass.data[DOMAIN].pop(entry.entry_id)
+    await entry_data["agent"].response_cache.async_save()
+    await entry_data["agent"].chat_history_store.async_save_all()
+    await _async_stop_agent(entry_data["agent"], entry_data["session"])
     return True
 
 
+async def _async_stop_agent(agent: Optional["AzureOpenAIAgent"], session: aiohttp.ClientSession) -> None:
+    """Stop the background work of an agent, then close the client session it uses."""
+    if agent is not None:
+        agent.ha_crawler.async_stop()
+        # 진행 중인 패턴 갱신이 취소된 뒤에 세션을 닫음
+        await agent.pattern_store.async_stop()
+    await session.close()
+
+
 class AzureOpenAIAgent(conversation.AbstractConversationAgent):
     """Azure OpenAI conversation agent."""
 
-    def __init__(self, hass: HomeAssistant, entry: ConfigEntry, client: AsyncAzureOpenAI) -> None:
+    def __init__(
+        self,
+        hass: HomeAssistant,
+        entry: ConfigEntry,
+        client: AsyncAzureOpenAI,
+        session: aiohttp.ClientSession,
+        endpoint_timings: EndpointTimings,
+    ) -> None:
         """Initialize the agent."""
         self.hass = hass
         self.entry = entry
         self.client = client
+        self.session = session
+        self.endpoint_timings = endpoint_timings
         self.history = []
         self.deployment_name = entry.data[CONF_DEPLOYMENT_NAME]
         self.ha_crawler = HaCrawler(hass)
+        self.prompt_generator = PromptGenerator(
+            entities_renderer=EntitiesPromptRenderer(),
+            entities_overview_renderer=EntitiesPromptRenderer(include_state=False),
+        )
         self.prompt_manager = PromptManager(entry.entry_id)
+        self.circuit_breakers = CircuitBreakers()
+        self.pattern_store = UserPatternStore(
+            hass, session, entry.data[CONF_API_KEY], endpoint_timings, self.circuit_breakers
+        )
         self.hass_api_handler = HassApiHandler(hass)
+        self.tool_call_scheduler = ToolCallScheduler(
+            hass,
+            self.hass_api_handler,
+            max_concurrency=entry.options.get(CONF_TOOL_CALL_CONCURRENCY, DEFAULT_TOOL_CALL_CONCURRENCY),
+            timeout=entry.options.get(CONF_TOOL_CALL_TIMEOUT, DEFAULT_TOOL_CALL_TIMEOUT),
+        )
+        self.response_cache = LocalResponseCache(
+            hass,
+            entry.entry_id,
+            similarity_threshold=entry.options.get(CONF_CACHE_SIMILARITY_THRESHOLD, DEFAULT_CACHE_SIMILARITY_THRESHOLD),
+        )
+        self.stream_response = entry.options.get(CONF_STREAM_RESPONSE, DEFAULT_STREAM_RESPONSE)
+        self.pipeline_tool_calls = entry.options.get(CONF_PIPELINE_TOOL_CALLS, DEFAULT_PIPELINE_TOOL_CALLS)
+        self.chat_history_token_budget = entry.options.get(
+            CONF_CHAT_HISTORY_TOKEN_BUDGET, DEFAULT_CHAT_HISTORY_TOKEN_BUDGET
+        )
+        self.token_counter = TokenCounter()
+        self.chat_history_store = ChatHistoryStore(hass, entry.entry_id, self.token_counter)
+        self.cache_friendly_prompt = entry.options.get(CONF_CACHE_FRIENDLY_PROMPT, DEFAULT_CACHE_FRIENDLY_PROMPT)
+        self.prompt_cache_stats = PromptCacheStats()
+        self.speculative_completion = entry.options.get(CONF_SPECULATIVE_COMPLETION, DEFAULT_SPECULATIVE_COMPLETION)
+        self.speculative_max_hit_rate = entry.options.get(
+            CONF_SPECULATIVE_MAX_HIT_RATE, DEFAULT_SPECULATIVE_MAX_HIT_RATE
+        )
+        self.speculation_stats = SpeculationStats()
+        self.response_budget = entry.options.get(CONF_RESPONSE_BUDGET, DEFAULT_RESPONSE_BUDGET)
+        self.cache_lookup_budget = entry.options.get(CONF_CACHE_LOOKUP_BUDGET, DEFAULT_CACHE_LOOKUP_BUDGET)
+        self.completion_budget = entry.options.get(CONF_COMPLETION_BUDGET, DEFAULT_COMPLETION_BUDGET)
+        self.deadline_stats = DeadlineStats()
+        self.entity_retrieval_top_k = entry.options.get(CONF_ENTITY_RETRIEVAL_TOP_K, DEFAULT_ENTITY_RETRIEVAL_TOP_K)
+        self.entity_retriever = EntityRetriever()
+        self.entity_retrieval_stats = EntityRetrievalStats()
+        # (스냅샷 리스트, 센 시각, 전체 엔티티 프롬프트의 토큰 수)
+        self._full_entities_tokens: Optional[tuple[list, float, int]] = None
+        # 요청마다 만들지 않고 엔트리 동안 재사용, 요청별 값은 chat 호출 인자로 전달
+        self.gpt_ha_assistant = GptHaAssistant(
+            deployment_name=self.deployment_name,
+            init_prompt=self.prompt_manager.get_init_prompt(),
+            ha_automation_script=self.prompt_manager.get_ha_automation_script(),
+            tool_prompts=[self.prompt_generator.tool],
+            client=client,
+            token_counter=self.token_counter,
+        )
+        self.last_time_to_first_token = None
 
     def _format_ha_context(self, ha_states: dict) -> str:
         """Format Home Assistant context for the prompt."""
@@ -94,6 +238,16 @@ class AzureOpenAIAgent(conversation.AbstractConversationAgent):
 
         return context
 
+    @callback
+    def _record_usage(self, usage, elapsed: float) -> None:
+        """Record the prompt token usage of a completion."""
+        self.prompt_cache_stats.record(usage, elapsed)
+        _LOGGER.info(
+            "prompt tokens: %d, cached: %d",
+            self.prompt_cache_stats.last_prompt_tokens,
+            self.prompt_cache_stats.last_cached_tokens,
+        )
+
     @property
     def supported_languages(self) -> list[str]:
         """Return a list of supported languages."""
@@ -102,11 +256,17 @@ class AzureOpenAIAgent(conversation.AbstractConversationAgent):
     async def async_process(self, user_input: conversation.ConversationInput) -> conversation.ConversationResult:
         """Process a sentence."""
         response_text = ""
+        # 스트리밍 중에 미리 실행한 tool call, tool_call.id -> (tool call, task)
+        started_tool_calls: dict[str, tuple[AssistantMessageToolCall, asyncio.Task[ToolCallResult]]] = {}
+        speculation: Optional[Speculation] = None
+        lookup_ms = 0.0
+        # 발화 하나의 전체 응답 시간 예산, 각 단계는 남은 시간 안에서 실행
+        deadline = Deadline(self.response_budget, self.deadline_stats)
         try:
             # Get current HA states
             try:
                 ha_states = self.ha_crawler.get_ha_states()
-                ha_services = self.ha_crawler.get_services()
+                services_catalog = self.ha_crawler.get_services_catalog()
                 context = self._format_ha_context(ha_states)
 
             except Exception as err:
@@ -114,15 +274,7 @@ class AzureOpenAIAgent(conversation.AbstractConversationAgent):
                 _LOGGER.error("Traceback: %s", traceback.format_exc())
                 context = "Unable to fetch current home state."
 
-            speaker_id = SYSTEM_MAC_ADDRESS
-            if user_input.text:
-                user_input_text = user_input.text.split("||")
-                if len(user_input_text) == 2:
-                    user_input.text = user_input_text[1]
-                    speaker_id = user_input_text[0]
-                # Remove trailing period
-                if user_input.text.endswith("."):
-                    user_input.text = user_input.text[:-1]
+            speaker_id = self._parse_speaker_id(user_input)
 
             _LOGGER.info("speaker_id: %s", speaker_id)
             _LOGGER.info("input_text: %s", user_input.text)
@@ -130,7 +282,9 @@ class AzureOpenAIAgent(conversation.AbstractConversationAgent):
             # TODO show speaker recognition for demo, have to remove after demo
             self.hass.async_create_task(self._publish_speaker_status(speaker_id[-2:], user_input.text))
 
-            chat_manager = ChatManager(speaker_id)
+            # 저장된 대화 기록을 미리 메모리에 올려두고, 이후에는 메모리에서만 읽음
+            await self.chat_history_store.async_load(speaker_id)
+            chat_manager = ChatManager(speaker_id, self.chat_history_store, token_budget=self.chat_history_token_budget)
             if user_input.text == INIT_CONVERSATION_WORD:
                 chat_manager.reset_messages()
                 intent_response = intent.IntentResponse(language=user_input.language)
@@ -139,93 +293,42 @@ class AzureOpenAIAgent(conversation.AbstractConversationAgent):
             chat_manager.add_message(UserMessage(content=user_input.text))
 
             # Check to cache, when user_input.text is hitted.
-            cached_response, speaker_patterns = await asyncio.gather(
-                self.send_cache_request(speaker_id, user_input.text), self.send_pattern_request(SYSTEM_MAC_ADDRESS)
-            )
+            # 로컬 캐시에 있으면 네트워크 호출 없이 바로 응답
+            cached_response = self.response_cache.get(speaker_id, user_input.text)
             if cached_response:
-                _LOGGER.info("cached_response: %s", cached_response)
-                if not cached_response.get("role"):  # role은 필수 필드
-                    raise RuntimeError("Missing required 'role' field in cached response Data")
-
-                if REGISTER_CACHE_WORD in cached_response.get("content", ""):
-                    # 캐시 등록 요청인 경우, 최근 5개의 메시지를 확인하여 AssistantMessage/UserMessage의 pair를 찾아야함.
-                    _LOGGER.info(chat_manager.get_messages()[-5:-1])
-                    last_messages = chat_manager.get_messages()[-5:-1]
-                    content = ""
-                    tool_calls = []
-                    command_text = ""
-                    found_asisst = False
-                    for last_message in reversed(last_messages):
-                        if isinstance(last_message, AssistantMessage):
-                            content = last_message.content
-                            tool_calls = last_message.tool_calls
-                            found_asisst = True
-                        if isinstance(last_message, UserMessage) and found_asisst:
-                            command_text = last_message.content
-                            break
-                    if command_text:
-                        _LOGGER.info(
-                            "%s: %s, tool_calls: %s", command_text, content, [call.to_dict() for call in tool_calls]
-                        )
-                        cached_response["content"] = f"{command_text} 를 캐쉬로 등록하였습니다"
-                        tool_calls_list = [call.to_dict() for call in tool_calls]
-                        await self.send_register_cache_request(speaker_id, content, tool_calls_list, command_text)
-                    else:
-                        cached_response["content"] = "이전 제어 명령어를 찾을 수 없습니다"
-
-                assistant_message = AssistantMessage(**cached_response)
-
+                _LOGGER.info("local cache hit: %s", user_input.text)
             else:
-                chat_manager = ChatManager(speaker_id)
-                prompt_generator = PromptGenerator(ha_states, ha_services)
-                system_datetime_prompt = prompt_generator.get_datetime_prompt()
-                system_entities_prompt = prompt_generator.get_entities_system_prompt()
-                system_services_prompt = prompt_generator.get_services_system_prompt()
-
-                user_pattern_prompt = self.prompt_manager.get_user_pattern_prompt()
-                demo_user_pattern_prompt = self.prompt_manager.get_user_pattern_demo()
-                user_pattern = (
-                    "\n".join(f"- {pattern}" for pattern in speaker_patterns)
-                    if speaker_patterns
-                    else demo_user_pattern_prompt
+                if self._should_speculate(speaker_id, user_input.text):
+                    # 원격 캐시 조회와 동시에 completion을 시작, 부수 효과는 캐시 미스가 확인될 때까지 보류
+                    speculation = self._start_speculation(
+                        speaker_id, chat_manager, ha_states, services_catalog, user_input.text, started_tool_calls
+                    )
+                lookup_start = time.perf_counter()
+                cached_response = await self._async_lookup_remote_cache(speaker_id, user_input.text, deadline)
+                lookup_ms = (time.perf_counter() - lookup_start) * 1000
+            if cached_response:
+                _LOGGER.info("cached_response: %s", cached_response)
+                if speculation is not None:
+                    self._cancel_speculation(speculation)
+                    speculation = None
+                assistant_message = await self._async_cached_message(
+                    speaker_id, chat_manager, cached_response, deadline
                 )
-                user_pattern_prompt = user_pattern_prompt.replace("[User Patterns]", user_pattern)
-
-                gpt_ha_assistant = GptHaAssistant(
-                    deployment_name=self.deployment_name,
-                    init_prompt=self.prompt_manager.get_init_prompt(),
-                    ha_automation_script=self.prompt_manager.get_ha_automation_script(),
-                    user_pattern_prompt=user_pattern_prompt,
-                    tool_prompts=[prompt_generator.get_tool()],
-                    client=self.client,
+            else:
+                # 캐시 미스이므로 미리 시작한 completion은 여기서 넘겨주고, 이후 실패해도 취소하지 않음
+                pending_speculation, speculation = speculation, None
+                assistant_message = await self._async_generate_message(
+                    speaker_id,
+                    chat_manager,
+                    ha_states,
+                    services_catalog,
+                    user_input.text,
+                    started_tool_calls,
+                    deadline,
+                    pending_speculation,
+                    lookup_ms,
                 )
 
-                chat_manager.add_message(SystemMessage(**system_datetime_prompt))
-                # chat_manager.add_message(SystemMessage(**system_entities_prompt))
-                # chat_manager.add_message(SystemMessage(**system_services_prompt))
-
-                chat_input_messages = chat_manager.get_chat_input()
-                chat_input_messages.append(system_entities_prompt)
-                chat_input_messages.append(system_services_prompt)
-
-                for i in range(len(chat_input_messages)):
-                    chat_input_message = chat_input_messages[i]
-                    if chat_input_message.get("role") == "system":
-                        _LOGGER.info("chat_input_messages-%s: %s", i, f"SYSTEM PROMPT.{chat_input_message.get('name')}")
-                    else:
-                        _LOGGER.info("chat_input_messages-%s: %s", i, chat_input_messages[i])
-
-                chat_response = await gpt_ha_assistant.chat(chat_input_messages)
-                _LOGGER.info("chat_response: %s", chat_response)
-
-                assistant_message = AssistantMessage()
-                if isinstance(chat_response, str):
-                    # Handle string response
-                    assistant_message = AssistantMessage(content=chat_response, role="assistant")
-                elif chat_response and hasattr(chat_response, "choices") and isinstance(chat_response.choices, list):
-                    response_message = chat_response.choices[0].message
-                    assistant_message = AssistantMessage(**response_message.to_dict())
-
             call_service_count = 0
 
             if assistant_message.content:
@@ -233,16 +336,19 @@ class AzureOpenAIAgent(conversation.AbstractConversationAgent):
 
             tool_messages = []
             if tool_calls := assistant_message.tool_calls:
-                for tool_call in tool_calls:
-                    call_service_count += 1
-                    _LOGGER.info("tool_call: %s", tool_call)
-                    api_call = tool_call.function.arguments
-                    _LOGGER.info("api_call: %s", api_call)
+                call_service_count = len(tool_calls)
+                tool_messages, tool_calls_degraded = await self._async_run_tool_calls(
+                    tool_calls, started_tool_calls, deadline
+                )
+                if tool_calls_degraded:
+                    # 끝나지 않은 호출은 백그라운드에서 계속 실행하고 전송했다고 응답
+                    response_text = response_text or COMMAND_SENT_MESSAGE
 
-                    tool_call_result: bool = await self.hass_api_handler.process_api_call(tool_call.function)
-                    tool_call_message_content = "Success" if tool_call_result else "Failed"
-                    tool_message = ToolMessage(tool_call_id=tool_call.id, content=tool_call_message_content)
-                    tool_messages.append(tool_message)
+            if started_tool_calls:
+                # 응답 오류 등으로 결과가 메시지에 반영되지 않은 tool call은 남은 시간 동안 기다리고, 나머지는 백그라운드에서 실행
+                if remaining := deadline.remaining():
+                    await asyncio.wait([task for _, task in started_tool_calls.values()], timeout=remaining)
+                started_tool_calls.clear()
 
             chat_manager.add_message(assistant_message)
             for tool_message in tool_messages:
@@ -260,9 +366,14 @@ class AzureOpenAIAgent(conversation.AbstractConversationAgent):
                 self.hass.async_create_task(
                     self._publish_speaker_status(speaker_id[-2:], user_input.text, response_text)
                 )
+            self.deadline_stats.record_request(deadline.degraded)
             return conversation.ConversationResult(response=intent_response, conversation_id=user_input.conversation_id)
 
         except Exception as err:
+            if speculation is not None:
+                self._cancel_speculation(speculation)
+            if started_tool_calls:
+                await asyncio.gather(*(task for _, task in started_tool_calls.values()), return_exceptions=True)
             _LOGGER.error("Error processing with Azure OpenAI GPT-4-mini: %s", err)
             _LOGGER.error("user_input.text: %s", user_input.text)
             _LOGGER.error("Traceback: %s", traceback.format_exc())
@@ -273,6 +384,209 @@ class AzureOpenAIAgent(conversation.AbstractConversationAgent):
             )
             return conversation.ConversationResult(response=intent_response, conversation_id=self.entry.entry_id)
 
+    @staticmethod
+    def _parse_speaker_id(user_input: conversation.ConversationInput) -> str:
+        """Split the speaker_id off the input text and strip the trailing period.
+
+        Returns:
+            str: speaker_id prefixed to the text as "<speaker_id>||<text>", or the system MAC address
+
+        """
+        speaker_id = SYSTEM_MAC_ADDRESS
+        if user_input.text:
+            user_input_text = user_input.text.split("||")
+            if len(user_input_text) == 2:
+                user_input.text = user_input_text[1]
+                speaker_id = user_input_text[0]
+            # Remove trailing period
+            if user_input.text.endswith("."):
+                user_input.text = user_input.text[:-1]
+        return speaker_id
+
+    async def _async_lookup_remote_cache(self, speaker_id: str, text: str, deadline: Deadline) -> Optional[dict]:
+        """Look up the remote cache within its budget and keep a hit in the local cache."""
+        # 시간 안에 응답이 없으면 원격 캐시를 건너뛰고 캐시 미스로 처리
+        cached_response = await deadline.async_run(
+            "cache", self.send_cache_request(speaker_id, text), self.cache_lookup_budget
+        )
+        self.speculation_stats.record_lookup(speaker_id, bool(cached_response))
+        if cached_response and cached_response.get("role"):
+            self.response_cache.set(speaker_id, text, cached_response)
+        return cached_response
+
+    async def _async_cached_message(
+        self, speaker_id: str, chat_manager: ChatManager, cached_response: dict, deadline: Deadline
+    ) -> AssistantMessage:
+        """Turn a cached response into the assistant message, registering the previous command if requested."""
+        if not cached_response.get("role"):  # role은 필수 필드
+            raise RuntimeError("Missing required 'role' field in cached response Data")
+
+        if REGISTER_CACHE_WORD in cached_response.get("content", ""):
+            await self._async_register_previous_command(speaker_id, chat_manager, cached_response, deadline)
+
+        return AssistantMessage.from_dict(cached_response)
+
+    async def _async_register_previous_command(
+        self, speaker_id: str, chat_manager: ChatManager, cached_response: dict, deadline: Deadline
+    ) -> None:
+        """Register the previous command and its answer in the remote and local caches."""
+        # 캐시 등록 요청인 경우, 최근 5개의 메시지를 확인하여 AssistantMessage/UserMessage의 pair를 찾아야함.
+        _LOGGER.info(chat_manager.get_messages()[-5:-1])
+        last_messages = chat_manager.get_messages()[-5:-1]
+        content = ""
+        tool_calls = []
+        command_text = ""
+        found_asisst = False
+        for last_message in reversed(last_messages):
+            if isinstance(last_message, AssistantMessage):
+                content = last_message.content
+                tool_calls = last_message.tool_calls
+                found_asisst = True
+            if isinstance(last_message, UserMessage) and found_asisst:
+                command_text = last_message.content
+                break
+        if not command_text:
+            cached_response["content"] = "이전 제어 명령어를 찾을 수 없습니다"
+            return
+
+        _LOGGER.info("%s: %s, tool_calls: %s", command_text, content, [call.to_dict() for call in tool_calls])
+        cached_response["content"] = f"{command_text} 를 캐쉬로 등록하였습니다"
+        tool_calls_list = [call.to_dict() for call in tool_calls]
+        await deadline.async_run(
+            "register_cache",
+            self.send_register_cache_request(speaker_id, content, tool_calls_list, command_text),
+            self.cache_lookup_budget,
+        )
+        self.response_cache.set(
+            speaker_id,
+            command_text,
+            {"role": "assistant", "content": content, "tool_calls": tool_calls_list},
+        )
+
+    async def _async_generate_message(
+        self,
+        speaker_id: str,
+        chat_manager: ChatManager,
+        ha_states: dict,
+        services_catalog,
+        user_text: str,
+        started_tool_calls: dict[str, tuple[AssistantMessageToolCall, asyncio.Task[ToolCallResult]]],
+        deadline: Deadline,
+        speculation: Optional[Speculation] = None,
+        lookup_ms: float = 0.0,
+    ) -> AssistantMessage:
+        """Generate the assistant message with a chat completion on a cache miss.
+
+        Args:
+            speaker_id: speaker the streamed sentences are published for
+            chat_manager: chat history of the speaker
+            ha_states: Home Assistant states from HaCrawler.get_ha_states
+            services_catalog: ServicesCatalog from HaCrawler.get_services_catalog
+            user_text: user input
+            started_tool_calls: tool calls started while streaming, filled by the dispatcher
+            deadline: deadline of the utterance
+            speculation: completion started while the remote cache was looked up, used instead of a new one
+            lookup_ms: time the remote cache lookup took, saved by the speculation
+
+        """
+        if speculation is not None:
+            # 미리 시작한 completion을 사용하고, 보류한 스트리밍 콜백을 이어서 실행
+            chat_request = speculation.request
+            speculation.gate.open()
+            completion = speculation.task
+        else:
+            chat_request = self._build_chat_request(chat_manager, ha_states, services_catalog, user_text)
+            completion = self._async_complete(speaker_id, chat_request, started_tool_calls)
+        if chat_request.entity_retrieval is not None:
+            # 토큰 절약량은 응답을 기다리는 동안 셈, 취소된 추측 completion은 기록하지 않음
+            self.hass.loop.call_soon(self._record_entity_retrieval, *chat_request.entity_retrieval)
+        chat_response = await deadline.async_run("completion", completion, self.completion_budget)
+        if speculation is not None:
+            self.speculation_stats.record_saved(lookup_ms)
+        if chat_request.history_message is not None:
+            chat_manager.add_message(chat_request.history_message)
+        _LOGGER.info("chat_response: %s", chat_response)
+
+        assistant_message = self._to_assistant_message(chat_response, started_tool_calls)
+        if chat_request.entity_ids is not None:
+            # 실제 tool call에 쓰인 엔티티가 프롬프트에 포함되었는지 기록
+            used_entity_ids = {
+                entity_id
+                for tool_call in assistant_message.tool_calls
+                for entity_id in tool_call_entity_ids(tool_call.function)
+            }
+            self.entity_retrieval_stats.record_usage(used_entity_ids, chat_request.entity_ids)
+        return assistant_message
+
+    @staticmethod
+    def _to_assistant_message(
+        chat_response, started_tool_calls: dict[str, tuple[AssistantMessageToolCall, asyncio.Task[ToolCallResult]]]
+    ) -> AssistantMessage:
+        """Convert a chat completion result into an assistant message."""
+        if chat_response is None:
+            # 시간 초과, 스트리밍 중 이미 보낸 명령이 있으면 전송했다고 응답
+            return AssistantMessage(content=COMMAND_SENT_MESSAGE if started_tool_calls else RESPONSE_TIMEOUT_MESSAGE)
+        if isinstance(chat_response, str):
+            # Handle string response
+            return AssistantMessage(content=chat_response, role="assistant")
+        if isinstance(chat_response, dict) and chat_response.get("role") == "assistant":
+            # Handle streamed response, reusing the tool calls that are already running
+            if started_tool_calls and "tool_calls" in chat_response:
+                chat_response["tool_calls"] = [
+                    started_tool_calls[tool_call["id"]][0] if tool_call["id"] in started_tool_calls else tool_call
+                    for tool_call in chat_response["tool_calls"]
+                ]
+            return AssistantMessage.from_dict(chat_response)
+        if chat_response and hasattr(chat_response, "choices") and isinstance(chat_response.choices, list):
+            response_message = chat_response.choices[0].message
+            return AssistantMessage.from_dict(response_message.to_dict())
+        return AssistantMessage()
+
+    async def _async_run_tool_calls(
+        self,
+        tool_calls: list[AssistantMessageToolCall],
+        started_tool_calls: dict[str, tuple[AssistantMessageToolCall, asyncio.Task[ToolCallResult]]],
+        deadline: Deadline,
+    ) -> tuple[list[ToolMessage], bool]:
+        """Run the tool calls of the assistant message within the time left.
+
+        Returns:
+            tuple: the tool messages in tool_call order, and True if some tool calls were still running
+
+        """
+        for tool_call in tool_calls:
+            _LOGGER.info("tool_call: %s", tool_call)
+
+        # 스트리밍 중 시작하지 않은 호출은 같은 서비스끼리 묶어서 실행
+        pending_tool_calls = [tool_call for tool_call in tool_calls if tool_call.id not in started_tool_calls]
+        pending_tasks = dict(
+            zip(
+                [tool_call.id for tool_call in pending_tool_calls],
+                self.tool_call_scheduler.submit_all(pending_tool_calls),
+            )
+        )
+        tool_call_tasks = [
+            started_tool_calls.pop(tool_call.id)[1]
+            if tool_call.id in started_tool_calls
+            else pending_tasks[tool_call.id]
+            for tool_call in tool_calls
+        ]
+
+        # 독립적인 서비스 호출은 동시에 실행하고 결과는 tool_call 순서대로 모음
+        tool_calls_start = time.perf_counter()
+        tool_call_results = await self.tool_call_scheduler.async_gather(
+            tool_call_tasks,
+            timeout=deadline.remaining(),
+            tool_call_ids=[tool_call.id for tool_call in tool_calls],
+        )
+        tool_calls_degraded = any(result.pending for result in tool_call_results)
+        deadline.record("tool_calls", time.perf_counter() - tool_calls_start, tool_calls_degraded)
+        tool_messages = [
+            ToolMessage(tool_call_id=tool_call.id, content=tool_call_result.message_content)
+            for tool_call, tool_call_result in zip(tool_calls, tool_call_results)
+        ]
+        return tool_messages, tool_calls_degraded
+
     async def _publish_speaker_status(self, speaker_id: str, message: str, response: str = "") -> None:
         """Publish speaker status to MQTT."""
         payload = {"current": speaker_id, "message": message, "response": response}
@@ -282,24 +596,215 @@ class AzureOpenAIAgent(conversation.AbstractConversationAgent):
             self.hass, topic="home/speaker/status", payload=json.dumps(payload), qos=0, retain=False
         )
 
+    def _build_chat_request(
+        self, chat_manager: ChatManager, ha_states: dict, services_catalog, user_text: str
+    ) -> ChatRequest:
+        """Build the messages and arguments of a chat completion without changing the chat history."""
+        prompt_generator = self.prompt_generator
+        prefix_prompts = []
+        history_message = None
+        entity_retrieval = None
+        # 패턴은 메모리에서 바로 읽고, 오래되었으면 백그라운드에서 갱신
+        user_pattern_prompt = self.pattern_store.get_prompt(
+            SYSTEM_MAC_ADDRESS,
+            self.prompt_manager.get_user_pattern_prompt(),
+            self.prompt_manager.get_user_pattern_demo(),
+        )
+
+        chat_input_messages = chat_manager.get_chat_input()
+        # 기록의 토큰 수는 메시지를 추가할 때 이미 셌으므로, 이번 요청에만 붙는 메시지만 None으로 두고 자를 때 셈
+        message_tokens = chat_manager.get_chat_input_tokens()
+        if self.cache_friendly_prompt:
+            # 잘 바뀌지 않는 서비스 목록과 상태 없는 엔티티 목록을 init prompt 바로 뒤에 두어 prompt cache 재사용
+            prefix_prompts = [
+                prompt_generator.get_services_system_prompt(services_catalog),
+                prompt_generator.get_entities_overview_prompt(ha_states),
+            ]
+            # 시간과 현재 상태는 기록에 남기지 않고 현재 user turn 바로 앞에만 둠
+            chat_input_messages.insert(len(chat_input_messages) - 1, prompt_generator.get_live_states_prompt(ha_states))
+            message_tokens.insert(len(message_tokens) - 1, None)
+        else:
+            history_message = SystemMessage(**prompt_generator.get_datetime_prompt(ha_states))
+            chat_input_messages.append(to_request_dict(history_message))
+            if self.entity_retrieval_top_k:
+                entities_prompt, entities = self._retrieve_entities_prompt(chat_manager, ha_states, user_text)
+                entity_retrieval = (ha_states, entities, entities_prompt)
+            else:
+                entities_prompt = prompt_generator.get_entities_system_prompt(ha_states)
+            chat_input_messages.append(entities_prompt)
+            chat_input_messages.append(prompt_generator.get_services_system_prompt(services_catalog))
+            message_tokens.extend([None] * (len(chat_input_messages) - len(message_tokens)))
+
+        for i in range(len(chat_input_messages)):
+            chat_input_message = chat_input_messages[i]
+            if chat_input_message.get("role") == "system":
+                _LOGGER.info("chat_input_messages-%s: %s", i, f"SYSTEM PROMPT.{chat_input_message.get('name')}")
+            else:
+                _LOGGER.info("chat_input_messages-%s: %s", i, chat_input_messages[i])
+
+        chat_kwargs = {
+            "user_pattern_prompt": user_pattern_prompt,
+            "prefix_prompts": prefix_prompts,
+            "on_usage": self._record_usage,
+            "message_tokens": message_tokens,
+        }
+        entity_ids = None if entity_retrieval is None else {entity["entity_id"] for entity in entity_retrieval[1]}
+        return ChatRequest(chat_input_messages, chat_kwargs, history_message, entity_ids, entity_retrieval)
+
+    def _retrieve_entities_prompt(
+        self, chat_manager: ChatManager, ha_states: dict, user_text: str
+    ) -> tuple[dict, list[dict]]:
+        """Build the entities system prompt from the entities relevant to the user input.
+
+        Returns:
+            tuple: the prompt message and the entities it contains
+
+        """
+        # 이전 턴에서 제어한 엔티티는 "그거 꺼줘" 같은 후속 요청을 위해 항상 포함
+        recent_entity_ids = set()
+        user_turns = 0
+        for message in reversed(chat_manager.get_messages()):
+            if isinstance(message, UserMessage):
+                user_turns += 1
+                if user_turns > ENTITY_RETRIEVAL_HISTORY_TURNS:
+                    break
+            elif isinstance(message, AssistantMessage):
+                for tool_call in message.tool_calls:
+                    recent_entity_ids.update(tool_call_entity_ids(tool_call.function))
+
+        entities = self.entity_retriever.retrieve(
+            ha_states["entities"], user_text, self.entity_retrieval_top_k, always_include=recent_entity_ids
+        )
+        if entities is ha_states["entities"]:
+            # 관련 엔티티를 찾지 못하면 스냅샷마다 한 번만 렌더링되는 전체 프롬프트를 보냄
+            prompt_message = self.prompt_generator.get_entities_system_prompt(ha_states)
+        else:
+            prompt_message = self.prompt_generator.get_entities_system_prompt(ha_states, entities)
+
+        _LOGGER.debug("Sending %d of %d entities", len(entities), len(ha_states["entities"]))
+        return prompt_message, entities
+
+    @callback
+    def _record_entity_retrieval(self, ha_states: dict, entities: list[dict], prompt_message: dict) -> None:
+        """Record the prompt tokens saved by entity retrieval for one request."""
+        snapshot = ha_states["entities"]
+        memo = self._full_entities_tokens
+        now = time.monotonic()
+        if memo is None or (memo[0] is not snapshot and now - memo[1] >= ENTITY_RETRIEVAL_FULL_COUNT_INTERVAL):
+            # 스냅샷이 바뀌어도 간격 안에서는 이전 토큰 수를 재사용(상태만 바뀌면 토큰 수는 거의 같음)
+            full_prompt = self.prompt_generator.get_entities_system_prompt(ha_states)
+            memo = self._full_entities_tokens = (snapshot, now, self.token_counter.count_text(full_prompt["content"]))
+
+        full_tokens = memo[2]
+        sent_tokens = full_tokens if entities is snapshot else self.token_counter.count_text(prompt_message["content"])
+        self.entity_retrieval_stats.record_retrieval(len(snapshot), len(entities), full_tokens, sent_tokens)
+
+    async def _async_complete(
+        self,
+        speaker_id: str,
+        chat_request: ChatRequest,
+        started_tool_calls: dict[str, tuple[AssistantMessageToolCall, asyncio.Task[ToolCallResult]]],
+        gate: Optional[SideEffectGate] = None,
+    ):
+        """Run the chat completion, streaming it if enabled.
+
+        Args:
+            speaker_id: speaker the streamed sentences are published for
+            chat_request: messages and arguments from _build_chat_request
+            started_tool_calls: tool calls started while streaming, filled by the dispatcher
+            gate: holds back the streamed sentences and tool calls of a speculative completion until it is used
+
+        """
+        if not self.stream_response:
+            return await self.gpt_ha_assistant.chat(chat_request.messages, **chat_request.kwargs)
+
+        on_sentence = self._make_sentence_publisher(speaker_id)
+        on_tool_call = self._make_tool_call_dispatcher(started_tool_calls) if self.pipeline_tool_calls else None
+        if gate is not None:
+            on_sentence, on_tool_call = gate.wrap(on_sentence), gate.wrap(on_tool_call)
+
+        chat_response = await self.gpt_ha_assistant.chat_stream(
+            chat_request.messages, on_sentence=on_sentence, on_tool_call=on_tool_call, **chat_request.kwargs
+        )
+        self.last_time_to_first_token = self.gpt_ha_assistant.last_time_to_first_token
+        return chat_response
+
+    def _should_speculate(self, speaker_id: str, text: str) -> bool:
+        """Return True if a completion should be started before the remote cache answers."""
+        if not self.speculative_completion or text in (INIT_CONVERSATION_WORD, REGISTER_CACHE_WORD):
+            return False
+        if not self.speculation_stats.should_speculate(speaker_id, self.speculative_max_hit_rate):
+            self.speculation_stats.record_skipped()
+            return False
+        return True
+
+    def _start_speculation(
+        self,
+        speaker_id: str,
+        chat_manager: ChatManager,
+        ha_states: dict,
+        services_catalog,
+        user_text: str,
+        started_tool_calls: dict[str, tuple[AssistantMessageToolCall, asyncio.Task[ToolCallResult]]],
+    ) -> Speculation:
+        """Start the chat completion while the remote cache is looked up."""
+        chat_request = self._build_chat_request(chat_manager, ha_states, services_catalog, user_text)
+        gate = SideEffectGate()
+        task = self.hass.async_create_task(self._async_complete(speaker_id, chat_request, started_tool_calls, gate))
+        self.speculation_stats.record_launched()
+        return Speculation(task=task, request=chat_request, gate=gate)
+
+    def _cancel_speculation(self, speculation: Speculation) -> None:
+        """Cancel a completion whose result is not needed."""
+        speculation.task.cancel()
+        self.speculation_stats.record_wasted()
+
+    def _make_sentence_publisher(self, speaker_id: str) -> Callable[[str], None]:
+        """Make a callback publishing streamed answer sentences to MQTT as they arrive."""
+        sequence = 0
+
+        @callback
+        def publish_sentence(sentence: str) -> None:
+            nonlocal sequence
+            # 크롬캐스트 플래그는 음성으로 내보내지 않음
+            if "googlecast_domain_flg" in sentence or "googlecast_domain_flag" in sentence:
+                return
+
+            payload = {"current": speaker_id[-2:], "sequence": sequence, "response": sentence}
+            sequence += 1
+            self.hass.async_create_task(
+                mqtt.async_publish(
+                    self.hass, topic=RESPONSE_STREAM_TOPIC, payload=json.dumps(payload), qos=0, retain=False
+                )
+            )
+
+        return publish_sentence
+
+    def _make_tool_call_dispatcher(
+        self, started_tool_calls: dict[str, tuple[AssistantMessageToolCall, asyncio.Task[ToolCallResult]]]
+    ) -> Callable[[dict], None]:
+        """Make a callback starting each tool call as soon as its arguments are complete in the stream."""
+
+        @callback
+        def dispatch_tool_call(tool_call: dict) -> None:
+            try:
+                parsed_tool_call = AssistantMessageToolCall.from_dict(tool_call)
+            except Exception as err:
+                # 파싱에 실패한 tool call은 스트림이 끝난 뒤 기존 경로에서 처리
+                _LOGGER.warning("Failed to start streamed tool call %s: %s", tool_call["id"], err)
+                return
+
+            _LOGGER.info("pipelined tool_call: %s", parsed_tool_call)
+            task = self.tool_call_scheduler.submit(parsed_tool_call)
+            started_tool_calls[parsed_tool_call.id] = (parsed_tool_call, task)
+
+        return dispatch_tool_call
+
     async def send_register_cache_request(self, speaker_id: str, content, tool_calls, command_text):
         """Send cache request to the cache server."""
-        headers = {"x-functions-key": self.entry.data[CONF_API_KEY], "Content-Type": "application/json"}
         data = {"speaker_id": speaker_id, "content": content, "tool_calls": tool_calls, "command_text": command_text}
         _LOGGER.info("Cache request: %s", data)
-        async with aiohttp.ClientSession() as session:
-            try:
-                async with session.post(REGISTER_CACHE_ENDPOINT, json=data, headers=headers) as response:
-                    if response.status == 200:
-                        result = await response.json()
-                        _LOGGER.info("Response: %s", result)
-                        return result
-                    _LOGGER.info("Failed with status code: %s", response.status)
-                    error_text = await response.text()
-                    _LOGGER.info("Error response: %s", error_text)
-            except Exception:
-                _LOGGER.error(traceback.format_exc())
-            return None
+        return await self._async_post_json("register_cache", REGISTER_CACHE_ENDPOINT, data)
 
     async def send_cache_request(self, speaker_id: str, input_text: str):
         """Send cache request to the cache server.
@@ -312,53 +817,48 @@ class AzureOpenAIAgent(conversation.AbstractConversationAgent):
             dict: response from the cache server
 
         """
-        headers = {"x-functions-key": self.entry.data[CONF_API_KEY], "Content-Type": "application/json"}
         data = {"speaker_id": speaker_id, "input_text": input_text}
         _LOGGER.info("Cache request: %s", data)
-        async with aiohttp.ClientSession() as session:
-            try:
-                async with session.post(CACHE_ENDPOINT, json=data, headers=headers) as response:
-                    if response.status == 200:
-                        result = await response.json()
-                        _LOGGER.info("Response: %s", result)
-                        return result
-                    _LOGGER.info("Failed with status code: %s", response.status)
-                    error_text = await response.text()
-                    _LOGGER.info("Error response: %s", error_text)
-            except Exception:
-                _LOGGER.error(traceback.format_exc())
-            return None
+        return await self._async_post_json("cache", CACHE_ENDPOINT, data)
 
-    async def send_pattern_request(self, speaker_id: str) -> list[str]:
-        """Get user-pattern request to command-crawler server.
+    async def _async_post_json(self, endpoint: str, url: str, data: dict) -> Optional[Any]:
+        """POST to a remote endpoint through its circuit breaker.
 
         Args:
-            speaker_id: speaker_id is consist of mac address and user_id
+            endpoint: name of the endpoint in the timings and circuit breakers
+            url: URL of the endpoint
+            data: JSON body
 
         Returns:
-            list[str]: pattern descriptions
+            JSON response, or None if the request failed or the circuit is open
 
         """
-        headers = {"x-functions-key": self.entry.data[CONF_API_KEY]}
+        if not self.circuit_breakers.allow_request(endpoint):
+            _LOGGER.debug("%s circuit is open, skipping the request", endpoint)
+            return None
 
-        quoted_speaker_id = speaker_id.replace(":", "%3A").upper()
-        request_url = f"{PATTERN_ENDPOINT}?mac_address={quoted_speaker_id}"
-        _LOGGER.info("User-pattern request: %s", request_url)
-        async with aiohttp.ClientSession() as session:
-            try:
-                async with session.get(request_url, headers=headers) as response:
-                    if response.status == 200:
-                        result = await response.json()
-                        user_patterns = result.get("user_patterns", [])
-                        speaker_patterns = [pattern["pattern_description"] for pattern in user_patterns]
-                        _LOGGER.info("%s patterns: %s", speaker_id, speaker_patterns)
-                        return speaker_patterns
-                    _LOGGER.info("Failed with status code: %s", response.status)
-                    error_text = await response.text()
-                    _LOGGER.info("Error response: %s", error_text)
-            except Exception:
-                _LOGGER.error(traceback.format_exc())
-            return []
+        headers = {"x-functions-key": self.entry.data[CONF_API_KEY], "Content-Type": "application/json"}
+        start = time.perf_counter()
+        # 4xx는 서버가 정상 응답한 것이므로 차단기에는 성공으로 기록
+        healthy = False
+        try:
+            async with self.endpoint_timings.measure(endpoint) as trace_kwargs, self.session.post(
+                url, json=data, headers=headers, **trace_kwargs
+            ) as response:
+                healthy = response.status < 500
+                if response.status == 200:
+                    result = await response.json()
+                    _LOGGER.info("Response: %s", result)
+                    return result
+                _LOGGER.info("Failed with status code: %s", response.status)
+                error_text = await response.text()
+                _LOGGER.info("Error response: %s", error_text)
+        except Exception as err:
+            healthy = False
+            _LOGGER.warning("%s request failed: %s", endpoint, err)
+        finally:
+            self.circuit_breakers.record(endpoint, time.perf_counter() - start, healthy)
+        return None
 
 
 class HassApiHandler:
@@ -367,6 +867,19 @@ class HassApiHandler:
     def __init__(self, hass):
         """Initialize the handler."""
         self.hass = hass
+        self.reload_timings = EndpointTimings()
+        # automation.reload가 id를 받는지 여부, 처음 다시 로드할 때 한 번만 확인
+        self._targeted_reload_supported: Optional[bool] = None
+        self.automation_store = AutomationStore(hass, self._reload_automation)
+
+    @staticmethod
+    def is_automation_call(api_call) -> bool:
+        """Return True if the API call creates or deletes an automation."""
+        if hasattr(api_call, "arguments"):
+            api_call = api_call.arguments
+
+        parts = api_call.endpoint.split("/")
+        return len(parts) >= 4 and parts[2] == "config" and parts[3] == "automation"
 
     async def create_if_action(self, condition_config: list[dict]) -> Callable:
         """IfAction 형식의 조건 함수 생성"""
@@ -391,53 +904,26 @@ class HassApiHandler:
 
         return if_action
 
-    async def delete_automation_to_yaml(self, automation_config):
-        """Delete automation from automations.yaml."""
-        _LOGGER.info("delete_automation_to_yaml %s", automation_config)
-        yaml_path = self.hass.config.path("automations.yaml")
+    async def delete_automation_to_yaml(self, automation_config) -> bool:
+        """Delete automation from automations.yaml.
 
-        try:
-            # 기존 automations.yaml 내용 읽기
-            async with aiofiles.open(yaml_path) as file:
-                content = await file.read()
-                existing_data = yaml.safe_load(content) or []
-
-            # 삭제할 자동화 찾기
-            for idx, automation in enumerate(existing_data):
-                _LOGGER.info("registered automation %s", automation.get("alias"))
-                if automation.get("alias") == automation_config["alias"]:
-                    existing_data.pop(idx)
-                    break
+        Returns:
+            bool: True if at least one automation with the alias was deleted
 
-            # 업데이트된 내용 저장
-            async with aiofiles.open(yaml_path, "w") as file:
-                await file.write(yaml.dump(existing_data, default_flow_style=False))
+        """
+        _LOGGER.info("delete_automation_to_yaml %s", automation_config)
+        deleted_ids = await self.automation_store.async_delete(automation_config["alias"])
+        if not deleted_ids:
+            _LOGGER.info("No automation deleted for alias %s", automation_config["alias"])
+            return False
 
-            _LOGGER.info("Automation deleted from automations.yaml: %s", automation_config["id"])
-        except Exception as e:
-            _LOGGER.error("Failed to delete automation from YAML: %s", e)
+        _LOGGER.info("Automations deleted from automations.yaml: %s", deleted_ids)
+        return True
 
-    async def create_automation_to_yaml(self, automation_config):
+    async def create_automation_to_yaml(self, automation_config) -> bool:
         """Save automation to automations.yaml."""
         _LOGGER.info("create_automation_to_yaml: %s", automation_config)
-        yaml_path = self.hass.config.path("automations.yaml")
-
-        try:
-            # 기존 automations.yaml 내용 읽기
-            async with aiofiles.open(yaml_path) as file:
-                content = await file.read()
-                existing_data = yaml.safe_load(content) or []
-
-            # 새로운 자동화 추가
-            existing_data.append(automation_config)
-
-            # 업데이트된 내용 저장
-            async with aiofiles.open(yaml_path, "w") as file:
-                await file.write(yaml.dump(existing_data, default_flow_style=False))
-
-            _LOGGER.info("Automation saved to automations.yaml: %s", automation_config["id"])
-        except Exception as e:
-            _LOGGER.error("Failed to save automation to YAML: %s", e)
+        return await self.automation_store.async_create(automation_config)
 
     async def process_api_call(self, api_call):
         """Process an API call.
@@ -459,20 +945,8 @@ class HassApiHandler:
             _LOGGER.info("process_api_call:: Services!!! ")
             service_params = self._convert_service_call(api_call)
             if service_params:
-                # Home Assistant 서비스 호출 실행
-                try:
-                    await self.hass.services.async_call(
-                        domain=service_params["domain"],
-                        service=service_params["service"],
-                        target=service_params.get("target", {}),
-                        service_data=service_params.get("service_data"),
-                        blocking=True,
-                    )
-                    return True
-                except Exception as err:
-                    _LOGGER.error("Failed to call Home Assistant service: %s", str(err))
-                    return False
-        if len(parts) >= 4 and parts[2] == "config" and parts[3] == "automation":
+                return await self._call_service(service_params)
+        if self.is_automation_call(api_call):
             _LOGGER.info("process_api_call:: Automation!!! ")
             try:
                 automation_config = self._convert_automation_call(api_call)
@@ -484,17 +958,104 @@ class HassApiHandler:
                 operation = operations.get(automation_config["method"])
                 del automation_config["method"]
                 if operation:
-                    await operation(automation_config)
-                    await self._reload_automation()
-                    return True
+                    # 파일 쓰기와 automation.reload는 AutomationStore가 모아서 한 번에 처리
+                    return await operation(automation_config)
             except Exception as e:
                 _LOGGER.error("Failed to create automation: %s", e)
                 return False
         return False
 
-    async def _reload_automation(self):
-        """Reload automation component."""
-        await self.hass.services.async_call("automation", "reload")
+    def service_batch_key(self, api_call):
+        """Return the key grouping service calls that only differ in their entity_id, or None."""
+        if hasattr(api_call, "arguments"):
+            api_call = api_call.arguments
+
+        parts = api_call.endpoint.split("/")
+        if not (len(parts) >= 5 and parts[2] == "services") or not api_call.body.get("entity_id"):
+            return None
+
+        service_params = self._convert_service_call(api_call)
+        service_data = json.dumps(service_params.get("service_data") or {}, sort_keys=True, default=str)
+        return service_params["domain"], service_params["service"], service_data
+
+    async def process_service_batch(self, api_calls) -> bool:
+        """Process service calls sharing a batch key as one call targeting all of their entities.
+
+        Args:
+            api_calls: API 호출 객체 목록, 모두 같은 service_batch_key를 가져야 함
+
+        Returns:
+            bool: True if successful, False if failed
+
+        """
+        entity_ids = []
+        service_params = None
+        for api_call in api_calls:
+            if hasattr(api_call, "arguments"):
+                api_call = api_call.arguments
+
+            service_params = self._convert_service_call(api_call)
+            # "light.a, light.b" 형태의 문자열도 개별 엔티티로 분리
+            for entity_id in tool_call_entity_ids(api_call):
+                if entity_id not in entity_ids:
+                    entity_ids.append(entity_id)
+
+        service_params["target"] = {"entity_id": entity_ids}
+        return await self._call_service(service_params)
+
+    async def _call_service(self, service_params) -> bool:
+        """Call a Home Assistant service."""
+        # Home Assistant 서비스 호출 실행
+        try:
+            await self.hass.services.async_call(
+                domain=service_params["domain"],
+                service=service_params["service"],
+                target=service_params.get("target", {}),
+                service_data=service_params.get("service_data"),
+                blocking=True,
+            )
+            return True
+        except Exception as err:
+            _LOGGER.error("Failed to call Home Assistant service: %s", str(err))
+            return False
+
+    def _supports_targeted_reload(self) -> bool:
+        """Return True if automation.reload accepts the id of one automation, checked once per handler."""
+        if self._targeted_reload_supported is None:
+            service = self.hass.services.async_services().get(AUTOMATION_DOMAIN, {}).get(SERVICE_RELOAD)
+            if service is None:
+                # automation 통합구성요소가 아직 로드되지 않았으면 다음에 다시 확인
+                return False
+            try:
+                if service.schema is not None:
+                    service.schema({CONF_ID: "automation_id"})
+                self._targeted_reload_supported = True
+            except vol.Invalid:
+                _LOGGER.info("automation.reload does not accept an id, every reload reloads all automations")
+                self._targeted_reload_supported = False
+        return self._targeted_reload_supported
+
+    async def _reload_automation(self, automation_ids: Optional[list[str]] = None):
+        """Reload automation component, once per automations.yaml flush.
+
+        Args:
+            automation_ids: ids of the automations to reload, or None to reload every automation
+
+        """
+        # 개별 reload도 자동화 설정 전체를 다시 읽으므로, 여러 개가 바뀌었으면 전체를 한 번만 다시 로드
+        if automation_ids and len(automation_ids) == 1 and self._supports_targeted_reload():
+            try:
+                # id를 지정하면 해당 자동화만 다시 로드(삭제된 id는 언로드)
+                async with self.reload_timings.measure("targeted"):
+                    await self.hass.services.async_call(
+                        AUTOMATION_DOMAIN, SERVICE_RELOAD, {CONF_ID: automation_ids[0]}, blocking=True
+                    )
+                return
+            except Exception as err:
+                _LOGGER.warning("Targeted automation reload failed, reloading every automation: %s", err)
+
+        async with self.reload_timings.measure("full"):
+            await self.hass.services.async_call(AUTOMATION_DOMAIN, SERVICE_RELOAD, blocking=True)
 
     def _validate_automation_config(self, config):
         """Validate automation configuration."""
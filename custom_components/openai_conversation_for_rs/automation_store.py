@@ -0,0 +1,248 @@
+"""In-memory store of automations.yaml with debounced, atomic write-back."""
+
+import asyncio
+import hashlib
+import logging
+import os
+import tempfile
+import time
+from collections.abc import Awaitable, Callable
+from typing import Any, Optional
+
+import yaml
+from homeassistant.core import HomeAssistant
+
+from .const import AUTOMATION_WRITE_DELAY
+
+_LOGGER = logging.getLogger(__name__)
+
+
+def _read_file(path: str) -> tuple[Optional[bytes], Optional[int]]:
+    """Read a file and its mtime, returning (None, None) if it does not exist."""
+    try:
+        with open(path, "rb") as file:
+            content = file.read()
+            return content, os.fstat(file.fileno()).st_mtime_ns
+    except FileNotFoundError:
+        return None, None
+
+
+def _write_file_atomic(path: str, content: bytes) -> int:
+    """Write a file through a temp file and rename, returning the new mtime."""
+    directory = os.path.dirname(path)
+    fd, temp_path = tempfile.mkstemp(dir=directory, prefix=".automations.", suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as file:
+            file.write(content)
+            file.flush()
+            os.fsync(file.fileno())
+        if os.path.exists(path):
+            os.chmod(temp_path, os.stat(path).st_mode)
+        os.replace(temp_path, path)
+    except BaseException:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
+    return os.stat(path).st_mtime_ns
+
+
+class AutomationStore:
+    """Automations of automations.yaml, loaded once and indexed by alias and id.
+
+    Edits are queued and applied in memory by one debounced flush, so a burst of edits costs one atomic write and
+    one reload. Before writing, the file's mtime and hash are compared with the last known version; if the file was
+    edited outside of this store it is loaded again and the queued edits are replayed on top of it.
+    """
+
+    def __init__(
+        self,
+        hass: HomeAssistant,
+        reload_callback: Callable[[Optional[list[str]]], Awaitable[Any]],
+        write_delay: float = AUTOMATION_WRITE_DELAY,
+    ):
+        """Initialize the store.
+
+        Args:
+            hass: Home Assistant instance
+            reload_callback: called once after every flush that changed the file, with the ids of the created or
+                deleted automations, or None if the file was also edited externally and everything must be reloaded
+            write_delay: seconds to wait for more edits before flushing
+
+        """
+        self.hass = hass
+        self.path = hass.config.path("automations.yaml")
+        self.reload_callback = reload_callback
+        self.write_delay = write_delay
+        self._automations: Optional[list[dict]] = None
+        self._by_id: dict[str, dict] = {}
+        self._by_alias: dict[str, list[dict]] = {}
+        self._mtime: Optional[int] = None
+        self._hash: Optional[str] = None
+        self._pending: list[tuple[str, dict, asyncio.Future]] = []
+        self._flush_handle: Optional[asyncio.TimerHandle] = None
+        self._flush_lock = asyncio.Lock()
+
+    async def async_create(self, automation_config: dict) -> bool:
+        """Queue adding an automation and wait for it to be written."""
+        return await self._async_queue("create", automation_config)
+
+    async def async_delete(self, alias: str) -> list[str]:
+        """Queue deleting every automation with an alias and wait for it to be written.
+
+        Returns:
+            list: ids of the deleted automations, None for those without an id, empty if no automation had the alias
+
+        """
+        return await self._async_queue("delete", {"alias": alias})
+
+    async def _async_queue(self, operation: str, automation_config: dict) -> Any:
+        """Queue an edit for the next flush and wait for its outcome."""
+        future = self.hass.loop.create_future()
+        self._pending.append((operation, automation_config, future))
+        if self._flush_handle is None:
+            self._flush_handle = self.hass.loop.call_later(self.write_delay, self._schedule_flush)
+        return await future
+
+    def _schedule_flush(self) -> None:
+        """Start the debounced flush."""
+        self._flush_handle = None
+        self.hass.async_create_task(self._async_flush())
+
+    async def _async_flush(self) -> None:
+        """Apply the queued edits, write the file once and reload once."""
+        async with self._flush_lock:
+            pending, self._pending = self._pending, []
+            if not pending:
+                return
+
+            start = time.perf_counter()
+            try:
+                content, mtime = await self.hass.async_add_executor_job(_read_file, self.path)
+                edited_externally = self._sync_with_file(content, mtime)
+
+                removed: set[int] = set()
+                outcomes = [
+                    self._apply(operation, automation_config, removed) for operation, automation_config, _ in pending
+                ]
+                if removed:
+                    # 삭제는 인덱스에서 바로 찾고, 리스트는 flush마다 한 번만 걸러냄
+                    self._automations = [item for item in self._automations if id(item) not in removed]
+                written = any(outcomes)
+                if written:
+                    data = yaml.dump(self._automations, default_flow_style=False).encode("utf-8")
+                    self._mtime = await self.hass.async_add_executor_job(_write_file_atomic, self.path, data)
+                    self._hash = hashlib.sha256(data).hexdigest()
+
+                _LOGGER.info(
+                    "Flushed %d automation edits (%d changed, %d automations) in %.0f ms",
+                    len(pending),
+                    sum(1 for outcome in outcomes if outcome),
+                    len(self._automations),
+                    (time.perf_counter() - start) * 1000,
+                )
+            except Exception as err:
+                _LOGGER.error("Failed to write automations.yaml: %s", err)
+                # 다음 flush에서 파일을 다시 읽도록 캐시를 버림
+                self._automations = None
+                outcomes = [[] if operation == "delete" else False for operation, _, _ in pending]
+                written = False
+
+            if written:
+                try:
+                    await self.reload_callback(None if edited_externally else self._affected_ids(pending, outcomes))
+                except Exception as err:
+                    # 파일에는 이미 반영되었으므로 결과는 그대로 알리고, 다음 reload에서 반영됨
+                    _LOGGER.error("Failed to reload automations after writing automations.yaml: %s", err)
+
+            for (_, _, future), outcome in zip(pending, outcomes):
+                if not future.done():
+                    future.set_result(outcome)
+
+    @staticmethod
+    def _affected_ids(pending: list[tuple[str, dict, asyncio.Future]], outcomes: list[Any]) -> Optional[list[str]]:
+        """Return the ids of the automations created or deleted by a flush, or None if one of them has no id."""
+        affected_ids = []
+        for (operation, automation_config, _), outcome in zip(pending, outcomes):
+            if operation == "create":
+                affected_ids.append(automation_config.get("id"))
+            else:
+                affected_ids.extend(outcome)
+        if None in affected_ids:
+            # id가 없는 자동화는 개별로 다시 로드할 수 없으므로 전체를 다시 로드
+            return None
+        return list(dict.fromkeys(str(automation_id) for automation_id in affected_ids))
+
+    def _sync_with_file(self, content: Optional[bytes], mtime: Optional[int]) -> bool:
+        """Load the file if it was never loaded or was edited outside of this store.
+
+        Returns:
+            bool: True if the file was edited outside of this store since it was last loaded or written
+
+        """
+        if self._automations is not None and mtime == self._mtime:
+            return False
+
+        content_hash = hashlib.sha256(content).hexdigest() if content is not None else None
+        if self._automations is not None and content_hash == self._hash:
+            self._mtime = mtime
+            return False
+
+        edited_externally = self._automations is not None
+        if edited_externally:
+            _LOGGER.info("automations.yaml was edited externally, reloading it before writing")
+
+        self._automations = (yaml.safe_load(content) if content else None) or []
+        self._mtime = mtime
+        self._hash = content_hash
+        self._rebuild_index()
+        return edited_externally
+
+    def _rebuild_index(self) -> None:
+        """Index the automations by id and alias."""
+        self._by_id = {}
+        self._by_alias = {}
+        for automation in self._automations:
+            self._index(automation)
+
+    def _index(self, automation: dict) -> None:
+        """Add an automation to the indexes."""
+        if (automation_id := automation.get("id")) is not None:
+            self._by_id[str(automation_id)] = automation
+        if (alias := automation.get("alias")) is not None:
+            self._by_alias.setdefault(alias, []).append(automation)
+
+    def _unindex(self, automation: dict) -> None:
+        """Remove an automation from the indexes."""
+        if (automation_id := automation.get("id")) is not None:
+            self._by_id.pop(str(automation_id), None)
+        if (alias := automation.get("alias")) is not None and (same_alias := self._by_alias.get(alias)):
+            same_alias[:] = [item for item in same_alias if item is not automation]
+            if not same_alias:
+                del self._by_alias[alias]
+
+    def _apply(self, operation: str, automation_config: dict, removed: set[int]) -> Any:
+        """Apply one edit in memory.
+
+        Args:
+            operation: "create" or "delete"
+            automation_config: automation to create, or {"alias": ...} of the automations to delete
+            removed: object ids of deleted automations, to be filtered out of the list
+
+        Returns:
+            True for a create, or the list of deleted automation ids for a delete, None for those without an id
+
+        """
+        if operation == "create":
+            self._automations.append(automation_config)
+            self._index(automation_config)
+            return True
+
+        same_alias = list(self._by_alias.get(automation_config["alias"], ()))
+        if not same_alias:
+            _LOGGER.info("No automation with alias %s", automation_config["alias"])
+            return []
+
+        for automation in same_alias:
+            self._unindex(automation)
+            removed.add(id(automation))
+        return [None if automation.get("id") is None else str(automation["id"]) for automation in same_alias]
@@ -0,0 +1,160 @@
+"""Persistent per-speaker chat history."""
+
+import asyncio
+import hashlib
+import logging
+from collections import OrderedDict
+
+from homeassistant.core import HomeAssistant, callback
+from homeassistant.helpers.storage import Store
+
+from .chat_manager import ChatHistory
+from .const import (
+    CHAT_HISTORY_MAX_RESIDENT_SPEAKERS,
+    CHAT_HISTORY_SAVE_DELAY,
+    CHAT_HISTORY_STORAGE_VERSION,
+    DOMAIN,
+)
+from .message_model import message_from_dict
+from .token_counter import TokenCounter
+
+_LOGGER = logging.getLogger(__name__)
+
+
+class ChatHistoryStore:
+    """Chat histories of the speakers, persisted to ``.storage`` with one file per speaker.
+
+    A speaker's history is loaded on first use and kept in memory, so reads never touch the disk. Changes are written
+    behind with a debounce. At most ``max_resident`` histories stay in memory; the least recently used one is written
+    out and dropped when another speaker is loaded.
+    """
+
+    def __init__(
+        self,
+        hass: HomeAssistant,
+        entry_id: str,
+        token_counter: TokenCounter,
+        max_resident: int = CHAT_HISTORY_MAX_RESIDENT_SPEAKERS,
+        save_delay: float = CHAT_HISTORY_SAVE_DELAY,
+    ):
+        """Initialize the store."""
+        self.hass = hass
+        self.entry_id = entry_id
+        self.token_counter = token_counter
+        self.max_resident = max_resident
+        self.save_delay = save_delay
+        self._histories: OrderedDict[str, ChatHistory] = OrderedDict()
+        self._stores: dict[str, Store] = {}
+        self._dirty: set[str] = set()
+        self._loading: dict[str, asyncio.Task[ChatHistory]] = {}
+
+    def _get_store(self, speaker_id: str) -> Store:
+        """Get the Store of a speaker."""
+        if (store := self._stores.get(speaker_id)) is None:
+            # speaker_id에는 파일명에 쓸 수 없는 문자가 있을 수 있으므로 해시를 사용
+            speaker_hash = hashlib.sha256(speaker_id.encode("utf-8")).hexdigest()[:16]
+            store = Store(
+                self.hass, CHAT_HISTORY_STORAGE_VERSION, f"{DOMAIN}.chat_history.{self.entry_id}.{speaker_hash}"
+            )
+            self._stores[speaker_id] = store
+        return store
+
+    async def async_load(self, speaker_id: str) -> ChatHistory:
+        """Load the history of a speaker if it is not in memory yet."""
+        if (history := self._histories.get(speaker_id)) is not None:
+            self._histories.move_to_end(speaker_id)
+            return history
+
+        if (task := self._loading.get(speaker_id)) is None:
+            task = self.hass.async_create_task(self._async_load_history(speaker_id))
+            self._loading[speaker_id] = task
+        return await task
+
+    async def _async_load_history(self, speaker_id: str) -> ChatHistory:
+        """Read the history of a speaker from storage."""
+        try:
+            data = await self._get_store(speaker_id).async_load()
+            history = ChatHistory()
+            for item in (data or {}).get("messages", []):
+                try:
+                    history.append(message_from_dict(item["message"]), item["tokens"])
+                except Exception as err:
+                    _LOGGER.warning("Skipping invalid stored message of %s: %s", speaker_id, err)
+
+            _LOGGER.debug("Loaded %d messages of %s", len(history), speaker_id)
+            self._add_resident(speaker_id, history)
+            return history
+        finally:
+            self._loading.pop(speaker_id, None)
+
+    @callback
+    def get_history(self, speaker_id: str) -> ChatHistory:
+        """Get the in-memory history of a speaker, starting an empty one if it was not loaded."""
+        if (history := self._histories.get(speaker_id)) is not None:
+            self._histories.move_to_end(speaker_id)
+            return history
+
+        _LOGGER.debug("History of %s was not loaded, starting an empty one", speaker_id)
+        history = ChatHistory()
+        self._add_resident(speaker_id, history)
+        return history
+
+    @callback
+    def _add_resident(self, speaker_id: str, history: ChatHistory) -> None:
+        """Keep a history in memory, dropping the least recently used ones above the limit."""
+        self._histories[speaker_id] = history
+        self._histories.move_to_end(speaker_id)
+
+        while len(self._histories) > self.max_resident:
+            evicted_id, evicted_history = self._histories.popitem(last=False)
+            if evicted_id in self._dirty:
+                self._dirty.discard(evicted_id)
+                self.hass.async_create_task(self._async_save_evicted(evicted_id, self._data_to_save(evicted_history)))
+            else:
+                self._stores.pop(evicted_id, None)
+
+    async def _async_save_evicted(self, speaker_id: str, data: dict) -> None:
+        """Write the history of an evicted speaker and release its Store."""
+        # 저장이 끝날 때까지 Store를 유지해야 다시 로드할 때 저장 중인 데이터를 읽음
+        await self._get_store(speaker_id).async_save(data)
+        if speaker_id not in self._histories:
+            self._stores.pop(speaker_id, None)
+
+    @callback
+    def async_schedule_save(self, speaker_id: str) -> None:
+        """Write the history of a speaker after the save delay."""
+        if (history := self._histories.get(speaker_id)) is None:
+            return
+
+        self._dirty.add(speaker_id)
+
+        @callback
+        def data_to_save() -> dict:
+            self._dirty.discard(speaker_id)
+            return self._data_to_save(history)
+
+        self._get_store(speaker_id).async_delay_save(data_to_save, self.save_delay)
+
+    async def async_save_all(self) -> None:
+        """Write every changed history immediately."""
+        dirty, self._dirty = self._dirty, set()
+        await asyncio.gather(
+            *(
+                self._get_store(speaker_id).async_save(self._data_to_save(self._histories[speaker_id]))
+                for speaker_id in dirty
+                if speaker_id in self._histories
+            )
+        )
+
+    @staticmethod
+    def _data_to_save(history: ChatHistory) -> dict:
+        """Return the data to persist for a history."""
+        messages = []
+        for message, tokens in zip(history.messages, history.token_counts):
+            if message.role == "assistant":
+                message_dict = message.to_dict(to_str_arguments=False)
+            else:
+                message_dict = message.to_dict()
+            messages.append({"message": message_dict, "tokens": tokens})
+
+        return {"messages": messages}
@@ -1,62 +1,173 @@
 """Chat manager module."""
 
+from __future__ import annotations
+
 import logging
-from typing import List
+from collections import deque
+from typing import TYPE_CHECKING, Optional
 
+from .const import DEFAULT_CHAT_HISTORY_TOKEN_BUDGET
 from .message_model import BaseMessage
-from .prompt_manager import ClientCache
+
+if TYPE_CHECKING:
+    from .chat_history_store import ChatHistoryStore
 
 _LOGGER = logging.getLogger(__name__)
 
+MAX_CHAT_MESSAGES = 20
+
+
+def to_request_dict(message: BaseMessage) -> dict:
+    """Convert a message to the dictionary sent in a chat completion request."""
+    request_dict = message.to_dict()
+    request_dict.pop("id", None)
+    return request_dict
+
+
+class ChatHistory:
+    """Messages of one conversation with the token count of each message and their running total.
+
+    Next to every message the request-ready dictionary is kept, so building the chat input does not serialize the
+    messages again.
+    """
+
+    def __init__(self):
+        """Initialize the history."""
+        self.messages: deque[BaseMessage] = deque()
+        self.request_dicts: deque[dict] = deque()
+        self.token_counts: deque[int] = deque()
+        self.total_tokens = 0
+        self.user_turns = 0
+
+    def __len__(self) -> int:
+        """Return the number of messages."""
+        return len(self.messages)
+
+    def append(self, message: BaseMessage, tokens: int, request_dict: Optional[dict] = None) -> None:
+        """Append a message whose token count is already known."""
+        self.messages.append(message)
+        self.request_dicts.append(request_dict if request_dict is not None else to_request_dict(message))
+        self.token_counts.append(tokens)
+        self.total_tokens += tokens
+        if message.role == "user":
+            self.user_turns += 1
+
+    def popleft(self) -> BaseMessage:
+        """Remove the oldest message."""
+        message = self.messages.popleft()
+        self.request_dicts.popleft()
+        self.total_tokens -= self.token_counts.popleft()
+        if message.role == "user":
+            self.user_turns -= 1
+        return message
+
+    def clear(self) -> None:
+        """Remove every message."""
+        self.messages.clear()
+        self.request_dicts.clear()
+        self.token_counts.clear()
+        self.total_tokens = 0
+        self.user_turns = 0
+
+
+class ChatCache:
+    """Chat cache.
+
+    The token count of a message is computed once when it is added. When the history exceeds the token budget or
+    the message limit, the oldest user turns are evicted whole, together with the assistant, tool and system messages
+    that followed them, so the history never has to be re-tokenized. The history itself lives in ChatHistoryStore,
+    which keeps it in memory and persists it.
+    """
+
+    def __init__(
+        self,
+        client_id,
+        history_store: ChatHistoryStore,
+        token_budget: int = DEFAULT_CHAT_HISTORY_TOKEN_BUDGET,
+        max_messages: int = MAX_CHAT_MESSAGES,
+    ):
+        """Initialize the chat cache."""
+        self.client_id = client_id
+        self.history_store = history_store
+        self.token_counter = history_store.token_counter
+        self.token_budget = token_budget
+        self.max_messages = max_messages
 
-class ChatCache(ClientCache):
-    """Chat cache."""
+    def get_history(self) -> ChatHistory:
+        """Get the history of the client."""
+        return self.history_store.get_history(self.client_id)
 
-    def __init__(self, client_id):
-        """Initialize the chat cache."""
-        super().__init__(client_id)
-        self.cache_key = "chat"
+    @property
+    def total_tokens(self) -> int:
+        """Token count of the messages."""
+        return self.get_history().total_tokens
 
     def get_messages(self):
         """Get the messages."""
-        messages = self.get(self.cache_key, [])
+        history = self.get_history()
         _LOGGER.info("====================================")
-        _LOGGER.info(f"{self.client_id} has messages: {len(messages)}")
+        _LOGGER.info(f"{self.client_id} has messages: {len(history)} ({history.total_tokens} tokens)")
         _LOGGER.info("====================================")
-        return messages
+        return list(history.messages)
 
-    def _limit_messages(self, messages: List[BaseMessage], trigger_limit=20):
-        """Limit the number of messages to 20."""
-        while len(messages) > trigger_limit:
-            if len(messages) and messages[0].role == "user":
-                _LOGGER.debug(f"dropping message for limit. role: {messages[0].role}")
-                messages.pop(0)
+    def _limit_messages(self, history: ChatHistory):
+        """Evict the oldest user turns until the history fits the token budget and the message limit."""
+        # 현재 user turn은 남겨둠
+        while (len(history) > self.max_messages or history.total_tokens > self.token_budget) and (
+            history.user_turns > 1 or history.messages[0].role != "user"
+        ):
+            message = history.popleft()
+            _LOGGER.debug(f"dropping message for limit. role: {message.role}")
 
-            while len(messages) and messages[0].role != "user":
-                _LOGGER.debug(
-                    f"dropping message for limit. role: {messages[0].role}")
-                messages.pop(0)
+            while len(history) and history.messages[0].role != "user":
+                message = history.popleft()
+                _LOGGER.debug(f"dropping message for limit. role: {message.role}")
 
-        return messages
+    def add_message(self, message: BaseMessage):
+        """Add a message."""
+        history = self.get_history()
+        request_dict = to_request_dict(message)
+        history.append(message, self.token_counter.count_message(request_dict, volatile=True), request_dict)
+        self._limit_messages(history)
+        self.history_store.async_schedule_save(self.client_id)
 
     def set_messages(self, value):
         """Set the messages."""
-        processed_value = self._limit_messages(value)
+        history = self.get_history()
+        history.clear()
+        for message in value:
+            request_dict = to_request_dict(message)
+            history.append(message, self.token_counter.count_message(request_dict, volatile=True), request_dict)
 
-        self.set(self.cache_key, processed_value)
+        self._limit_messages(history)
+        self.history_store.async_schedule_save(self.client_id)
+
+    def get_chat_input(self) -> list[dict]:
+        """Get the request-ready dictionaries of the messages."""
+        return list(self.get_history().request_dicts)
+
+    def get_chat_input_tokens(self) -> list[int]:
+        """Get the token counts of the messages, in the order of get_chat_input."""
+        return list(self.get_history().token_counts)
 
     def reset_messages(self):
         """Reset the messages."""
-        self.set(self.cache_key, [])
+        self.get_history().clear()
+        self.history_store.async_schedule_save(self.client_id)
 
 
 class ChatManager:
     """Chat manager."""
 
-    def __init__(self, user_name):
+    def __init__(
+        self,
+        user_name,
+        history_store: ChatHistoryStore,
+        token_budget: int = DEFAULT_CHAT_HISTORY_TOKEN_BUDGET,
+    ):
         """Initialize the chat manager."""
         self.user_name = user_name
-        self.chat_cache = ChatCache(user_name)
+        self.chat_cache = ChatCache(user_name, history_store, token_budget=token_budget)
 
     def reset_messages(self):
         """Reset the messages."""
@@ -72,12 +183,11 @@ class ChatManager:
 
     def add_message(self, message: BaseMessage):
         """Add a message to the chat."""
-        messages = self.chat_cache.get_messages()
+        messages = self.chat_cache.get_history().messages
         # TODO self.user_name 이 speaker_id 가 되어야 함..
         # _LOGGER.info("[%s] history %s", self.user_name, messages)
         message.id = self.get_next_message_id(messages)
-        messages.append(message)
-        self.chat_cache.set_messages(messages)
+        self.chat_cache.add_message(message)
 
     def update_messages(self, messages):
         """Update the messages."""
@@ -104,10 +214,8 @@ class ChatManager:
 
     def get_chat_input(self):
         """Get the chat input."""
-        messages = self.chat_cache.get_messages()
-        dict_messages = [message.to_dict() for message in messages]
+        return self.chat_cache.get_chat_input()
 
-        for message in dict_messages:
-            message.pop("id")
-
-        return dict_messages
+    def get_chat_input_tokens(self):
+        """Get the token counts of the chat input messages."""
+        return self.chat_cache.get_chat_input_tokens()
@@ -0,0 +1,149 @@
+"""Assemble streamed chat completions into assistant messages."""
+
+import json
+import logging
+import re
+from collections.abc import Callable
+from typing import Any, Optional
+
+_LOGGER = logging.getLogger(__name__)
+
+# 문장 끝(마침표, 물음표, 느낌표, 줄바꿈)과 뒤따르는 공백까지 한 문장으로 취급, "24.5" 같은 소수점은 제외
+SENTENCE_END_RE = re.compile(r"(?:[.!?。！？]+|\n)(?:\s+|$)")
+MIN_SENTENCE_LENGTH = 8
+
+
+class ChatStreamAssembler:
+    """Assemble chat completion chunks into one assistant message.
+
+    Content deltas are buffered and handed to ``on_sentence`` one sentence at a time, so speech can start before the
+    completion is finished. Tool call deltas are merged by their index into complete tool calls, and each tool call is
+    handed to ``on_tool_call`` as soon as its arguments JSON is complete.
+    """
+
+    def __init__(
+        self,
+        on_sentence: Optional[Callable[[str], None]] = None,
+        on_tool_call: Optional[Callable[[dict], None]] = None,
+    ):
+        """Initialize the assembler.
+
+        Args:
+            on_sentence: called with every complete sentence of the content, and with the remaining text at the end
+            on_tool_call: called once with a copy of every tool call whose arguments are complete JSON
+
+        """
+        self.on_sentence = on_sentence
+        self.on_tool_call = on_tool_call
+        self.finish_reason = None
+        self.usage = None
+        self._content_parts: list[str] = []
+        self._pending_text = ""
+        self._tool_calls: dict[int, dict] = {}
+        self._reported_tool_calls: set[int] = set()
+
+    @property
+    def content(self) -> str:
+        """Content received so far."""
+        return "".join(self._content_parts)
+
+    def add_chunk(self, chunk: Any) -> bool:
+        """Add one streamed chunk.
+
+        Returns:
+            bool: True if the chunk carried content or tool call data
+
+        """
+        if getattr(chunk, "usage", None):
+            self.usage = chunk.usage
+
+        received = False
+        # Azure는 content filter 결과만 담긴 빈 choices 청크를 보내기도 함
+        for choice in chunk.choices:
+            if choice.index != 0:
+                continue
+
+            delta = choice.delta
+            if delta is not None and delta.content:
+                self._add_content(delta.content)
+                received = True
+
+            if delta is not None and delta.tool_calls:
+                for tool_call_delta in delta.tool_calls:
+                    self._add_tool_call_delta(tool_call_delta)
+                received = True
+
+            if choice.finish_reason:
+                self.finish_reason = choice.finish_reason
+
+        return received
+
+    def finish(self) -> None:
+        """Flush the remaining buffered text and tool calls."""
+        if self._pending_text.strip() and self.on_sentence:
+            self.on_sentence(self._pending_text.strip())
+        self._pending_text = ""
+
+        for index in sorted(self._tool_calls):
+            self._report_tool_call(index)
+
+    def to_message_dict(self) -> dict:
+        """Return the assembled assistant message in the chat completion message format."""
+        message = {"role": "assistant", "content": self.content or None}
+        if self._tool_calls:
+            message["tool_calls"] = [self._tool_calls[index] for index in sorted(self._tool_calls)]
+        return message
+
+    def _add_content(self, text: str) -> None:
+        """Buffer content and emit complete sentences."""
+        self._content_parts.append(text)
+        if not self.on_sentence:
+            return
+
+        self._pending_text += text
+        last_end = 0
+        for match in SENTENCE_END_RE.finditer(self._pending_text):
+            # "네." 같은 너무 짧은 조각은 다음 문장과 합쳐서 보냄
+            if match.end() - last_end < MIN_SENTENCE_LENGTH or match.end() == len(self._pending_text):
+                continue
+            self.on_sentence(self._pending_text[last_end : match.end()].strip())
+            last_end = match.end()
+
+        self._pending_text = self._pending_text[last_end:]
+
+    def _add_tool_call_delta(self, tool_call_delta: Any) -> None:
+        """Merge a tool call delta into the tool call at its index."""
+        tool_call = self._tool_calls.setdefault(
+            tool_call_delta.index,
+            {"id": None, "type": "function", "function": {"name": "", "arguments": ""}},
+        )
+        if tool_call_delta.id:
+            tool_call["id"] = tool_call_delta.id
+        if tool_call_delta.type:
+            tool_call["type"] = tool_call_delta.type
+
+        function_delta = tool_call_delta.function
+        if function_delta is not None:
+            if function_delta.name:
+                tool_call["function"]["name"] += function_delta.name
+            if function_delta.arguments:
+                tool_call["function"]["arguments"] += function_delta.arguments
+                # 인자는 JSON 객체이므로 닫는 괄호가 올 때만 완성 여부를 확인
+                if function_delta.arguments.rstrip().endswith("}"):
+                    self._report_tool_call(tool_call_delta.index)
+
+    def _report_tool_call(self, index: int) -> None:
+        """Hand a tool call to on_tool_call once its arguments parse as JSON."""
+        if not self.on_tool_call or index in self._reported_tool_calls:
+            return
+
+        tool_call = self._tool_calls[index]
+        if not tool_call["id"]:
+            return
+        try:
+            json.loads(tool_call["function"]["arguments"])
+        except ValueError:
+            return
+
+        self._reported_tool_calls.add(index)
+        self.on_tool_call({**tool_call, "function": dict(tool_call["function"])})
@@ -0,0 +1,160 @@
+"""Circuit breakers for the remote endpoints."""
+
+import logging
+import time
+from collections import deque
+
+from homeassistant.core import callback
+
+from .stats import StatsPublisher
+
+_LOGGER = logging.getLogger(__name__)
+
+STATE_CLOSED = "closed"
+STATE_OPEN = "open"
+STATE_HALF_OPEN = "half_open"
+
+WINDOW_SIZE = 20
+MIN_CALLS = 5
+FAILURE_RATE_THRESHOLD = 0.5
+SLOW_CALL_THRESHOLD = 3.0
+OPEN_DURATION = 5.0
+MAX_OPEN_DURATION = 300.0
+
+
+class CircuitBreaker:
+    """Circuit breaker of one remote endpoint.
+
+    The outcomes of the last ``window_size`` calls are kept; a call counts as bad if it failed or took longer than
+    ``slow_call_threshold``. Once at least ``min_calls`` were made and the bad rate reaches
+    ``failure_rate_threshold``, the circuit opens and calls are skipped without touching the network. After the open
+    duration a single probe call is let through (half-open): if it is good the circuit closes, otherwise it opens
+    again for twice as long, up to ``max_open_duration``.
+    """
+
+    def __init__(
+        self,
+        endpoint: str,
+        window_size: int = WINDOW_SIZE,
+        min_calls: int = MIN_CALLS,
+        failure_rate_threshold: float = FAILURE_RATE_THRESHOLD,
+        slow_call_threshold: float = SLOW_CALL_THRESHOLD,
+        open_duration: float = OPEN_DURATION,
+        max_open_duration: float = MAX_OPEN_DURATION,
+    ):
+        """Initialize the breaker closed."""
+        self.endpoint = endpoint
+        self.min_calls = min_calls
+        self.failure_rate_threshold = failure_rate_threshold
+        self.slow_call_threshold = slow_call_threshold
+        self.open_duration = open_duration
+        self.max_open_duration = max_open_duration
+        self.state = STATE_CLOSED
+        self.opened = 0
+        self.skipped = 0
+        self._outcomes: deque[bool] = deque(maxlen=window_size)
+        self._open_until = 0.0
+        self._consecutive_opens = 0
+        self._probing = False
+
+    @property
+    def failure_rate(self) -> float:
+        """Rate of bad calls in the window."""
+        return self._outcomes.count(False) / len(self._outcomes) if self._outcomes else 0.0
+
+    def allow_request(self) -> bool:
+        """Return True if a call may be made, moving an expired open circuit to half-open."""
+        if self.state == STATE_OPEN:
+            if time.monotonic() < self._open_until:
+                self.skipped += 1
+                return False
+            self.state = STATE_HALF_OPEN
+            _LOGGER.info("%s circuit half-open, probing", self.endpoint)
+
+        if self.state == STATE_HALF_OPEN:
+            # half-open에서는 probe 하나만 보냄
+            if self._probing:
+                self.skipped += 1
+                return False
+            self._probing = True
+        return True
+
+    def record(self, elapsed: float, success: bool) -> None:
+        """Record the outcome of a call allowed by allow_request."""
+        good = success and elapsed <= self.slow_call_threshold
+        if self.state == STATE_HALF_OPEN:
+            self._probing = False
+            if good:
+                _LOGGER.info("%s circuit closed", self.endpoint)
+                self.state = STATE_CLOSED
+                self._consecutive_opens = 0
+                self._outcomes.clear()
+            else:
+                self._open()
+            return
+
+        self._outcomes.append(good)
+        if (
+            self.state == STATE_CLOSED
+            and len(self._outcomes) >= self.min_calls
+            and self.failure_rate >= self.failure_rate_threshold
+        ):
+            self._open()
+
+    def _open(self) -> None:
+        """Open the circuit, doubling the open duration on every consecutive opening."""
+        duration = min(self.open_duration * 2**self._consecutive_opens, self.max_open_duration)
+        self._consecutive_opens += 1
+        self.opened += 1
+        self.state = STATE_OPEN
+        self._open_until = time.monotonic() + duration
+        _LOGGER.warning(
+            "%s circuit open for %.1f s (failure rate %.0f%%)", self.endpoint, duration, self.failure_rate * 100
+        )
+
+    def as_dict(self) -> dict:
+        """Return the state of the breaker as a dictionary."""
+        return {
+            "state": self.state,
+            "failure_rate": round(self.failure_rate, 3),
+            "opened": self.opened,
+            "skipped": self.skipped,
+        }
+
+
+class CircuitBreakers(StatsPublisher):
+    """Circuit breakers of the remote endpoints, keyed like EndpointTimings."""
+
+    def __init__(self):
+        """Initialize the breakers."""
+        super().__init__()
+        self._breakers: dict[str, CircuitBreaker] = {}
+
+    def get(self, endpoint: str) -> CircuitBreaker:
+        """Get the breaker of an endpoint."""
+        if (breaker := self._breakers.get(endpoint)) is None:
+            breaker = self._breakers[endpoint] = CircuitBreaker(endpoint)
+        return breaker
+
+    @callback
+    def allow_request(self, endpoint: str) -> bool:
+        """Return True if a call to the endpoint may be made."""
+        breaker = self.get(endpoint)
+        state = breaker.state
+        allowed = breaker.allow_request()
+        if breaker.state != state:
+            self._async_notify()
+        return allowed
+
+    @callback
+    def record(self, endpoint: str, elapsed: float, success: bool) -> None:
+        """Record the outcome of a call to the endpoint."""
+        breaker = self.get(endpoint)
+        state = breaker.state
+        breaker.record(elapsed, success)
+        if breaker.state != state:
+            self._async_notify()
+
+    def as_dict(self) -> dict[str, dict]:
+        """Return the state of every breaker."""
+        return {endpoint: breaker.as_dict() for endpoint, breaker in self._breakers.items()}
@@ -0,0 +1,201 @@
+"""Normalization and similarity index for cached voice commands."""
+
+import math
+import re
+import unicodedata
+from difflib import SequenceMatcher
+from typing import Optional
+
+# 명사 뒤에 붙는 조사, 긴 것부터 검사
+PARTICLES = (
+    "에서",
+    "으로",
+    "한테",
+    "에게",
+    "까지",
+    "부터",
+    "이랑",
+    "을",
+    "를",
+    "은",
+    "는",
+    "이",
+    "가",
+    "에",
+    "로",
+    "랑",
+)
+FILLER_WORDS = frozenset(["좀", "제발", "그", "저기", "혹시"])
+# 명령 어미를 한 가지 형태로 통일
+COMMAND_ENDINGS = (
+    ("주실래요", "줘"),
+    ("주세요", "줘"),
+    ("줄래요", "줘"),
+    ("줄래", "줘"),
+    ("줘요", "줘"),
+)
+NGRAM_SIZE = 2
+# 유사 명령 사이에 허용하는 차이, 정규화 후에도 단어 중간에 남는 조사와 군더더기 말
+IGNORABLE_FRAGMENTS = frozenset([*PARTICLES, *FILLER_WORDS, "도", "요"])
+
+_NON_WORD_RE = re.compile(r"[^\w\s]")
+_DIGITS_RE = re.compile(r"\d+")
+
+
+def _strip_particle(token: str) -> str:
+    """Strip one trailing particle from a token."""
+    for particle in PARTICLES:
+        if token.endswith(particle) and len(token) > len(particle):
+            return token[: -len(particle)]
+    return token
+
+
+def normalize_command(text: str) -> str:
+    """Normalize a voice command for cache lookups.
+
+    Decomposed jamo are composed (NFC), punctuation, filler words and whitespace are removed, particles are
+    stripped from each word and command endings are unified. "거실 불 켜 줘" and "거실불을 켜주세요" both become
+    "거실불켜줘".
+    """
+    text = unicodedata.normalize("NFC", text).lower()
+    text = _NON_WORD_RE.sub(" ", text)
+
+    tokens = [_strip_particle(token) for token in text.split() if token not in FILLER_WORDS]
+    normalized = "".join(tokens)
+
+    for ending, replacement in COMMAND_ENDINGS:
+        if normalized.endswith(ending):
+            normalized = normalized[: -len(ending)] + replacement
+            break
+
+    return normalized
+
+
+def command_ngrams(normalized: str) -> frozenset[str]:
+    """Character n-grams of a normalized command."""
+    if len(normalized) <= NGRAM_SIZE:
+        return frozenset([normalized])
+    return frozenset(normalized[i : i + NGRAM_SIZE] for i in range(len(normalized) - NGRAM_SIZE + 1))
+
+
+def _is_ignorable(fragment: str) -> bool:
+    """Return True if a text consists only of particles and filler words."""
+    # reachable[end]: fragment[:end]를 무시할 수 있는 조각들로 나눌 수 있는지
+    reachable = [True] + [False] * len(fragment)
+    for end in range(1, len(fragment) + 1):
+        reachable[end] = any(
+            reachable[end - len(piece)] for piece in IGNORABLE_FRAGMENTS if fragment.endswith(piece, 0, end)
+        )
+    return reachable[-1]
+
+
+def only_particles_differ(normalized: str, other: str) -> bool:
+    """Return True if two normalized commands only differ in particles and filler words.
+
+    "타이머도맞춰줘" and "타이머맞춰줘" qualify, "냉방모드" and "난방모드" do not: a changed syllable of a content word
+    changes the meaning of the command, however long the rest of the command is.
+    """
+    for tag, i1, i2, j1, j2 in SequenceMatcher(None, normalized, other, autojunk=False).get_opcodes():
+        if tag != "equal" and not (_is_ignorable(normalized[i1:i2]) and _is_ignorable(other[j1:j2])):
+            return False
+    return True
+
+
+def _partition_key(normalized: str) -> tuple[str, tuple[str, ...]]:
+    """Partition key of a normalized command: its ending and its numbers."""
+    return normalized[-NGRAM_SIZE:], tuple(_DIGITS_RE.findall(normalized))
+
+
+class CommandIndex:
+    """Character n-gram index over normalized commands with Jaccard similarity lookup.
+
+    Commands are partitioned by their ending (켜줘/꺼줘) and numbers (온도, 밝기 등), so only commands with the same
+    action and values can match each other. Lookups use prefix filtering: only the rarest n-grams of the query are
+    probed, which is enough to find every command above the similarity threshold, so the candidate set stays small
+    even with thousands of commands. A candidate above the threshold is only returned if it differs from the query
+    in particles and filler words alone, since long commands stay above any threshold when one content word changes.
+    """
+
+    def __init__(self):
+        """Initialize the index."""
+        self._postings: dict[tuple[str, tuple[str, ...]], dict[str, set[str]]] = {}
+        self._ngrams: dict[str, frozenset[str]] = {}
+
+    def __len__(self) -> int:
+        """Return the number of indexed commands."""
+        return len(self._ngrams)
+
+    def add(self, normalized: str) -> None:
+        """Index a normalized command."""
+        if normalized in self._ngrams:
+            return
+
+        ngrams = command_ngrams(normalized)
+        self._ngrams[normalized] = ngrams
+        postings = self._postings.setdefault(_partition_key(normalized), {})
+        for ngram in ngrams:
+            postings.setdefault(ngram, set()).add(normalized)
+
+    def remove(self, normalized: str) -> None:
+        """Remove a normalized command from the index."""
+        ngrams = self._ngrams.pop(normalized, None)
+        if ngrams is None:
+            return
+
+        partition_key = _partition_key(normalized)
+        postings = self._postings[partition_key]
+        for ngram in ngrams:
+            posting = postings[ngram]
+            posting.discard(normalized)
+            if not posting:
+                del postings[ngram]
+        if not postings:
+            del self._postings[partition_key]
+
+    def lookup(self, normalized: str, threshold: float) -> Optional[tuple[str, float]]:
+        """Find the most similar indexed command.
+
+        Args:
+            normalized: normalized query command
+            threshold: minimum Jaccard similarity of the n-gram sets
+
+        Returns:
+            tuple[str, float]: matched command and its similarity, or None if nothing reaches the threshold
+
+        """
+        if normalized in self._ngrams:
+            return normalized, 1.0
+
+        postings = self._postings.get(_partition_key(normalized))
+        if not postings:
+            return None
+
+        query = command_ngrams(normalized)
+        min_overlap = math.ceil(threshold * len(query) - 1e-9)
+        prefix_size = len(query) - min_overlap + 1
+        if prefix_size <= 0:
+            return None
+
+        # 희귀한 n-gram부터 검사하면 후보가 가장 적음
+        probe = sorted(query, key=lambda ngram: len(postings.get(ngram, ())))[:prefix_size]
+        candidates = set()
+        for ngram in probe:
+            candidates.update(postings.get(ngram, ()))
+
+        min_size = threshold * len(query)
+        max_size = len(query) / threshold if threshold else math.inf
+        matches = []
+        for candidate in candidates:
+            ngrams = self._ngrams[candidate]
+            if not min_size <= len(ngrams) <= max_size:
+                continue
+            overlap = len(query & ngrams)
+            score = overlap / (len(query) + len(ngrams) - overlap)
+            if score >= threshold:
+                matches.append((score, candidate))
+
+        # 내용어가 다른 후보는 점수가 높아도 다른 명령이므로 제외
+        for score, candidate in sorted(matches, reverse=True):
+            if only_particles_differ(normalized, candidate):
+                return candidate, score
+        return None
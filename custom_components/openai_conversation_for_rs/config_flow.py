@@ -8,15 +8,42 @@ from typing import Any
 import voluptuous as vol
 from homeassistant import config_entries
 from homeassistant.const import CONF_API_KEY
+from homeassistant.core import callback
 from homeassistant.data_entry_flow import FlowResult
 from homeassistant.exceptions import HomeAssistantError
 from openai import AsyncAzureOpenAI
 
 from .const import (
     API_VERSION,
+    CONF_CACHE_FRIENDLY_PROMPT,
+    CONF_CACHE_LOOKUP_BUDGET,
+    CONF_CACHE_SIMILARITY_THRESHOLD,
+    CONF_CHAT_HISTORY_TOKEN_BUDGET,
+    CONF_COMPLETION_BUDGET,
     CONF_DEPLOYMENT_NAME,
     CONF_ENDPOINT,
+    CONF_ENTITY_RETRIEVAL_TOP_K,
+    CONF_PIPELINE_TOOL_CALLS,
+    CONF_RESPONSE_BUDGET,
+    CONF_SPECULATIVE_COMPLETION,
+    CONF_SPECULATIVE_MAX_HIT_RATE,
+    CONF_STREAM_RESPONSE,
+    CONF_TOOL_CALL_CONCURRENCY,
+    CONF_TOOL_CALL_TIMEOUT,
     CONVERSATION_AGENT_NAME,
+    DEFAULT_CACHE_FRIENDLY_PROMPT,
+    DEFAULT_CACHE_LOOKUP_BUDGET,
+    DEFAULT_CACHE_SIMILARITY_THRESHOLD,
+    DEFAULT_CHAT_HISTORY_TOKEN_BUDGET,
+    DEFAULT_COMPLETION_BUDGET,
+    DEFAULT_ENTITY_RETRIEVAL_TOP_K,
+    DEFAULT_PIPELINE_TOOL_CALLS,
+    DEFAULT_RESPONSE_BUDGET,
+    DEFAULT_SPECULATIVE_COMPLETION,
+    DEFAULT_SPECULATIVE_MAX_HIT_RATE,
+    DEFAULT_STREAM_RESPONSE,
+    DEFAULT_TOOL_CALL_CONCURRENCY,
+    DEFAULT_TOOL_CALL_TIMEOUT,
     DOMAIN,
     FIXED_ENDPOINT,
 )
@@ -97,6 +124,86 @@ class AzureOpenAIConfigFlow(config_entries.ConfigFlow, domain=DOMAIN):
         """Handle import from configuration.yaml."""
         return await self.async_step_user(user_input)
 
+    @staticmethod
+    @callback
+    def async_get_options_flow(config_entry: config_entries.ConfigEntry) -> AzureOpenAIOptionsFlow:
+        """Get the options flow for this handler."""
+        return AzureOpenAIOptionsFlow(config_entry)
+
+
+class AzureOpenAIOptionsFlow(config_entries.OptionsFlow):
+    """Handle the options of Azure OpenAI."""
+
+    def __init__(self, config_entry: config_entries.ConfigEntry) -> None:
+        """Initialize the options flow."""
+        self._config_entry = config_entry
+
+    async def async_step_init(self, user_input: dict[str, Any] | None = None) -> FlowResult:
+        """Manage the options."""
+        if user_input is not None:
+            return self.async_create_entry(title="", data=user_input)
+
+        options = self._config_entry.options
+        return self.async_show_form(
+            step_id="init",
+            data_schema=vol.Schema(
+                {
+                    vol.Optional(
+                        CONF_CACHE_SIMILARITY_THRESHOLD,
+                        default=options.get(CONF_CACHE_SIMILARITY_THRESHOLD, DEFAULT_CACHE_SIMILARITY_THRESHOLD),
+                    ): vol.All(vol.Coerce(float), vol.Range(min=0.5, max=1.0)),
+                    vol.Optional(
+                        CONF_STREAM_RESPONSE,
+                        default=options.get(CONF_STREAM_RESPONSE, DEFAULT_STREAM_RESPONSE),
+                    ): bool,
+                    vol.Optional(
+                        CONF_PIPELINE_TOOL_CALLS,
+                        default=options.get(CONF_PIPELINE_TOOL_CALLS, DEFAULT_PIPELINE_TOOL_CALLS),
+                    ): bool,
+                    vol.Optional(
+                        CONF_TOOL_CALL_CONCURRENCY,
+                        default=options.get(CONF_TOOL_CALL_CONCURRENCY, DEFAULT_TOOL_CALL_CONCURRENCY),
+                    ): vol.All(vol.Coerce(int), vol.Range(min=1, max=32)),
+                    vol.Optional(
+                        CONF_TOOL_CALL_TIMEOUT,
+                        default=options.get(CONF_TOOL_CALL_TIMEOUT, DEFAULT_TOOL_CALL_TIMEOUT),
+                    ): vol.All(vol.Coerce(float), vol.Range(min=1, max=120)),
+                    vol.Optional(
+                        CONF_CHAT_HISTORY_TOKEN_BUDGET,
+                        default=options.get(CONF_CHAT_HISTORY_TOKEN_BUDGET, DEFAULT_CHAT_HISTORY_TOKEN_BUDGET),
+                    ): vol.All(vol.Coerce(int), vol.Range(min=500, max=100000)),
+                    vol.Optional(
+                        CONF_CACHE_FRIENDLY_PROMPT,
+                        default=options.get(CONF_CACHE_FRIENDLY_PROMPT, DEFAULT_CACHE_FRIENDLY_PROMPT),
+                    ): bool,
+                    vol.Optional(
+                        CONF_SPECULATIVE_COMPLETION,
+                        default=options.get(CONF_SPECULATIVE_COMPLETION, DEFAULT_SPECULATIVE_COMPLETION),
+                    ): bool,
+                    vol.Optional(
+                        CONF_SPECULATIVE_MAX_HIT_RATE,
+                        default=options.get(CONF_SPECULATIVE_MAX_HIT_RATE, DEFAULT_SPECULATIVE_MAX_HIT_RATE),
+                    ): vol.All(vol.Coerce(float), vol.Range(min=0.0, max=1.0)),
+                    vol.Optional(
+                        CONF_RESPONSE_BUDGET,
+                        default=options.get(CONF_RESPONSE_BUDGET, DEFAULT_RESPONSE_BUDGET),
+                    ): vol.All(vol.Coerce(float), vol.Range(min=2, max=120)),
+                    vol.Optional(
+                        CONF_CACHE_LOOKUP_BUDGET,
+                        default=options.get(CONF_CACHE_LOOKUP_BUDGET, DEFAULT_CACHE_LOOKUP_BUDGET),
+                    ): vol.All(vol.Coerce(float), vol.Range(min=0.1, max=30)),
+                    vol.Optional(
+                        CONF_COMPLETION_BUDGET,
+                        default=options.get(CONF_COMPLETION_BUDGET, DEFAULT_COMPLETION_BUDGET),
+                    ): vol.All(vol.Coerce(float), vol.Range(min=1, max=120)),
+                    vol.Optional(
+                        CONF_ENTITY_RETRIEVAL_TOP_K,
+                        default=options.get(CONF_ENTITY_RETRIEVAL_TOP_K, DEFAULT_ENTITY_RETRIEVAL_TOP_K),
+                    ): vol.All(vol.Coerce(int), vol.Range(min=0, max=500)),
+                }
+            ),
+        )
+
 
 class ConfigEntryError(HomeAssistantError):
     """Error while setting up an entry from configuration."""
@@ -3,12 +3,58 @@
 DOMAIN = "azure_openai_conversation_rs_tuned"
 CONF_ENDPOINT = "endpoint"
 CONF_DEPLOYMENT_NAME = "deployment_name"
+CONF_CACHE_SIMILARITY_THRESHOLD = "cache_similarity_threshold"
+CONF_STREAM_RESPONSE = "stream_response"
+CONF_PIPELINE_TOOL_CALLS = "pipeline_tool_calls"
+CONF_TOOL_CALL_CONCURRENCY = "tool_call_concurrency"
+CONF_TOOL_CALL_TIMEOUT = "tool_call_timeout"
+CONF_CHAT_HISTORY_TOKEN_BUDGET = "chat_history_token_budget"
+CONF_CACHE_FRIENDLY_PROMPT = "cache_friendly_prompt"
+CONF_SPECULATIVE_COMPLETION = "speculative_completion"
+CONF_SPECULATIVE_MAX_HIT_RATE = "speculative_max_hit_rate"
+CONF_RESPONSE_BUDGET = "response_budget"
+CONF_CACHE_LOOKUP_BUDGET = "cache_lookup_budget"
+CONF_COMPLETION_BUDGET = "completion_budget"
+CONF_ENTITY_RETRIEVAL_TOP_K = "entity_retrieval_top_k"
 DEFAULT_LANGUAGE = "ko"
 CONVERSATION_AGENT_NAME = "GPT_RS_TUNED"
-API_VERSION = "2024-08-01-preview"
+# stream_options(include_usage)와 usage의 cached_tokens를 지원하는 버전
+API_VERSION = "2024-10-01-preview"
 FIXED_ENDPOINT = "https://remote-solution-fine-tuning.openai.azure.com/"
 CACHE_ENDPOINT = "https://rs-audio-router.azurewebsites.net/api/v1/cache-routing"
 REGISTER_CACHE_ENDPOINT = "https://rs-audio-router.azurewebsites.net/api/v1/cache"
 PATTERN_ENDPOINT = "https://rs-command-crawler.azurewebsites.net/api/v1/user-patterns"
 INIT_CONVERSATION_WORD = "대화 내역 초기화"
 REGISTER_CACHE_WORD = "이전 요청 캐쉬로 등록해줘"
+LOCAL_CACHE_STORAGE_VERSION = 1
+LOCAL_CACHE_MAX_ENTRIES = 2000
+LOCAL_CACHE_TTL = 7 * 24 * 60 * 60
+LOCAL_CACHE_SAVE_DELAY = 30
+CHAT_HISTORY_STORAGE_VERSION = 1
+CHAT_HISTORY_SAVE_DELAY = 10
+CHAT_HISTORY_MAX_RESIDENT_SPEAKERS = 32
+DEFAULT_CACHE_SIMILARITY_THRESHOLD = 0.85
+DEFAULT_STREAM_RESPONSE = False
+RESPONSE_STREAM_TOPIC = "home/speaker/response_stream"
+DEFAULT_PIPELINE_TOOL_CALLS = False
+DEFAULT_TOOL_CALL_CONCURRENCY = 4
+DEFAULT_TOOL_CALL_TIMEOUT = 10
+AUTOMATION_WRITE_DELAY = 0.5
+DEFAULT_CHAT_HISTORY_TOKEN_BUDGET = 6000
+DEFAULT_CACHE_FRIENDLY_PROMPT = False
+PATTERN_REFRESH_INTERVAL = 6 * 60 * 60
+PATTERN_RETRY_DELAY = 60
+DEFAULT_SPECULATIVE_COMPLETION = False
+DEFAULT_SPECULATIVE_MAX_HIT_RATE = 0.3
+SPECULATION_MIN_LOOKUPS = 5
+SPECULATION_HIT_RATE_ALPHA = 0.1
+SPECULATION_MAX_SPEAKERS = 32
+DEFAULT_RESPONSE_BUDGET = 15
+DEFAULT_CACHE_LOOKUP_BUDGET = 1.5
+DEFAULT_COMPLETION_BUDGET = 10
+PATTERN_FETCH_TIMEOUT = 10
+DEFAULT_ENTITY_RETRIEVAL_TOP_K = 0
+ENTITY_RETRIEVAL_HISTORY_TURNS = 2
+# 전체 엔티티 프롬프트의 토큰 수는 절약량 통계용이므로 스냅샷이 바뀌어도 이 간격(초)마다 한 번만 다시 셈
+ENTITY_RETRIEVAL_FULL_COUNT_INTERVAL = 60
+STATS_NOTIFY_INTERVAL = 10
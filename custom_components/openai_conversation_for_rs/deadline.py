@@ -0,0 +1,91 @@
+"""Latency budget of one utterance, shared by the stages that process it."""
+
+import asyncio
+import inspect
+import logging
+import time
+from collections.abc import Awaitable
+from typing import Any, Optional
+
+from .stats import DeadlineStats
+
+_LOGGER = logging.getLogger(__name__)
+
+
+class Deadline:
+    """Deadline of one utterance.
+
+    Every outbound stage runs within the smaller of its own budget and the time left until the deadline. A stage that
+    runs out of time is cancelled and replaced by its fallback, and the degradation is recorded in ``DeadlineStats``
+    together with the latency of every stage, so the budgets can be tuned from real data.
+    """
+
+    def __init__(self, total: float, stats: Optional[DeadlineStats] = None):
+        """Initialize the deadline.
+
+        Args:
+            total: seconds the whole utterance may take
+            stats: statistics the stage latencies and degradations are recorded in
+
+        """
+        self.total = total
+        self.stats = stats
+        self.expires_at = time.monotonic() + total
+        self.degraded_stages: list[str] = []
+
+    @property
+    def degraded(self) -> bool:
+        """Return True if any stage fell back."""
+        return bool(self.degraded_stages)
+
+    def remaining(self) -> float:
+        """Seconds left until the deadline."""
+        return max(0.0, self.expires_at - time.monotonic())
+
+    def budget(self, stage_budget: float) -> float:
+        """Seconds a stage may take, bounded by the time left."""
+        return min(stage_budget, self.remaining())
+
+    def record(self, stage: str, elapsed: float, degraded: bool) -> None:
+        """Record the outcome of a stage."""
+        if degraded:
+            self.degraded_stages.append(stage)
+        if self.stats is not None:
+            self.stats.record_stage(stage, elapsed, degraded)
+
+    async def async_run(self, stage: str, awaitable: Awaitable, stage_budget: float, fallback: Any = None) -> Any:
+        """Await a stage within its budget.
+
+        Args:
+            stage: name of the stage in the statistics
+            awaitable: coroutine or task of the stage, cancelled if it runs out of time
+            stage_budget: seconds the stage may take at most
+            fallback: value returned instead of the result if the stage runs out of time
+
+        Returns:
+            result of the stage, or the fallback
+
+        """
+        timeout = self.budget(stage_budget)
+        start = time.perf_counter()
+        if timeout <= 0:
+            # 남은 시간이 없으면 시작하지 않음
+            if inspect.iscoroutine(awaitable):
+                awaitable.close()
+            elif isinstance(awaitable, asyncio.Future):
+                awaitable.cancel()
+            _LOGGER.warning("No time left for the %s stage, falling back", stage)
+            self.record(stage, 0.0, degraded=True)
+            return fallback
+
+        try:
+            async with asyncio.timeout(timeout):
+                result = await awaitable
+        except TimeoutError:
+            elapsed = time.perf_counter() - start
+            _LOGGER.warning("%s stage exceeded its %.1f s budget, falling back", stage, timeout)
+            self.record(stage, elapsed, degraded=True)
+            return fallback
+
+        self.record(stage, time.perf_counter() - start, degraded=False)
+        return result
@@ -0,0 +1,35 @@
+"""Diagnostics support for the Azure OpenAI GPT conversation RS-Tuned integration."""
+
+from typing import Any
+
+from homeassistant.config_entries import ConfigEntry
+from homeassistant.core import HomeAssistant
+
+from .const import DOMAIN
+
+
+async def async_get_config_entry_diagnostics(hass: HomeAssistant, entry: ConfigEntry) -> dict[str, Any]:
+    """Return diagnostics for a config entry."""
+    agent = hass.data[DOMAIN][entry.entry_id]["agent"]
+
+    return {
+        "endpoint_timings": agent.endpoint_timings.as_dict(),
+        "automation_reload_timings": agent.hass_api_handler.reload_timings.as_dict(),
+        "last_time_to_first_token": agent.last_time_to_first_token,
+        "prompt_cache": agent.prompt_cache_stats.as_dict(),
+        "speculation": agent.speculation_stats.as_dict(),
+        "deadline": agent.deadline_stats.as_dict(),
+        "circuit_breakers": agent.circuit_breakers.as_dict(),
+        "entity_retrieval": agent.entity_retrieval_stats.as_dict(),
+        "tool_calls": {
+            "timeouts": agent.tool_call_scheduler.timeouts,
+            "last_results": [result.as_dict() for result in agent.tool_call_scheduler.last_results],
+        },
+        "response_cache": {
+            "size": agent.response_cache.size,
+            "hits": agent.response_cache.hits,
+            "fuzzy_hits": agent.response_cache.fuzzy_hits,
+            "misses": agent.response_cache.misses,
+            "evictions": agent.response_cache.evictions,
+        },
+    }
@@ -0,0 +1,172 @@
+"""Query-aware retrieval of the entities sent in the entities system prompt."""
+
+import logging
+import math
+import re
+import time
+import unicodedata
+from collections import Counter
+from collections.abc import Iterable
+from typing import Optional
+
+_LOGGER = logging.getLogger(__name__)
+
+NGRAM_SIZES = (2, 3)
+BM25_K1 = 1.2
+BM25_B = 0.75
+_TOKEN_PATTERN = re.compile(r"[^\W_]+")
+# 엔티티 이름에 잘 나오지 않는 기기 종류 표현, "불 꺼줘", "티비 켜줘"처럼 이름 없이 종류로 부르는 명령용
+DOMAIN_ALIASES = {
+    "light": "조명 불 전등 등",
+    "switch": "스위치 전원 플러그 콘센트",
+    "fan": "선풍기 팬 환풍기",
+    "climate": "에어컨 냉방 난방 온도 몇 도",
+    "media_player": "티비 TV 텔레비전 스피커 음악 볼륨",
+    "cover": "커튼 블라인드 창문",
+    "sensor": "센서 온도 습도 몇 도",
+    "humidifier": "가습기 제습기 습도",
+    "vacuum": "청소기 로봇청소기",
+    "lock": "도어락 잠금",
+}
+# "불 다 꺼줘", "모든 조명 꺼줘"처럼 해당하는 엔티티 전부를 가리키는 말
+ALL_WORDS = frozenset(["다", "모두", "모든", "전부", "전체"])
+MIN_MATCHES = 1
+
+
+def _terms(text: str) -> list[str]:
+    """Split a text into character n-grams of its words.
+
+    Korean commands rarely match entity names word for word ("거실불" and "거실 조명"), so words are compared by their
+    character bigrams and trigrams. Words shorter than the smallest n-gram are kept whole.
+    """
+    terms = []
+    for token in _TOKEN_PATTERN.findall(unicodedata.normalize("NFKC", text).lower()):
+        if len(token) < NGRAM_SIZES[0]:
+            terms.append(token)
+            continue
+        for size in NGRAM_SIZES:
+            terms.extend(token[i : i + size] for i in range(len(token) - size + 1))
+    return terms
+
+
+def _entity_text(entity: dict) -> str:
+    """Return the searchable text of an entity info from HaCrawler."""
+    parts = [entity["entity_id"], entity.get("name") or ""]
+    if device := entity.get("device"):
+        parts.extend(name for name in (device.get("name"), device.get("name_by_user")) if name)
+    if area := entity.get("area"):
+        parts.append(area.get("name") or "")
+    parts.extend(str(label) for label in entity.get("labels") or [])
+    parts.append(DOMAIN_ALIASES.get(entity.get("domain"), ""))
+    return " ".join(parts)
+
+
+def tool_call_entity_ids(api_call) -> list[str]:
+    """Return the entity_ids targeted by a home_assistant_api call."""
+    if hasattr(api_call, "arguments"):
+        api_call = api_call.arguments
+
+    entity_ids = []
+    body_entity_id = (api_call.body or {}).get("entity_id")
+    if isinstance(body_entity_id, str):
+        entity_ids.extend(entity_id.strip() for entity_id in body_entity_id.split(","))
+    elif isinstance(body_entity_id, list):
+        entity_ids.extend(str(entity_id) for entity_id in body_entity_id)
+
+    # /api/states/<entity_id> 형태의 조회
+    parts = api_call.endpoint.strip("/").split("/")
+    if len(parts) >= 3 and parts[1] == "states":
+        entity_ids.append(parts[2])
+    return entity_ids
+
+
+class EntityRetriever:
+    """BM25 index over the entities of the HaCrawler snapshot.
+
+    Entity ids, friendly names, device names, area names, labels and Korean aliases of the domain are indexed as
+    character n-grams. The index is rebuilt only when the crawler hands out a new snapshot list, reusing the n-grams
+    of entities whose text did not change, and queries only touch the postings of their own n-grams. A query that
+    matches too few entities gets the whole snapshot, so retrieval never leaves the model without the entity it needs.
+    """
+
+    def __init__(self):
+        """Initialize an empty index."""
+        self._entities: Optional[list[dict]] = None
+        self._postings: dict[str, list[tuple[int, int]]] = {}
+        self._doc_lengths: list[int] = []
+        self._avg_length = 0.0
+        self._entity_terms: dict[str, tuple[str, Counter]] = {}
+
+    def _build(self, entities: list[dict]) -> None:
+        """Index the entities of a snapshot."""
+        start = time.perf_counter()
+        postings: dict[str, list[tuple[int, int]]] = {}
+        doc_lengths = []
+        entity_terms = {}
+        for index, entity in enumerate(entities):
+            # 상태만 바뀐 엔티티는 텍스트가 같으므로 n-gram을 다시 만들지 않음
+            text = _entity_text(entity)
+            cached = self._entity_terms.get(entity["entity_id"])
+            counts = cached[1] if cached is not None and cached[0] == text else Counter(_terms(text))
+            entity_terms[entity["entity_id"]] = (text, counts)
+            doc_lengths.append(sum(counts.values()))
+            for term, count in counts.items():
+                postings.setdefault(term, []).append((index, count))
+
+        self._entities = entities
+        self._entity_terms = entity_terms
+        self._postings = postings
+        self._doc_lengths = doc_lengths
+        self._avg_length = sum(doc_lengths) / len(doc_lengths) if doc_lengths else 0.0
+        _LOGGER.debug(
+            "Indexed %d entities (%d terms) in %.2f ms",
+            len(entities),
+            len(postings),
+            (time.perf_counter() - start) * 1000,
+        )
+
+    def retrieve(
+        self,
+        entities: list[dict],
+        query: str,
+        top_k: int,
+        always_include: Iterable[str] = (),
+        min_matches: int = MIN_MATCHES,
+    ) -> list[dict]:
+        """Return the entities relevant to a query.
+
+        Args:
+            entities: entity snapshot from HaCrawler.get_ha_states
+            query: user input
+            top_k: number of best scoring entities to return, not applied if the query asks for all of them ("다")
+            always_include: entity_ids returned regardless of their score, e.g. those of the previous turns
+            min_matches: minimum number of entities with a positive score, below it the whole snapshot is returned
+
+        Returns:
+            list[dict]: the top_k entities with a positive score plus the always included ones, in snapshot order, or
+                ``entities`` itself if fewer than min_matches entities scored
+
+        """
+        if entities is not self._entities:
+            self._build(entities)
+
+        scores: dict[int, float] = {}
+        document_count = len(entities)
+        for term in set(_terms(query)):
+            if not (postings := self._postings.get(term)):
+                continue
+            idf = math.log(1 + (document_count - len(postings) + 0.5) / (len(postings) + 0.5))
+            for index, count in postings:
+                length_norm = 1 - BM25_B + BM25_B * self._doc_lengths[index] / self._avg_length
+                scores[index] = scores.get(index, 0.0) + idf * count * (BM25_K1 + 1) / (count + BM25_K1 * length_norm)
+
+        if len(scores) < min_matches:
+            _LOGGER.debug("Only %d entities match %s, sending every entity", len(scores), query)
+            return entities
+
+        query_words = set(_TOKEN_PATTERN.findall(unicodedata.normalize("NFKC", query)))
+        limit = None if query_words & ALL_WORDS else top_k
+        selected = set(sorted(scores, key=scores.__getitem__, reverse=True)[:limit])
+        if always_include := set(always_include):
+            selected.update(index for index, entity in enumerate(entities) if entity["entity_id"] in always_include)
+        return [entities[index] for index in sorted(selected)]
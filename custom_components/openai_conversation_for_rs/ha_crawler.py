@@ -1,76 +1,303 @@
+import hashlib
 import logging
+import time
+from collections.abc import Callable
 from datetime import datetime
-from typing import List
+from typing import NamedTuple, Optional
 
-from homeassistant.core import HomeAssistant
+from homeassistant.const import EVENT_SERVICE_REGISTERED, EVENT_SERVICE_REMOVED, EVENT_STATE_CHANGED
+from homeassistant.core import Event, HomeAssistant, State, callback
 from homeassistant.helpers import area_registry as ar
 from homeassistant.helpers import device_registry as dr
+from homeassistant.helpers import entity_registry as er
+
+from .const import DOMAIN
+from .prompt_generator import dump_prompt_yaml
 
 _LOGGER = logging.getLogger(__name__)
 
+FILTERED_STATE_DOMAINS = frozenset(
+    [
+        "update",
+        "tts",
+        "conversation",
+        "person",
+        "zone",
+        "sun",
+        "todo",
+        "binary_sensor",
+    ]
+)
+
+FILTERED_ENTITY_IDS = frozenset(
+    [
+        "binary_sensor.rpi_power_status",
+        "device_tracker.sm_s926n",
+        "sensor.sm_s926n_battery_level",
+        "sensor.sm_s926n_battery_state",
+        "sensor.sm_s926n_charger_type",
+        "script.script",
+        "sensor.sun_next_noon",
+        "sensor.sun_next_rising",
+        "sensor.sun_next_setting",
+        "sensor.speaker_status",
+        "sensor.sun_next_dusk",
+        "sensor.sun_next_midnight",
+        "sensor.sun_next_dawn",
+        "number.geosildeung_smooth_on",
+        "number.geosildeung_smooth_off",
+        "select.geosildeung_light_preset",
+        "sensor.geosildeung_signal_level",
+        "switch.geosildeung_auto_update_enabled",
+        "number.cimsil_deung_smooth_on",
+        "number.cimsil_deung_smooth_off",
+        "select.cimsil_deung_light_preset",
+        "sensor.cimsil_deung_signal_level",
+        "switch.cimsil_deung_auto_update_enabled",
+        "number.geosil_teibeul_seutaendeu_deung_smooth_on",
+        "number.geosil_teibeul_seutaendeu_deung_smooth_off",
+        "select.geosil_teibeul_seutaendeu_deung_light_preset",
+        "sensor.geosil_teibeul_seutaendeu_deung_signal_level",
+        "switch.geosil_teibeul_seutaendeu_deung_auto_update_enabled",
+        "number.hwajangsil_deung_smooth_on",
+        "number.hwajangsil_deung_smooth_off",
+        "select.hwajangsil_deung_light_preset",
+        "sensor.hwajangsil_deung_signal_level",
+        "switch.hwajangsil_deung_auto_update_enabled",
+        "sensor.robosceongsogi_sensor_dirty_left",
+        "sensor.robosceongsogi_filter_left",
+        "sensor.robosceongsogi_side_brush_left",
+        "sensor.robosceongsogi_main_brush_left",
+        "sensor.robosceongsogi_last_clean_area",
+        "sensor.robosceongsogi_current_clean_area",
+    ]
+)
+
+
+class ServicesCatalog(NamedTuple):
+    """Filtered services with their pre-rendered prompt YAML."""
+
+    services: list[dict]
+    prompt_yaml: str
+    content_hash: str
+
 
 class HaCrawler:
-    """Class to crawl Home Assistant data"""
+    """Class to crawl Home Assistant data
+
+    The filtered entity list is kept as a live index keyed by entity_id. It is built once and then patched from
+    state/device/area registry events, so a request only reads the already-built snapshot. Every entity update bumps
+    its version in ``entity_versions`` so prompt renderers can reuse fragments of unchanged entities. The services
+    catalog is memoized the same way and only rebuilt after a service is registered or removed.
+    """
 
     def __init__(self, hass: HomeAssistant):
         self.hass = hass
         self._device_registry = dr.async_get(hass)
         self._area_registry = ar.async_get(hass)
+        self._entity_registry = er.async_get(hass)
+        self._entities: dict[str, dict] = {}
+        self._entity_versions: dict[str, int] = {}
+        self._version = 0
+        self._snapshot: Optional[list[dict]] = None
+        self._index_ready = False
+        self._services_catalog: Optional[ServicesCatalog] = None
+        self._unsub_listeners: list[Callable[[], None]] = []
+
+    @callback
+    def async_start(self) -> None:
+        """Build the entity index and start listening for changes."""
+        if self._unsub_listeners:
+            return
+
+        self._unsub_listeners = [
+            self.hass.bus.async_listen(EVENT_STATE_CHANGED, self._async_state_changed),
+            self.hass.bus.async_listen(dr.EVENT_DEVICE_REGISTRY_UPDATED, self._async_device_registry_updated),
+            self.hass.bus.async_listen(ar.EVENT_AREA_REGISTRY_UPDATED, self._async_area_registry_updated),
+            self.hass.bus.async_listen(EVENT_SERVICE_REGISTERED, self._async_services_changed),
+            self.hass.bus.async_listen(EVENT_SERVICE_REMOVED, self._async_services_changed),
+        ]
+        self._rebuild_index()
+
+    @callback
+    def async_stop(self) -> None:
+        """Stop listening for changes and drop the entity index."""
+        while self._unsub_listeners:
+            self._unsub_listeners.pop()()
+
+        self._entities.clear()
+        self._entity_versions.clear()
+        self._snapshot = None
+        self._index_ready = False
+        self._services_catalog = None
 
     def get_ha_states(self) -> dict:
         """Get the Home Assistant contexts."""
         now = datetime.now()
 
+        if not self._index_ready:
+            self._rebuild_index()
+
+        if self._snapshot is None:
+            self._snapshot = list(self._entities.values())
+
         # 시간 관련 컨텍스트 구성
-        context = {
+        return {
             "time": now.strftime("%H:%M:%S"),
             "date": now.strftime("%Y-%m-%d"),
             "weekday": now.strftime("%A"),
-            "entities": [],
+            "entities": self._snapshot,
+            "entity_versions": self._entity_versions,
         }
 
+    def _rebuild_index(self) -> None:
+        """Rebuild the entity index from every state (cold path)."""
+        start = time.perf_counter()
+
+        self._entities.clear()
+        self._entity_versions.clear()
+
         # 모든 엔티티 상태 수집
-        for entity_id in self.hass.states.async_entity_ids():
-            state = self.hass.states.get(entity_id)
-            if not state:
-                continue
-
-            # 디바이스 정보 가져오기
-            device_id = state.attributes.get("device_id")
-            device = None
-            if device_id:
-                device = self._device_registry.async_get(device_id)
-
-            # 영역 정보 가져오기
-            area_id = state.attributes.get("area_id")
-            area = None
-            if area_id:
-                area = self._area_registry.async_get_area(area_id)
-
-            entity_info = {
-                "entity_id": entity_id,
-                "name": state.attributes.get("friendly_name", entity_id),
-                "state": state.state,
-                "domain": entity_id.split(".")[0],
-                "device": {
-                    "id": device_id,
-                    "name": device.name if device else None,
-                    "name_by_user": device.name_by_user if device else None,
-                    "model": device.model if device else None,
-                    "manufacturer": device.manufacturer if device else None,
-                }
-                if device
-                else None,
-                "area": {"id": area_id, "name": area.name if area else None} if area else None,
-                "labels": state.attributes.get("labels", []),
+        for state in self.hass.states.async_all():
+            self._update_entity(state)
+
+        self._snapshot = None
+        self._index_ready = True
+        _LOGGER.debug(
+            "Rebuilt entity index: %d entities in %.2f ms", len(self._entities), (time.perf_counter() - start) * 1000
+        )
+
+    def _update_entity(self, state: Optional[State]) -> bool:
+        """Insert or replace one entity in the index.
+
+        Returns:
+            bool: True if the prompt-facing info of the entity changed
+
+        """
+        if state is None:
+            return False
+
+        entity_id = state.entity_id
+        if self._is_filtered_entity(entity_id, state.domain):
+            return False
+
+        # 프롬프트에 쓰이는 필드가 같으면 last_changed나 다른 속성만 바뀐 것이므로 무시
+        entity_info = self._build_entity_info(state)
+        if self._entities.get(entity_id) == entity_info:
+            return False
+
+        # 엔티티 정보는 매번 새 dict로 교체하여 스냅샷을 읽는 쪽과 공유되지 않도록 함
+        self._entities[entity_id] = entity_info
+        self._version += 1
+        self._entity_versions[entity_id] = self._version
+        return True
+
+    def _remove_entity(self, entity_id: str) -> bool:
+        """Drop one entity from the index, returning True if it was indexed."""
+        self._entity_versions.pop(entity_id, None)
+        return self._entities.pop(entity_id, None) is not None
+
+    def _build_entity_info(self, state: State) -> dict:
+        """Build the prompt-facing entity info of a state."""
+        # 디바이스 정보 가져오기
+        device_id = state.attributes.get("device_id")
+        device = None
+        if device_id:
+            device = self._device_registry.async_get(device_id)
+
+        # 영역 정보 가져오기
+        area_id = state.attributes.get("area_id")
+        area = None
+        if area_id:
+            area = self._area_registry.async_get_area(area_id)
+
+        return {
+            "entity_id": state.entity_id,
+            "name": state.attributes.get("friendly_name", state.entity_id),
+            "state": state.state,
+            "domain": state.domain,
+            "device": {
+                "id": device_id,
+                "name": device.name if device else None,
+                "name_by_user": device.name_by_user if device else None,
+                "model": device.model if device else None,
+                "manufacturer": device.manufacturer if device else None,
             }
+            if device
+            else None,
+            "area": {"id": area_id, "name": area.name if area else None} if area else None,
+            "labels": state.attributes.get("labels", []),
+        }
+
+    @callback
+    def _async_state_changed(self, event: Event) -> None:
+        """Patch the index for one changed entity."""
+        entity_id = event.data["entity_id"]
+        new_state = event.data.get("new_state")
+
+        changed = self._remove_entity(entity_id) if new_state is None else self._update_entity(new_state)
+        if changed:
+            self._snapshot = None
+
+    @callback
+    def _async_device_registry_updated(self, event: Event) -> None:
+        """Refresh the entities that reference an updated device."""
+        self._refresh_entities_by_attribute("device_id", event.data.get("device_id"))
+
+    @callback
+    def _async_area_registry_updated(self, event: Event) -> None:
+        """Refresh the entities that reference an updated area."""
+        self._refresh_entities_by_attribute("area_id", event.data.get("area_id"))
+
+    def _refresh_entities_by_attribute(self, key: str, value: Optional[str]) -> None:
+        """Rebuild the entity info of every indexed entity whose state has ``key == value``."""
+        if not value:
+            return
 
-            context["entities"].append(entity_info)
+        refreshed = False
+        for entity_id in list(self._entities):
+            state = self.hass.states.get(entity_id)
+            if state is None:
+                refreshed |= self._remove_entity(entity_id)
+            elif state.attributes.get(key) == value:
+                refreshed |= self._update_entity(state)
+
+        if refreshed:
+            self._snapshot = None
 
-        return self.filter_states(context)
+    @callback
+    def _async_services_changed(self, event: Event) -> None:
+        """Drop the services catalog so the next request rebuilds it."""
+        self._services_catalog = None
 
-    def get_services(self) -> List[dict]:
+    def get_services(self) -> list[dict]:
         """Get the Home Assistant services."""
+        return self.get_services_catalog().services
+
+    def get_services_catalog(self) -> ServicesCatalog:
+        """Get the memoized services catalog, rebuilding it only after the service registry changed."""
+        if self._services_catalog is None:
+            self._services_catalog = self._build_services_catalog()
+
+        return self._services_catalog
+
+    def _build_services_catalog(self) -> ServicesCatalog:
+        """Collect, filter and render the Home Assistant services."""
+        start = time.perf_counter()
+        services = self._collect_services()
+        prompt_yaml = dump_prompt_yaml(services)
+        content_hash = hashlib.sha256(prompt_yaml.encode("utf-8")).hexdigest()
+
+        _LOGGER.debug(
+            "Rebuilt services catalog: %d domains, hash %s in %.2f ms",
+            len(services),
+            content_hash[:12],
+            (time.perf_counter() - start) * 1000,
+        )
+        return ServicesCatalog(services=services, prompt_yaml=prompt_yaml, content_hash=content_hash)
+
+    def _collect_services(self) -> list[dict]:
+        """Collect the filtered Home Assistant services."""
         services = []
 
         # 서비스 정보 수집
@@ -88,73 +315,25 @@ class HaCrawler:
 
         return self.filter_services(services)
 
+    def _is_filtered_entity(self, entity_id: str, domain: str) -> bool:
+        """Return True if the entity should be kept out of the prompt."""
+        if domain in FILTERED_STATE_DOMAINS or entity_id in FILTERED_ENTITY_IDS:
+            return True
+
+        # 이 통합구성요소의 통계 센서는 프롬프트에 넣지 않음
+        registry_entry = self._entity_registry.async_get(entity_id)
+        return registry_entry is not None and registry_entry.platform == DOMAIN
+
     def filter_states(self, states: dict) -> dict:
         """Filter the Home Assistant states."""
-        to_filter_domain = [
-            "update",
-            "tts",
-            "conversation",
-            "person",
-            "zone",
-            "sun",
-            "todo",
-            "binary_sensor",
-        ]
-        to_filter_entity_id = [
-            "binary_sensor.rpi_power_status",
-            "device_tracker.sm_s926n",
-            "sensor.sm_s926n_battery_level",
-            "sensor.sm_s926n_battery_state",
-            "sensor.sm_s926n_charger_type",
-            "script.script",
-            "sensor.sun_next_noon",
-            "sensor.sun_next_rising",
-            "sensor.sun_next_setting",
-            "sensor.speaker_status",
-            "sensor.sun_next_dusk",
-            "sensor.sun_next_midnight",
-            "sensor.sun_next_dawn",
-            "number.geosildeung_smooth_on",
-            "number.geosildeung_smooth_off",
-            "select.geosildeung_light_preset",
-            "sensor.geosildeung_signal_level",
-            "switch.geosildeung_auto_update_enabled",
-            "number.cimsil_deung_smooth_on",
-            "number.cimsil_deung_smooth_off",
-            "select.cimsil_deung_light_preset",
-            "sensor.cimsil_deung_signal_level",
-            "switch.cimsil_deung_auto_update_enabled",
-            "number.geosil_teibeul_seutaendeu_deung_smooth_on",
-            "number.geosil_teibeul_seutaendeu_deung_smooth_off",
-            "select.geosil_teibeul_seutaendeu_deung_light_preset",
-            "sensor.geosil_teibeul_seutaendeu_deung_signal_level",
-            "switch.geosil_teibeul_seutaendeu_deung_auto_update_enabled",
-            "number.hwajangsil_deung_smooth_on",
-            "number.hwajangsil_deung_smooth_off",
-            "select.hwajangsil_deung_light_preset",
-            "sensor.hwajangsil_deung_signal_level",
-            "switch.hwajangsil_deung_auto_update_enabled",
-            "sensor.robosceongsogi_sensor_dirty_left",
-            "sensor.robosceongsogi_filter_left",
-            "sensor.robosceongsogi_side_brush_left",
-            "sensor.robosceongsogi_main_brush_left",
-            "sensor.robosceongsogi_last_clean_area",
-            "sensor.robosceongsogi_current_clean_area",
+        states["entities"] = [
+            entity
+            for entity in states["entities"]
+            if not self._is_filtered_entity(entity.get("entity_id"), entity.get("domain"))
         ]
-
-        filtered_entities = []
-        for entity in states["entities"]:
-            entity_id = entity.get("entity_id")
-            domain = entity.get("domain")
-            if domain in to_filter_domain or entity_id in to_filter_entity_id:
-                continue
-
-            filtered_entities.append(entity)
-
-        states["entities"] = filtered_entities
         return states
 
-    def filter_services(self, services: List[dict]) -> List[dict]:
+    def filter_services(self, services: list[dict]) -> list[dict]:
         """Filter the Home Assistant services."""
         to_filter_domain = [
             "homeassistant",
@@ -0,0 +1,128 @@
+"""Shared HTTP client for the rs-audio-router and rs-command-crawler endpoints."""
+
+import logging
+import time
+from collections.abc import AsyncIterator
+from contextlib import asynccontextmanager
+from types import SimpleNamespace
+
+import aiohttp
+
+_LOGGER = logging.getLogger(__name__)
+
+CONNECTOR_LIMIT = 20
+CONNECTOR_LIMIT_PER_HOST = 8
+DNS_CACHE_TTL = 300
+KEEPALIVE_TIMEOUT = 60
+
+
+class EndpointStats:
+    """Latency and connection statistics of one endpoint."""
+
+    def __init__(self):
+        """Initialize the statistics."""
+        self.count = 0
+        self.failures = 0
+        self.last_ms = 0.0
+        self.max_ms = 0.0
+        self.total_ms = 0.0
+        self.new_connections = 0
+        self.reused_connections = 0
+
+    @property
+    def avg_ms(self) -> float:
+        """Average latency in milliseconds."""
+        return self.total_ms / self.count if self.count else 0.0
+
+    def record(self, elapsed_ms: float, success: bool) -> None:
+        """Record one measured call."""
+        self.count += 1
+        self.last_ms = elapsed_ms
+        self.total_ms += elapsed_ms
+        self.max_ms = max(self.max_ms, elapsed_ms)
+        if not success:
+            self.failures += 1
+
+    def as_dict(self) -> dict:
+        """Return the statistics as a dictionary."""
+        return {
+            "count": self.count,
+            "failures": self.failures,
+            "last_ms": round(self.last_ms, 1),
+            "avg_ms": round(self.avg_ms, 1),
+            "max_ms": round(self.max_ms, 1),
+            "new_connections": self.new_connections,
+            "reused_connections": self.reused_connections,
+        }
+
+
+class EndpointTimings:
+    """Per-endpoint latency timings of the shared client session.
+
+    Connection reuse is counted through aiohttp tracing, so the timings show whether keep-alive is working.
+    """
+
+    def __init__(self):
+        """Initialize the timings."""
+        self._stats: dict[str, EndpointStats] = {}
+
+    def get(self, endpoint: str) -> EndpointStats:
+        """Get the statistics of an endpoint."""
+        return self._stats.setdefault(endpoint, EndpointStats())
+
+    def as_dict(self) -> dict[str, dict]:
+        """Return the statistics of every endpoint."""
+        return {endpoint: stats.as_dict() for endpoint, stats in self._stats.items()}
+
+    @asynccontextmanager
+    async def measure(self, endpoint: str) -> AsyncIterator[dict]:
+        """Measure one request to an endpoint.
+
+        Yields:
+            dict: keyword arguments to pass to the aiohttp request so the connection tracing is attributed
+
+        """
+        stats = self.get(endpoint)
+        start = time.perf_counter()
+        success = False
+        try:
+            yield {"trace_request_ctx": SimpleNamespace(endpoint=endpoint)}
+            success = True
+        finally:
+            elapsed_ms = (time.perf_counter() - start) * 1000
+            stats.record(elapsed_ms, success)
+            _LOGGER.debug(
+                "%s request took %.1f ms (avg %.1f ms, new connections %d, reused %d)",
+                endpoint,
+                elapsed_ms,
+                stats.avg_ms,
+                stats.new_connections,
+                stats.reused_connections,
+            )
+
+    def trace_config(self) -> aiohttp.TraceConfig:
+        """Create a trace config counting new and reused connections per endpoint."""
+        trace_config = aiohttp.TraceConfig()
+
+        async def on_connection_create_end(session, context, params):
+            if endpoint := getattr(context.trace_request_ctx, "endpoint", None):
+                self.get(endpoint).new_connections += 1
+
+        async def on_connection_reuseconn(session, context, params):
+            if endpoint := getattr(context.trace_request_ctx, "endpoint", None):
+                self.get(endpoint).reused_connections += 1
+
+        trace_config.on_connection_create_end.append(on_connection_create_end)
+        trace_config.on_connection_reuseconn.append(on_connection_reuseconn)
+        return trace_config
+
+
+def create_client_session(timings: EndpointTimings) -> aiohttp.ClientSession:
+    """Create the integration-scoped client session with a keep-alive connector."""
+    connector = aiohttp.TCPConnector(
+        limit=CONNECTOR_LIMIT,
+        limit_per_host=CONNECTOR_LIMIT_PER_HOST,
+        ttl_dns_cache=DNS_CACHE_TTL,
+        keepalive_timeout=KEEPALIVE_TIMEOUT,
+    )
+    return aiohttp.ClientSession(connector=connector, trace_configs=[timings.trace_config()])
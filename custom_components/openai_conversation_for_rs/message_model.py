@@ -1,18 +1,112 @@
-"""Message models for the chat completion API"""
+"""Message models for the chat completion API
+
+Messages are slotted dataclasses, so they are cheap to create, store and serialize. Data coming from outside, like
+model responses, cached responses or stored history, is validated with the pydantic schemas at the boundary by
+``AssistantMessage.from_dict`` and ``message_from_dict``.
+"""
 
 import json
 import time
-from typing import Any, List, Literal, Optional
+from dataclasses import dataclass, field
+from typing import List, Literal, Optional
 
-from openai.types.chat.chat_completion_message_tool_call import (
-    ChatCompletionMessageToolCall,
-    Function,
-)
 from pydantic import BaseModel
 from requests.models import Response
 
 
-class BaseMessage(BaseModel):
+def parse_api_call_arguments(arguments: str) -> dict:
+    """Parse the JSON arguments of a home_assistant_api tool call"""
+    api_call = json.loads(arguments)
+    api_call["endpoint"] = api_call["endpoint"].replace("{automation_id}", f"{time.time()}")
+    return api_call
+
+
+class ApiCallSchema(BaseModel):
+    """API call schema"""
+
+    method: Literal["get", "post", "delete"]
+    endpoint: str
+    body: dict = {}
+
+
+class ApiCallFunctionSchema(BaseModel):
+    """API call function schema"""
+
+    name: str
+    arguments: ApiCallSchema
+
+
+class AssistantMessageToolCallSchema(BaseModel):
+    """Assistant message tool call schema"""
+
+    id: str
+    type: Literal["function"] = "function"
+    function: ApiCallFunctionSchema
+
+
+@dataclass(slots=True)
+class ApiCall:
+    """API call model"""
+
+    method: str
+    endpoint: str
+    body: dict = field(default_factory=dict)
+
+    def to_dict(self) -> dict:
+        return {"method": self.method, "endpoint": self.endpoint, "body": self.body}
+
+
+@dataclass(slots=True)
+class ApiCallFunction:
+    """API call function model"""
+
+    name: str
+    arguments: ApiCall
+
+
+@dataclass(slots=True)
+class AssistantMessageToolCall:
+    """Assistant message tool call model"""
+
+    id: str
+    function: ApiCallFunction
+    type: str = "function"
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "AssistantMessageToolCall":
+        """Create a tool call from the chat completion format, validating it"""
+        function = data["function"]
+        arguments = function["arguments"]
+        if isinstance(arguments, str):
+            arguments = parse_api_call_arguments(arguments)
+
+        schema = AssistantMessageToolCallSchema.model_validate(
+            {**data, "function": {**function, "arguments": arguments}}
+        )
+        api_call = schema.function.arguments
+        return cls(
+            id=schema.id,
+            type=schema.type,
+            function=ApiCallFunction(
+                name=schema.function.name,
+                arguments=ApiCall(method=api_call.method, endpoint=api_call.endpoint, body=api_call.body),
+            ),
+        )
+
+    def to_dict(self, to_str_arguments: bool = False) -> dict:
+        arguments = self.function.arguments.to_dict()
+        if to_str_arguments:
+            arguments = json.dumps(arguments, ensure_ascii=False, separators=(",", ":"))
+
+        return {
+            "id": self.id,
+            "type": self.type,
+            "function": {"name": self.function.name, "arguments": arguments},
+        }
+
+
+@dataclass(slots=True, kw_only=True)
+class BaseMessage:
     """Base message model"""
 
     id: Optional[int] = None
@@ -28,11 +122,11 @@ class BaseMessage(BaseModel):
         }
 
 
+@dataclass(slots=True, kw_only=True)
 class UserMessage(BaseMessage):
     """User message model"""
 
     role: str = "user"
-    content: str
     name: Optional[str] = None
 
     def to_dict(self) -> dict:
@@ -48,11 +142,11 @@ class UserMessage(BaseMessage):
         return ret
 
 
+@dataclass(slots=True, kw_only=True)
 class SystemMessage(BaseMessage):
     """System message model"""
 
     role: str = "system"
-    content: str
     name: Optional[str] = None
 
     def to_dict(self) -> dict:
@@ -68,42 +162,30 @@ class SystemMessage(BaseMessage):
         return ret
 
 
-class ApiCall(BaseModel):
-    """API call model"""
-
-    method: Literal["get", "post", "delete"]
-    endpoint: str
-    body: dict = {}
-
-
-class ApiCallFunction(Function):
-    """API call function model"""
-
-    arguments: ApiCall
-
-
-class AssistantMessageToolCall(ChatCompletionMessageToolCall):
-    """Assistant message tool call model"""
-
-    function: ApiCallFunction
-
-
+@dataclass(slots=True, kw_only=True)
 class AssistantMessage(BaseMessage):
     """Assistant message model"""
 
     role: str = "assistant"
     content: Optional[str] = None
-    tool_calls: List[AssistantMessageToolCall] = []
+    tool_calls: List[AssistantMessageToolCall] = field(default_factory=list)
 
-    def __init__(self, /, **data: Any) -> None:
-        if "tool_calls" in data:
-            for tool_call in data["tool_calls"]:
-                if isinstance(tool_call["function"]["arguments"], str):
-                    api_call = json.loads(tool_call["function"]["arguments"])
-                    api_call["endpoint"] = api_call["endpoint"].replace("{automation_id}", f"{time.time()}")
-                    tool_call["function"]["arguments"] = api_call
+    @classmethod
+    def from_dict(cls, data: dict) -> "AssistantMessage":
+        """Create an assistant message from the chat completion format, validating its tool calls"""
+        tool_calls = []
+        for tool_call in data.get("tool_calls") or []:
+            # 이미 파싱된 AssistantMessageToolCall은 그대로 사용
+            if not isinstance(tool_call, AssistantMessageToolCall):
+                tool_call = AssistantMessageToolCall.from_dict(tool_call)
+            tool_calls.append(tool_call)
 
-        super().__init__(**data)
+        return cls(
+            id=data.get("id"),
+            role=data.get("role") or "assistant",
+            content=data.get("content"),
+            tool_calls=tool_calls,
+        )
 
     def to_dict(self, to_str_arguments: bool = True) -> dict:
         ret = {
@@ -113,31 +195,17 @@ class AssistantMessage(BaseMessage):
         if self.content:
             ret["content"] = self.content
 
-        tool_calls = []
         if self.tool_calls:
-            for tool_call in self.tool_calls:
-                tool_call_dict = tool_call.model_dump()
-
-                if to_str_arguments:
-                    arguments = tool_call.function.arguments.json(ensure_ascii=False)
-
-                    tool_call_dict["function"] = {
-                        "arguments": arguments,
-                        "name": tool_call.function.name,
-                    }
-
-                tool_calls.append(tool_call_dict)
-
-            ret["tool_calls"] = tool_calls
+            ret["tool_calls"] = [tool_call.to_dict(to_str_arguments=to_str_arguments) for tool_call in self.tool_calls]
 
         return ret
 
 
+@dataclass(slots=True, kw_only=True)
 class ToolMessage(BaseMessage):
     """Tool message model"""
 
     role: str = "tool"
-    content: str
     tool_call_id: str
 
     @classmethod
@@ -160,3 +228,18 @@ class ToolMessage(BaseMessage):
             "content": self.content,
             "tool_call_id": self.tool_call_id,
         }
+
+
+MESSAGE_TYPES = {
+    "user": UserMessage,
+    "system": SystemMessage,
+    "assistant": AssistantMessage,
+    "tool": ToolMessage,
+}
+
+
+def message_from_dict(data: dict) -> BaseMessage:
+    """Create a message from its to_dict form"""
+    if data["role"] == "assistant":
+        return AssistantMessage.from_dict(data)
+    return MESSAGE_TYPES[data["role"]](**data)
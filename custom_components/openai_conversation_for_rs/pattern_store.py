@@ -0,0 +1,186 @@
+"""User patterns from the command crawler, served from memory and refreshed in the background."""
+
+import asyncio
+import logging
+import time
+from collections.abc import Callable
+from dataclasses import dataclass, field
+from datetime import timedelta
+from typing import Optional
+
+import aiohttp
+from homeassistant.core import HomeAssistant, callback
+from homeassistant.helpers.event import async_track_time_interval
+
+from .circuit_breaker import CircuitBreakers
+from .const import PATTERN_ENDPOINT, PATTERN_FETCH_TIMEOUT, PATTERN_REFRESH_INTERVAL, PATTERN_RETRY_DELAY
+from .http_client import EndpointTimings
+
+_LOGGER = logging.getLogger(__name__)
+
+
+@dataclass(slots=True)
+class SpeakerPatterns:
+    """Patterns of one speaker with the validators of the response they came from."""
+
+    patterns: list[str] = field(default_factory=list)
+    etag: Optional[str] = None
+    last_modified: Optional[str] = None
+    next_refresh: float = 0.0
+    version: int = 0
+
+
+class UserPatternStore:
+    """User patterns of the speakers, served stale-while-revalidate.
+
+    Reads never wait for the network: they return the patterns in memory and, if those are older than
+    ``refresh_interval``, start a refresh in the background. Every known speaker is also refreshed on the same
+    interval. Refreshes send the ETag and Last-Modified of the previous response, so an unchanged pattern list costs
+    a 304 without a body. The rendered user pattern prompt is memoized per speaker until the patterns or the
+    template change.
+    """
+
+    def __init__(
+        self,
+        hass: HomeAssistant,
+        session: aiohttp.ClientSession,
+        api_key: str,
+        endpoint_timings: EndpointTimings,
+        circuit_breakers: CircuitBreakers,
+        refresh_interval: float = PATTERN_REFRESH_INTERVAL,
+    ):
+        """Initialize the store."""
+        self.hass = hass
+        self.session = session
+        self.api_key = api_key
+        self.endpoint_timings = endpoint_timings
+        self.circuit_breakers = circuit_breakers
+        self.refresh_interval = refresh_interval
+        self._speakers: dict[str, SpeakerPatterns] = {}
+        self._refreshing: dict[str, asyncio.Task[None]] = {}
+        self._prompts: dict[str, tuple[int, str, str, str]] = {}
+        self._unsub_refresh: Optional[Callable[[], None]] = None
+
+    @callback
+    def async_start(self, speaker_ids: list[str]) -> None:
+        """Fetch the patterns of the given speakers and refresh every known speaker periodically."""
+        for speaker_id in speaker_ids:
+            self.async_refresh(speaker_id)
+
+        if self._unsub_refresh is None:
+            self._unsub_refresh = async_track_time_interval(
+                self.hass, self._async_refresh_all, timedelta(seconds=self.refresh_interval)
+            )
+
+    async def async_stop(self) -> None:
+        """Stop the periodic refresh and wait until the running refreshes are cancelled."""
+        if self._unsub_refresh is not None:
+            self._unsub_refresh()
+            self._unsub_refresh = None
+
+        tasks = list(self._refreshing.values())
+        for task in tasks:
+            task.cancel()
+        self._refreshing.clear()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    @callback
+    def _async_refresh_all(self, _now=None) -> None:
+        """Refresh every known speaker."""
+        for speaker_id in list(self._speakers):
+            self.async_refresh(speaker_id)
+
+    @callback
+    def async_refresh(self, speaker_id: str) -> None:
+        """Start refreshing the patterns of a speaker unless a refresh is already running."""
+        if speaker_id in self._refreshing:
+            return
+
+        task = self.hass.async_create_task(self._async_fetch(speaker_id))
+        self._refreshing[speaker_id] = task
+        task.add_done_callback(lambda _: self._refreshing.pop(speaker_id, None))
+
+    @callback
+    def get_patterns(self, speaker_id: str) -> list[str]:
+        """Get the patterns of a speaker from memory, refreshing them in the background if they are stale."""
+        entry = self._speakers.setdefault(speaker_id, SpeakerPatterns())
+        if time.monotonic() >= entry.next_refresh:
+            self.async_refresh(speaker_id)
+        return entry.patterns
+
+    @callback
+    def get_prompt(self, speaker_id: str, template: str, demo_patterns: str) -> str:
+        """Get the user pattern prompt of a speaker.
+
+        Args:
+            speaker_id: speaker whose patterns are used
+            template: user pattern prompt with a "[User Patterns]" placeholder
+            demo_patterns: text used in place of the patterns while the speaker has none
+
+        Returns:
+            str: rendered prompt, memoized until the patterns or the template change
+
+        """
+        patterns = self.get_patterns(speaker_id)
+        version = self._speakers[speaker_id].version
+        memo = self._prompts.get(speaker_id)
+        if memo is not None and memo[:3] == (version, template, demo_patterns):
+            return memo[3]
+
+        user_patterns = "\n".join(f"- {pattern}" for pattern in patterns) if patterns else demo_patterns
+        prompt = template.replace("[User Patterns]", user_patterns)
+        self._prompts[speaker_id] = (version, template, demo_patterns, prompt)
+        return prompt
+
+    async def _async_fetch(self, speaker_id: str) -> None:
+        """Fetch the patterns of a speaker with a conditional request."""
+        entry = self._speakers.setdefault(speaker_id, SpeakerPatterns())
+        if not self.circuit_breakers.allow_request("pattern"):
+            _LOGGER.debug("pattern circuit is open, keeping the patterns of %s", speaker_id)
+            entry.next_refresh = time.monotonic() + PATTERN_RETRY_DELAY
+            return
+
+        headers = {"x-functions-key": self.api_key}
+        if entry.etag:
+            headers["If-None-Match"] = entry.etag
+        if entry.last_modified:
+            headers["If-Modified-Since"] = entry.last_modified
+
+        quoted_speaker_id = speaker_id.replace(":", "%3A").upper()
+        request_url = f"{PATTERN_ENDPOINT}?mac_address={quoted_speaker_id}"
+        _LOGGER.debug("User-pattern request: %s", request_url)
+        start = time.perf_counter()
+        healthy = False
+        try:
+            async with self.endpoint_timings.measure("pattern") as trace_kwargs, self.session.get(
+                request_url, headers=headers, timeout=aiohttp.ClientTimeout(total=PATTERN_FETCH_TIMEOUT), **trace_kwargs
+            ) as response:
+                healthy = response.status < 500
+                if response.status == 304:
+                    _LOGGER.debug("%s patterns not modified", speaker_id)
+                    entry.next_refresh = time.monotonic() + self.refresh_interval
+                    return
+                if response.status != 200:
+                    _LOGGER.info("Failed with status code: %s", response.status)
+                    _LOGGER.info("Error response: %s", await response.text())
+                    entry.next_refresh = time.monotonic() + PATTERN_RETRY_DELAY
+                    return
+
+                result = await response.json()
+                patterns = [pattern["pattern_description"] for pattern in result.get("user_patterns", [])]
+                entry.etag = response.headers.get("ETag")
+                entry.last_modified = response.headers.get("Last-Modified")
+        except Exception as err:
+            healthy = False
+            # 실패해도 기존 패턴을 계속 사용하고 잠시 후 다시 시도
+            _LOGGER.warning("Failed to refresh the patterns of %s: %s", speaker_id, err)
+            entry.next_refresh = time.monotonic() + PATTERN_RETRY_DELAY
+            return
+        finally:
+            self.circuit_breakers.record("pattern", time.perf_counter() - start, healthy)
+
+        entry.next_refresh = time.monotonic() + self.refresh_interval
+        if patterns != entry.patterns:
+            entry.patterns = patterns
+            entry.version += 1
+            _LOGGER.info("%s patterns: %s", speaker_id, patterns)
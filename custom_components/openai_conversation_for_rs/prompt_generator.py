@@ -2,32 +2,137 @@
 
 import json
 import logging
+import time
 import traceback
-from typing import List
+from collections.abc import Callable
+from dataclasses import dataclass
+from typing import Any, List, Optional
 
 import openai
-import tiktoken
 import yaml
 
+from .chat_stream import ChatStreamAssembler
 from .message_model import SystemMessage
+from .token_counter import TokenCounter
 
 _LOGGER = logging.getLogger(__name__)
 
+# 모델 컨텍스트 창 크기
+MAX_PROMPT_TOKENS = 128000
+# 요청마다 내용이 바뀌어 토큰 수를 메모해도 다시 쓰이지 않는 시스템 프롬프트
+VOLATILE_PROMPT_NAMES = frozenset(["now_datetime", "homeassistant_live_states"])
+
+
+def dump_prompt_yaml(data) -> str:
+    """Dump data to YAML for a system prompt, keeping non-ASCII text readable."""
+    return yaml.dump(data).encode("utf-8").decode("unicode_escape")
+
+
+class EntitiesPromptRenderer:
+    """Render the entities overview YAML from cached per-entity fragments.
+
+    Fragments are keyed by entity_id and the entity version from HaCrawler. Only changed entities are dumped again,
+    and the joined fragments are byte-identical to dumping the whole list at once. With ``include_state`` False the
+    state is left out, which gives an overview that only changes when entities or registries change.
+    """
+
+    def __init__(self, include_state: bool = True):
+        """Initialize the renderer."""
+        self.include_state = include_state
+        self._fragments: dict[str, tuple[int, str]] = {}
+
+    def _prompt_entity(self, entity: dict) -> dict:
+        """Return the entity info as it appears in the prompt."""
+        if self.include_state:
+            return entity
+        return {key: value for key, value in entity.items() if key != "state"}
+
+    def render(self, entities: List[dict], versions: Optional[dict[str, int]] = None, prune: bool = True) -> str:
+        """Render the entities as a YAML list.
+
+        Args:
+            entities: entity infos in prompt order
+            versions: entity_id to version map, a fragment is reused while its version is unchanged
+            prune: drop the fragments of entities not in ``entities``; False when rendering a subset
+
+        Returns:
+            str: YAML text of the entities
+
+        """
+        if not entities or versions is None:
+            return dump_prompt_yaml([self._prompt_entity(entity) for entity in entities])
+
+        fragments = self._fragments
+        parts = []
+        rendered_count = 0
+        for entity in entities:
+            entity_id = entity["entity_id"]
+            version = versions.get(entity_id)
+            cached = fragments.get(entity_id)
+            if cached is not None and version is not None and cached[0] == version:
+                parts.append(cached[1])
+                continue
+
+            # 한 항목짜리 리스트로 덤프하면 전체 리스트 덤프의 해당 항목과 동일한 텍스트가 생성됨
+            fragment = dump_prompt_yaml([self._prompt_entity(entity)])
+            rendered_count += 1
+            if version is not None:
+                fragments[entity_id] = (version, fragment)
+            parts.append(fragment)
+
+        # 사라진 엔티티의 조각 정리
+        if prune and len(fragments) > len(entities):
+            current_ids = {entity["entity_id"] for entity in entities}
+            for entity_id in [entity_id for entity_id in fragments if entity_id not in current_ids]:
+                del fragments[entity_id]
+
+        _LOGGER.debug("Rendered %d of %d entity fragments", rendered_count, len(entities))
+        return "".join(parts)
+
+
+@dataclass(slots=True)
+class ChatRequest:
+    """Messages and arguments of one chat completion, built without changing the chat history."""
+
+    messages: list[dict]
+    kwargs: dict
+    # 결과를 사용할 때 대화 기록에 추가할 메시지
+    history_message: Optional[SystemMessage] = None
+    # entity retrieval로 보낸 엔티티, 모든 엔티티를 보냈으면 None
+    entity_ids: Optional[set[str]] = None
+    # (HA 상태, 보낸 엔티티, 엔티티 프롬프트), 토큰 절약량은 completion을 실제로 사용할 때만 기록
+    entity_retrieval: Optional[tuple[dict, list[dict], dict]] = None
+
 
 class PromptGenerator:
-    """Generate prompts for the Home Assistant API."""
+    """Generate prompts for the Home Assistant API.
 
-    def __init__(self, ha_contexts, services):
-        """Initialize the prompt generator."""
-        self.ha_contexts = ha_contexts
-        self.entities = ha_contexts["entities"]
-        self.services = services
+    One generator lives as long as the config entry. The tool schema is built once, and the services and entity
+    overview messages are kept until the services catalog or the entity snapshot changes, so a request only builds
+    the parts that depend on the current time and states.
+    """
+
+    def __init__(self, entities_renderer=None, entities_overview_renderer=None):
+        """Initialize the prompt generator.
+
+        Args:
+            entities_renderer: EntitiesPromptRenderer reusing entity fragments across requests
+            entities_overview_renderer: EntitiesPromptRenderer rendering the entities without state
 
-    def get_datetime_prompt(self):
+        """
+        self.entities_renderer = entities_renderer or EntitiesPromptRenderer()
+        self.entities_overview_renderer = entities_overview_renderer or EntitiesPromptRenderer(include_state=False)
+        self.tool = self.get_tool()
+        self._services_prompt: Optional[tuple[str, dict]] = None
+        self._entities_prompt: Optional[tuple[list, dict]] = None
+        self._entities_overview_prompt: Optional[tuple[list, dict]] = None
+
+    @staticmethod
+    def get_datetime_prompt(ha_contexts):
         """Generate a prompt for the current date and time."""
-        ha_time = self.ha_contexts["time"]
-        ha_date = self.ha_contexts["date"]
-        ha_weekday = self.ha_contexts["weekday"]
+        ha_time = ha_contexts["time"]
+        ha_date = ha_contexts["date"]
+        ha_weekday = ha_contexts["weekday"]
 
         base_prompt = f"""Current time is {ha_time}.
         Today's date is {ha_date}, and it's {ha_weekday} today.
@@ -39,11 +144,33 @@ class PromptGenerator:
             "content": base_prompt,
         }
 
-    def get_entities_system_prompt(self):
-        """Generate a system prompt for the entities in the Home Assistant."""
+    def get_entities_system_prompt(self, ha_contexts, entities: Optional[List[dict]] = None):
+        """Generate a system prompt for the entities in the Home Assistant.
+
+        Args:
+            ha_contexts: Home Assistant states from HaCrawler.get_ha_states
+            entities: entities to send, e.g. from EntityRetriever, or None to send every entity
+
+        """
+        if entities is not None:
+            return self._entities_system_prompt(entities, ha_contexts.get("entity_versions"), prune=False)
+
+        entities = ha_contexts["entities"]
+        # HaCrawler는 엔티티가 바뀔 때만 새 스냅샷 리스트를 만듦
+        if self._entities_prompt is not None and self._entities_prompt[0] is entities:
+            return self._entities_prompt[1]
+
+        prompt_message = self._entities_system_prompt(entities, ha_contexts.get("entity_versions"))
+        self._entities_prompt = (entities, prompt_message)
+        return prompt_message
+
+    def _entities_system_prompt(
+        self, entities: List[dict], versions: Optional[dict[str, int]], prune: bool = True
+    ) -> dict:
+        """Render the entities system prompt of some entities."""
         prompt = [
             "An overview of the states in this smart home:",
-            yaml.dump(self.entities).encode("utf-8").decode("unicode_escape"),
+            self.entities_renderer.render(entities, versions, prune=prune),
         ]
 
         message = "\n".join(prompt)
@@ -54,16 +181,60 @@ class PromptGenerator:
             "content": message,
         }
 
-    def get_services_system_prompt(self):
-        """Generate a system prompt for the services in the Home Assistant."""
+    def get_entities_overview_prompt(self, ha_contexts):
+        """Generate a system prompt for the entities without their states, which rarely changes."""
+        entities = ha_contexts["entities"]
+        if self._entities_overview_prompt is not None and self._entities_overview_prompt[0] is entities:
+            return self._entities_overview_prompt[1]
+
+        prompt = [
+            "An overview of the entities in this smart home:",
+            self.entities_overview_renderer.render(entities, ha_contexts.get("entity_versions")),
+        ]
+        content = "\n".join(prompt)
+
+        # 상태만 바뀐 경우 내용이 같으므로 이전 메시지를 그대로 사용
+        if self._entities_overview_prompt is not None and self._entities_overview_prompt[1]["content"] == content:
+            prompt_message = self._entities_overview_prompt[1]
+        else:
+            prompt_message = {"role": "system", "name": "homeassistant_entities", "content": content}
+        self._entities_overview_prompt = (entities, prompt_message)
+        return prompt_message
+
+    def get_live_states_prompt(self, ha_contexts):
+        """Generate a system prompt for the current date and time and the current entity states."""
+        prompt = [
+            self.get_datetime_prompt(ha_contexts)["content"],
+            "The current states of the entities:",
+            *(f"{entity['entity_id']}: {entity['state']}" for entity in ha_contexts["entities"]),
+        ]
+
+        return {
+            "role": "system",
+            "name": "homeassistant_live_states",
+            "content": "\n".join(prompt),
+        }
+
+    def get_services_system_prompt(self, services_catalog):
+        """Generate a system prompt for the services in the Home Assistant.
+
+        Args:
+            services_catalog: ServicesCatalog from HaCrawler.get_services_catalog
+
+        """
+        if self._services_prompt is not None and self._services_prompt[0] == services_catalog.content_hash:
+            return self._services_prompt[1]
+
         prompt = [
             "An overview of the services in this smart home:",
-            yaml.dump(self.services).encode("utf-8").decode("unicode_escape"),
+            services_catalog.prompt_yaml,
         ]
 
         message = "\n".join(prompt)
 
-        return {"role": "system", "name": "homeassistant_services_overview", "content": message}
+        prompt_message = {"role": "system", "name": "homeassistant_services_overview", "content": message}
+        self._services_prompt = (services_catalog.content_hash, prompt_message)
+        return prompt_message
 
     @staticmethod
     def get_tool():
@@ -89,86 +260,241 @@ class PromptGenerator:
 
 
 class GptHaAssistant:
-    """GPT-based Home Assistant."""
+    """GPT-based Home Assistant.
+
+    One assistant lives as long as the config entry and is shared by concurrent requests, so everything that depends
+    on the request, like the user pattern prompt, is passed to ``chat`` and ``chat_stream`` instead of being stored.
+    """
 
     def __init__(
         self,
         deployment_name: str,
         init_prompt: str,
         ha_automation_script: str,
-        user_pattern_prompt: str,
         tool_prompts: list[dict],
         client,
+        token_counter: Optional[TokenCounter] = None,
+        max_prompt_tokens: int = MAX_PROMPT_TOKENS,
     ):
         self.init_prompt = init_prompt
         self.ha_automation_script = ha_automation_script
-        self.user_pattern_prompt = user_pattern_prompt
         self.tool_prompts = tool_prompts
         self.deployment_name = deployment_name
-        self.model_input_messages = []
         self.openai_client = client
+        self.last_time_to_first_token = None
+        self.token_counter = token_counter or TokenCounter()
+        self.max_prompt_tokens = max_prompt_tokens
+        self.init_prompt_message = SystemMessage(content=init_prompt).to_dict() if init_prompt else None
+
+    def add_instructions(
+        self,
+        chat_history: list[dict],
+        user_pattern_prompt: Optional[str] = None,
+        prefix_prompts: Optional[list[dict]] = None,
+    ):
+        """Convert the chat history to JSON data.
+
+        Args:
+            chat_history: chat input messages
+            user_pattern_prompt: user pattern prompt of the speaker
+            prefix_prompts: fixed system messages placed right after the init prompt to reuse the prompt cache
 
-    def add_instructions(self, chat_history: list[dict]):
-        """Convert the chat history to JSON data."""
+        """
         model_input_messages = []
-        if self.init_prompt:
-            init_prompt_message = SystemMessage(content=self.init_prompt)
-            model_input_messages.append(init_prompt_message.to_dict())
-        if self.user_pattern_prompt:
-            model_input_messages.append(SystemMessage(content=self.user_pattern_prompt).to_dict())
+        if self.init_prompt_message:
+            model_input_messages.append(self.init_prompt_message)
+        model_input_messages.extend(prefix_prompts or ())
+        if user_pattern_prompt:
+            model_input_messages.append(SystemMessage(content=user_pattern_prompt).to_dict())
         # model_input_messages.extend(tv_on_off_example)
         model_input_messages.extend(chat_history)
 
         return model_input_messages
 
-    def crop_chat_history(self, chat_history: List[dict]):
-        """Crop the chat history to the last 4 messages."""
-        token_encoder = tiktoken.get_encoding("o200k_base")
-        instructions_sum = self.init_prompt + self.ha_automation_script + self.user_pattern_prompt
-        instructions_tokens = token_encoder.encode(instructions_sum)
+    def _count_message(self, message: dict) -> int:
+        """Count a message that is not in the chat history, memoizing the system prompts that are sent again."""
+        return self.token_counter.count_message(message, volatile=message.get("name") in VOLATILE_PROMPT_NAMES)
+
+    def crop_chat_history(
+        self,
+        chat_history: List[dict],
+        user_pattern_prompt: Optional[str] = None,
+        prefix_prompts: Optional[list[dict]] = None,
+        message_tokens: Optional[list[Optional[int]]] = None,
+    ) -> List[dict]:
+        """Drop the oldest user turns until the prompt fits max_prompt_tokens.
+
+        Args:
+            chat_history: chat input messages
+            user_pattern_prompt: user pattern prompt of the speaker
+            prefix_prompts: fixed system messages placed right after the init prompt
+            message_tokens: known token counts of the chat input messages, e.g. from ChatHistory.token_counts, with
+                None for the messages that still have to be counted
 
-        chat_history_tokens = token_encoder.encode(json.dumps(chat_history))
-        while len(instructions_tokens) + len(chat_history_tokens) > 128000:
-            for i, message in enumerate(chat_history[::-1], start=1):
-                if message["role"] == "user":
-                    chat_history = chat_history[: -(i + 3)]
-            chat_history_tokens = token_encoder.encode(json.dumps(chat_history))
-        return chat_history
+        """
+        # 화자마다 다른 패턴 프롬프트도 내용 해시로 메모되므로 화자가 바뀌어도 다시 세지 않음
+        instructions_tokens = sum(
+            self.token_counter.count_static(prompt)
+            for prompt in (self.init_prompt, self.ha_automation_script, user_pattern_prompt)
+            if prompt
+        )
+        instructions_tokens += sum(self._count_message(message) for message in prefix_prompts or ())
+        if message_tokens is None:
+            message_tokens = [None] * len(chat_history)
+        message_tokens = [
+            tokens if tokens is not None else self._count_message(message)
+            for message, tokens in zip(chat_history, message_tokens)
+        ]
+        total_tokens = instructions_tokens + sum(message_tokens)
+        _LOGGER.debug("prompt tokens: %d (instructions %d)", total_tokens, instructions_tokens)
+
+        start = 0
+        while total_tokens > self.max_prompt_tokens and start < len(chat_history):
+            # 가장 오래된 user turn을 통째로 제외
+            next_user = next(
+                (i for i in range(start + 1, len(chat_history)) if chat_history[i].get("role") == "user"), None
+            )
+            if next_user is None:
+                break
+            total_tokens -= sum(message_tokens[start:next_user])
+            start = next_user
 
-    async def chat(self, chat_history: list[dict], n=1, temperature=0.5):
-        """Chat with the GPT-based Home Assistant."""
+        if start:
+            _LOGGER.info("cropped %d messages to fit %d prompt tokens", start, self.max_prompt_tokens)
+        return chat_history[start:]
+
+    def build_messages(
+        self,
+        chat_history: list[dict],
+        user_pattern_prompt: Optional[str] = None,
+        prefix_prompts: Optional[list[dict]] = None,
+        message_tokens: Optional[list[Optional[int]]] = None,
+    ) -> list[dict]:
+        """Crop the chat history and add the instructions, returning the messages of the completion request."""
+        chat_history = self.crop_chat_history(chat_history, user_pattern_prompt, prefix_prompts, message_tokens)
+        return self.add_instructions(chat_history, user_pattern_prompt, prefix_prompts)
+
+    async def chat(
+        self,
+        chat_history: list[dict],
+        n=1,
+        temperature=0.5,
+        user_pattern_prompt: Optional[str] = None,
+        prefix_prompts: Optional[list[dict]] = None,
+        on_usage: Optional[Callable[[Any, float], None]] = None,
+        message_tokens: Optional[list[Optional[int]]] = None,
+    ):
+        """Chat with the GPT-based Home Assistant.
+
+        Args:
+            chat_history: chat input messages
+            n: number of choices
+            temperature: sampling temperature
+            user_pattern_prompt: user pattern prompt of the speaker
+            prefix_prompts: fixed system messages placed right after the init prompt
+            on_usage: called with the usage of the completion and the seconds it took
+            message_tokens: known token counts of the chat input messages, None for those not counted yet
+
+        """
+        start = time.perf_counter()
 
         try:
             # _LOGGER.debug("Chat history: %s", chat_history)
-            # cropped_chat_history = self.crop_chat_history(chat_history)
-            self.model_input_messages = self.add_instructions(chat_history)
+            model_input_messages = self.build_messages(chat_history, user_pattern_prompt, prefix_prompts, message_tokens)
 
             response = await self.openai_client.chat.completions.create(
                 model=self.deployment_name,
-                messages=self.model_input_messages,
+                messages=model_input_messages,
                 tools=self.tool_prompts,
                 n=n,
                 temperature=temperature,
                 seed=42
             )
 
-        except openai.BadRequestError as err:
+        except Exception as err:
+            return await self._handle_chat_error(err)
+
+        if on_usage and (usage := getattr(response, "usage", None)):
+            on_usage(usage, time.perf_counter() - start)
+        return response
+
+    async def chat_stream(
+        self,
+        chat_history: list[dict],
+        on_sentence: Optional[Callable[[str], None]] = None,
+        on_tool_call: Optional[Callable[[dict], None]] = None,
+        temperature=0.5,
+        user_pattern_prompt: Optional[str] = None,
+        prefix_prompts: Optional[list[dict]] = None,
+        on_usage: Optional[Callable[[Any, float], None]] = None,
+        message_tokens: Optional[list[Optional[int]]] = None,
+    ):
+        """Chat with the GPT-based Home Assistant, consuming the completion as a stream.
+
+        Args:
+            chat_history: chat input messages
+            on_sentence: called with every complete sentence of the answer while the completion is still streaming
+            on_tool_call: called with every tool call as soon as its arguments are complete
+            temperature: sampling temperature
+            user_pattern_prompt: user pattern prompt of the speaker
+            prefix_prompts: fixed system messages placed right after the init prompt
+            on_usage: called with the usage of the completion and the seconds it took
+            message_tokens: known token counts of the chat input messages, None for those not counted yet
+
+        Returns:
+            dict: assembled assistant message, or the same error values as chat
+
+        """
+        assembler = ChatStreamAssembler(on_sentence=on_sentence, on_tool_call=on_tool_call)
+        time_to_first_token = None
+        start = time.perf_counter()
+
+        try:
+            model_input_messages = self.build_messages(chat_history, user_pattern_prompt, prefix_prompts, message_tokens)
+
+            stream = await self.openai_client.chat.completions.create(
+                model=self.deployment_name,
+                messages=model_input_messages,
+                tools=self.tool_prompts,
+                temperature=temperature,
+                seed=42,
+                stream=True,
+                # 마지막 청크로 usage(cached_tokens 포함)를 받음
+                stream_options={"include_usage": True},
+            )
+            async for chunk in stream:
+                if assembler.add_chunk(chunk) and time_to_first_token is None:
+                    time_to_first_token = time.perf_counter() - start
+                    self.last_time_to_first_token = time_to_first_token
+                    _LOGGER.info("time to first token: %.0f ms", time_to_first_token * 1000)
+
+            assembler.finish()
+
+        except Exception as err:
+            return await self._handle_chat_error(err)
+
+        elapsed = time.perf_counter() - start
+        if on_usage and assembler.usage:
+            on_usage(assembler.usage, elapsed)
+        _LOGGER.info("streamed completion took %.0f ms", elapsed * 1000)
+        return assembler.to_message_dict()
+
+    async def _handle_chat_error(self, err: Exception):
+        """Convert a chat completion error to the response returned by chat."""
+        if isinstance(err, openai.BadRequestError):
             return await self._handle_bad_request_error(err)
 
-        except openai.RateLimitError:
+        if isinstance(err, openai.RateLimitError):
             _LOGGER.warning("Rate limit exceeded")
             return self._create_error_response("Rate limit exceeded. Please try again later.")
 
-        except openai.APIError as err:
+        if isinstance(err, openai.APIError):
             _LOGGER.error("Azure OpenAI API Error: %s", str(err))
             return self._create_error_response(f"API Error: {str(err)}")
 
-        except Exception as err:
-            _LOGGER.error("Unexpected error: %s", str(err))
-            _LOGGER.error("Traceback: %s", traceback.format_exc())
-            return self._create_error_response("An unknown error occurred. Please try again later.")
-
-        return response
+        _LOGGER.error("Unexpected error: %s", str(err))
+        _LOGGER.error("Traceback: %s", traceback.format_exc())
+        return self._create_error_response("An unknown error occurred. Please try again later.")
 
     def _create_error_response(self, message: str) -> dict:
         """Create a standardized error response."""
@@ -0,0 +1,161 @@
+"""Local response cache in front of the remote cache-routing endpoint."""
+
+import copy
+import logging
+import time
+from collections import OrderedDict
+from typing import Optional
+
+from homeassistant.core import HomeAssistant, callback
+from homeassistant.helpers.storage import Store
+
+from .command_index import CommandIndex, normalize_command
+from .const import (
+    DEFAULT_CACHE_SIMILARITY_THRESHOLD,
+    DOMAIN,
+    LOCAL_CACHE_MAX_ENTRIES,
+    LOCAL_CACHE_SAVE_DELAY,
+    LOCAL_CACHE_STORAGE_VERSION,
+    LOCAL_CACHE_TTL,
+)
+from .stats import StatsPublisher
+
+_LOGGER = logging.getLogger(__name__)
+
+
+class LocalResponseCache(StatsPublisher):
+    """LRU cache of assistant responses keyed by speaker_id and normalized input text.
+
+    Entries expire after a TTL, the cache is bounded in size and it is persisted to ``.storage`` so it survives
+    restarts. Every stored or returned response is a copy, so callers may mutate it freely. A miss on the exact key
+    falls back to a per-speaker similarity index, so near-duplicate phrasings hit the same entry.
+    """
+
+    def __init__(
+        self,
+        hass: HomeAssistant,
+        entry_id: str,
+        max_entries: int = LOCAL_CACHE_MAX_ENTRIES,
+        ttl: float = LOCAL_CACHE_TTL,
+        similarity_threshold: float = DEFAULT_CACHE_SIMILARITY_THRESHOLD,
+    ):
+        """Initialize the cache."""
+        super().__init__()
+        self.hass = hass
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.similarity_threshold = similarity_threshold
+        self.hits = 0
+        self.fuzzy_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._entries: OrderedDict[str, dict] = OrderedDict()
+        self._indexes: dict[str, CommandIndex] = {}
+        self._store = Store(hass, LOCAL_CACHE_STORAGE_VERSION, f"{DOMAIN}.response_cache.{entry_id}")
+
+    @property
+    def size(self) -> int:
+        """Number of cached responses."""
+        return len(self._entries)
+
+    @staticmethod
+    def _make_key(speaker_id: str, normalized: str) -> str:
+        """Make the cache key of a speaker and normalized input text."""
+        return f"{speaker_id}|{normalized}"
+
+    def _add_entry(self, key: str, entry: dict) -> None:
+        """Add an entry and index its command."""
+        self._entries[key] = entry
+        self._entries.move_to_end(key)
+        speaker_id, _, normalized = key.rpartition("|")
+        self._indexes.setdefault(speaker_id, CommandIndex()).add(normalized)
+
+    def _remove_entry(self, key: str) -> None:
+        """Remove an entry and its command from the index."""
+        del self._entries[key]
+        speaker_id, _, normalized = key.rpartition("|")
+        if index := self._indexes.get(speaker_id):
+            index.remove(normalized)
+            if not len(index):
+                del self._indexes[speaker_id]
+
+    def _evict_overflow(self) -> int:
+        """Evict the least recently used entries above the size bound."""
+        evicted = 0
+        while len(self._entries) > self.max_entries:
+            self._remove_entry(next(iter(self._entries)))
+            evicted += 1
+        return evicted
+
+    async def async_load(self) -> None:
+        """Load the persisted entries, dropping the expired ones."""
+        data = await self._store.async_load()
+        if not data:
+            return
+
+        now = time.time()
+        for key, entry in data.get("entries", []):
+            if entry.get("expires_at", 0) > now:
+                self._add_entry(key, entry)
+
+        self._evict_overflow()
+
+        _LOGGER.info("Loaded %d local cache entries", len(self._entries))
+
+    async def async_save(self) -> None:
+        """Persist the entries immediately."""
+        await self._store.async_save(self._data_to_save())
+
+    @callback
+    def _data_to_save(self) -> dict:
+        """Return the data to persist."""
+        return {"entries": list(self._entries.items())}
+
+    @callback
+    def get(self, speaker_id: str, text: str) -> Optional[dict]:
+        """Get a cached response.
+
+        Args:
+            speaker_id: speaker_id is consist of mac address and user_id
+            text: user input
+
+        Returns:
+            dict: copy of the cached response, or None on a miss
+
+        """
+        normalized = normalize_command(text)
+        key = self._make_key(speaker_id, normalized)
+        fuzzy = False
+        if key not in self._entries and (index := self._indexes.get(speaker_id)):
+            if match := index.lookup(normalized, self.similarity_threshold):
+                _LOGGER.debug("Similar cached command %s -> %s (%.2f)", normalized, match[0], match[1])
+                key = self._make_key(speaker_id, match[0])
+                fuzzy = True
+
+        entry = self._entries.get(key)
+        if entry is not None and entry["expires_at"] <= time.time():
+            self._remove_entry(key)
+            self.evictions += 1
+            entry = None
+
+        if entry is None:
+            self.misses += 1
+            self._async_notify()
+            return None
+
+        self._entries.move_to_end(key)
+        self.hits += 1
+        if fuzzy:
+            self.fuzzy_hits += 1
+        self._async_notify()
+        return copy.deepcopy(entry["response"])
+
+    @callback
+    def set(self, speaker_id: str, text: str, response: dict) -> None:
+        """Store a response for a speaker and input text."""
+        key = self._make_key(speaker_id, normalize_command(text))
+        self._add_entry(key, {"response": copy.deepcopy(response), "expires_at": time.time() + self.ttl})
+        self.evictions += self._evict_overflow()
+
+        self._store.async_delay_save(self._data_to_save, LOCAL_CACHE_SAVE_DELAY)
+        self._async_notify()
@@ -0,0 +1,193 @@
+"""Sensors for the Azure OpenAI GPT conversation RS-Tuned integration."""
+
+from collections.abc import Callable
+from dataclasses import dataclass
+from typing import Any
+
+from homeassistant.components.sensor import (
+    SensorDeviceClass,
+    SensorEntity,
+    SensorEntityDescription,
+    SensorStateClass,
+)
+from homeassistant.config_entries import ConfigEntry
+from homeassistant.const import PERCENTAGE, EntityCategory, UnitOfTime
+from homeassistant.core import HomeAssistant, callback
+from homeassistant.helpers.entity_platform import AddEntitiesCallback
+from homeassistant.helpers.typing import StateType
+
+from .circuit_breaker import STATE_CLOSED, STATE_HALF_OPEN, STATE_OPEN
+from .const import DOMAIN
+from .stats import StatsPublisher
+
+
+@dataclass(frozen=True, kw_only=True)
+class StatsSensorEntityDescription(SensorEntityDescription):
+    """Describes a sensor of runtime statistics."""
+
+    value_fn: Callable[[Any], StateType]
+
+
+RESPONSE_CACHE_SENSORS: tuple[StatsSensorEntityDescription, ...] = (
+    StatsSensorEntityDescription(
+        key="response_cache_hits",
+        name="Response cache hits",
+        state_class=SensorStateClass.TOTAL_INCREASING,
+        value_fn=lambda cache: cache.hits,
+    ),
+    StatsSensorEntityDescription(
+        key="response_cache_fuzzy_hits",
+        name="Response cache fuzzy hits",
+        state_class=SensorStateClass.TOTAL_INCREASING,
+        value_fn=lambda cache: cache.fuzzy_hits,
+    ),
+    StatsSensorEntityDescription(
+        key="response_cache_misses",
+        name="Response cache misses",
+        state_class=SensorStateClass.TOTAL_INCREASING,
+        value_fn=lambda cache: cache.misses,
+    ),
+    StatsSensorEntityDescription(
+        key="response_cache_evictions",
+        name="Response cache evictions",
+        state_class=SensorStateClass.TOTAL_INCREASING,
+        value_fn=lambda cache: cache.evictions,
+    ),
+    StatsSensorEntityDescription(
+        key="response_cache_size",
+        name="Response cache size",
+        state_class=SensorStateClass.MEASUREMENT,
+        value_fn=lambda cache: cache.size,
+    ),
+)
+
+PROMPT_CACHE_SENSORS: tuple[StatsSensorEntityDescription, ...] = (
+    StatsSensorEntityDescription(
+        key="prompt_cache_hit_rate",
+        name="Prompt cache hit rate",
+        native_unit_of_measurement=PERCENTAGE,
+        state_class=SensorStateClass.MEASUREMENT,
+        value_fn=lambda stats: stats.hit_rate,
+    ),
+    StatsSensorEntityDescription(
+        key="prompt_cached_tokens",
+        name="Prompt cached tokens",
+        state_class=SensorStateClass.TOTAL_INCREASING,
+        value_fn=lambda stats: stats.cached_tokens,
+    ),
+    StatsSensorEntityDescription(
+        key="prompt_tokens",
+        name="Prompt tokens",
+        state_class=SensorStateClass.TOTAL_INCREASING,
+        value_fn=lambda stats: stats.prompt_tokens,
+    ),
+)
+
+SPECULATION_SENSORS: tuple[StatsSensorEntityDescription, ...] = (
+    StatsSensorEntityDescription(
+        key="speculation_saved",
+        name="Speculative completions saved",
+        state_class=SensorStateClass.TOTAL_INCREASING,
+        value_fn=lambda stats: stats.saved,
+    ),
+    StatsSensorEntityDescription(
+        key="speculation_wasted",
+        name="Speculative completions wasted",
+        state_class=SensorStateClass.TOTAL_INCREASING,
+        value_fn=lambda stats: stats.wasted,
+    ),
+    StatsSensorEntityDescription(
+        key="speculation_saved_time",
+        name="Speculative completions saved time",
+        native_unit_of_measurement=UnitOfTime.MILLISECONDS,
+        device_class=SensorDeviceClass.DURATION,
+        state_class=SensorStateClass.TOTAL_INCREASING,
+        value_fn=lambda stats: round(stats.saved_ms),
+    ),
+)
+
+DEADLINE_SENSORS: tuple[StatsSensorEntityDescription, ...] = (
+    StatsSensorEntityDescription(
+        key="degraded_responses",
+        name="Degraded responses",
+        state_class=SensorStateClass.TOTAL_INCREASING,
+        value_fn=lambda stats: stats.degraded_requests,
+    ),
+)
+
+CIRCUIT_BREAKER_SENSORS: tuple[StatsSensorEntityDescription, ...] = tuple(
+    StatsSensorEntityDescription(
+        key=f"{endpoint}_circuit",
+        name=f"{name} circuit",
+        device_class=SensorDeviceClass.ENUM,
+        options=[STATE_CLOSED, STATE_OPEN, STATE_HALF_OPEN],
+        value_fn=lambda breakers, endpoint=endpoint: breakers.get(endpoint).state,
+    )
+    for endpoint, name in (
+        ("cache", "Cache routing"),
+        ("register_cache", "Cache registration"),
+        ("pattern", "User patterns"),
+    )
+)
+
+ENTITY_RETRIEVAL_SENSORS: tuple[StatsSensorEntityDescription, ...] = (
+    StatsSensorEntityDescription(
+        key="entity_retrieval_recall",
+        name="Entity retrieval recall",
+        native_unit_of_measurement=PERCENTAGE,
+        state_class=SensorStateClass.MEASUREMENT,
+        value_fn=lambda stats: stats.recall,
+    ),
+    StatsSensorEntityDescription(
+        key="entity_retrieval_saved_tokens",
+        name="Entity retrieval saved tokens",
+        state_class=SensorStateClass.TOTAL_INCREASING,
+        value_fn=lambda stats: stats.saved_tokens,
+    ),
+)
+
+
+async def async_setup_entry(hass: HomeAssistant, entry: ConfigEntry, async_add_entities: AddEntitiesCallback) -> None:
+    """Set up the sensors from a config entry."""
+    agent = hass.data[DOMAIN][entry.entry_id]["agent"]
+
+    async_add_entities(
+        StatsSensor(entry, source, description)
+        for source, descriptions in (
+            (agent.response_cache, RESPONSE_CACHE_SENSORS),
+            (agent.prompt_cache_stats, PROMPT_CACHE_SENSORS),
+            (agent.speculation_stats, SPECULATION_SENSORS),
+            (agent.deadline_stats, DEADLINE_SENSORS),
+            (agent.circuit_breakers, CIRCUIT_BREAKER_SENSORS),
+            (agent.entity_retrieval_stats, ENTITY_RETRIEVAL_SENSORS),
+        )
+        for description in descriptions
+    )
+
+
+class StatsSensor(SensorEntity):
+    """Sensor of a runtime statistic, updated when its source notifies."""
+
+    _attr_should_poll = False
+    _attr_entity_category = EntityCategory.DIAGNOSTIC
+    entity_description: StatsSensorEntityDescription
+
+    def __init__(self, entry: ConfigEntry, source: StatsPublisher, description: StatsSensorEntityDescription) -> None:
+        """Initialize the sensor."""
+        self.entity_description = description
+        self._source = source
+        self._attr_unique_id = f"{entry.entry_id}_{description.key}"
+
+    @property
+    def native_value(self) -> StateType:
+        """Return the statistic value."""
+        return self.entity_description.value_fn(self._source)
+
+    async def async_added_to_hass(self) -> None:
+        """Listen for statistics updates."""
+        self.async_on_remove(self._source.async_add_listener(self._async_source_updated))
+
+    @callback
+    def _async_source_updated(self) -> None:
+        """Write the new state."""
+        self.async_write_ha_state()
@@ -0,0 +1,54 @@
+"""Speculative chat completions started before the remote cache answers."""
+
+import asyncio
+from collections.abc import Callable
+from dataclasses import dataclass, field
+from typing import Any, Optional
+
+from homeassistant.core import callback
+
+from .prompt_generator import ChatRequest
+
+
+class SideEffectGate:
+    """Hold back the callbacks of a speculative completion until its result is known to be used.
+
+    Streamed sentences and pipelined tool calls are visible to the user, so a completion that may still be thrown
+    away must not run them. Calls made while the gate is closed are queued in order and replayed when it opens.
+    """
+
+    def __init__(self):
+        """Initialize the gate closed."""
+        self._open = False
+        self._held: list[tuple[Callable[..., None], tuple]] = []
+
+    def wrap(self, func: Optional[Callable[..., None]]) -> Optional[Callable[..., None]]:
+        """Wrap a callback so it only runs once the gate is open."""
+        if func is None:
+            return None
+
+        @callback
+        def gated(*args: Any) -> None:
+            if self._open:
+                func(*args)
+            else:
+                self._held.append((func, args))
+
+        return gated
+
+    @callback
+    def open(self) -> None:
+        """Run the held callbacks and let the following ones through."""
+        self._open = True
+        held, self._held = self._held, []
+        for func, args in held:
+            func(*args)
+
+
+@dataclass(slots=True)
+class Speculation:
+    """A chat completion started while the remote cache is looked up."""
+
+    task: asyncio.Task
+    request: ChatRequest
+    gate: SideEffectGate = field(default_factory=SideEffectGate)
@@ -0,0 +1,324 @@
+"""Runtime statistics exposed through sensors and diagnostics."""
+
+import asyncio
+from collections import OrderedDict
+from collections.abc import Callable
+from typing import Any, Optional
+
+from homeassistant.core import callback
+
+from .const import (
+    SPECULATION_HIT_RATE_ALPHA,
+    SPECULATION_MAX_SPEAKERS,
+    SPECULATION_MIN_LOOKUPS,
+    STATS_NOTIFY_INTERVAL,
+)
+
+
+class StatsPublisher:
+    """Notify listeners, such as sensors, when statistics change.
+
+    Notifications are throttled: the first change is published at once and the changes made within the next
+    ``notify_interval`` seconds are coalesced into one trailing notification, so a burst of counter updates writes
+    the sensor states only once.
+    """
+
+    def __init__(self, notify_interval: float = STATS_NOTIFY_INTERVAL):
+        """Initialize the publisher."""
+        self.notify_interval = notify_interval
+        self._listeners: list[Callable[[], None]] = []
+        self._next_notify = 0.0
+        self._notify_handle: Optional[asyncio.TimerHandle] = None
+
+    @callback
+    def async_add_listener(self, update_callback: Callable[[], None]) -> Callable[[], None]:
+        """Listen for statistics changes."""
+        self._listeners.append(update_callback)
+
+        @callback
+        def remove_listener() -> None:
+            self._listeners.remove(update_callback)
+            if not self._listeners and self._notify_handle is not None:
+                self._notify_handle.cancel()
+                self._notify_handle = None
+
+        return remove_listener
+
+    @callback
+    def _async_notify(self) -> None:
+        """Notify the listeners, at most once per notify interval."""
+        if not self._listeners or self._notify_handle is not None:
+            return
+
+        loop = asyncio.get_running_loop()
+        if (delay := self._next_notify - loop.time()) > 0:
+            # 간격 안의 변경은 모아서 한 번에 알림
+            self._notify_handle = loop.call_later(delay, self._async_flush)
+        else:
+            self._async_flush()
+
+    @callback
+    def _async_flush(self) -> None:
+        """Call the listeners now."""
+        self._notify_handle = None
+        self._next_notify = asyncio.get_running_loop().time() + self.notify_interval
+        for update_callback in list(self._listeners):
+            update_callback()
+
+
+class LatencyStats:
+    """Count and average latency of a group of requests."""
+
+    def __init__(self):
+        """Initialize the statistics."""
+        self.count = 0
+        self.total_ms = 0.0
+        self.max_ms = 0.0
+
+    @property
+    def avg_ms(self) -> float:
+        """Average latency in milliseconds."""
+        return self.total_ms / self.count if self.count else 0.0
+
+    def record(self, elapsed_ms: float) -> None:
+        """Record one request."""
+        self.count += 1
+        self.total_ms += elapsed_ms
+        self.max_ms = max(self.max_ms, elapsed_ms)
+
+
+class PromptCacheStats(StatsPublisher):
+    """Prompt token usage reported by the chat completion API, including the tokens served from the prompt cache."""
+
+    def __init__(self):
+        """Initialize the statistics."""
+        super().__init__()
+        self.requests = 0
+        self.prompt_tokens = 0
+        self.cached_tokens = 0
+        self.last_prompt_tokens = 0
+        self.last_cached_tokens = 0
+        self.cached_latency = LatencyStats()
+        self.uncached_latency = LatencyStats()
+
+    @property
+    def hit_rate(self) -> float:
+        """Percentage of prompt tokens served from the prompt cache."""
+        return round(self.cached_tokens / self.prompt_tokens * 100, 1) if self.prompt_tokens else 0.0
+
+    @callback
+    def record(self, usage: Any, elapsed: float) -> None:
+        """Record the usage of one completion.
+
+        Args:
+            usage: usage of the chat completion response or the last stream chunk
+            elapsed: seconds the completion took
+
+        """
+        details = getattr(usage, "prompt_tokens_details", None)
+        cached_tokens = getattr(details, "cached_tokens", None) or 0
+
+        self.requests += 1
+        self.last_prompt_tokens = usage.prompt_tokens
+        self.last_cached_tokens = cached_tokens
+        self.prompt_tokens += usage.prompt_tokens
+        self.cached_tokens += cached_tokens
+        (self.cached_latency if cached_tokens else self.uncached_latency).record(elapsed * 1000)
+        self._async_notify()
+
+    def as_dict(self) -> dict:
+        """Return the statistics as a dictionary."""
+        return {
+            "requests": self.requests,
+            "prompt_tokens": self.prompt_tokens,
+            "cached_tokens": self.cached_tokens,
+            "hit_rate": self.hit_rate,
+            "last_prompt_tokens": self.last_prompt_tokens,
+            "last_cached_tokens": self.last_cached_tokens,
+            "avg_latency_ms_cached": round(self.cached_latency.avg_ms, 1),
+            "avg_latency_ms_uncached": round(self.uncached_latency.avg_ms, 1),
+        }
+
+
+class SpeculationStats(StatsPublisher):
+    """Outcomes of speculative completions and the remote cache hit rate of each speaker."""
+
+    def __init__(self, max_speakers: int = SPECULATION_MAX_SPEAKERS):
+        """Initialize the statistics.
+
+        Args:
+            max_speakers: number of speakers whose hit rate is kept, the least recently looked up one is dropped
+
+        """
+        super().__init__()
+        self.launched = 0
+        self.saved = 0
+        self.wasted = 0
+        self.skipped = 0
+        self.saved_ms = 0.0
+        self.max_speakers = max_speakers
+        # speaker_id -> (조회 수, 적중률 이동 평균), 가장 최근에 조회한 화자가 마지막
+        self._hit_rates: OrderedDict[str, tuple[int, float]] = OrderedDict()
+
+    def hit_rate(self, speaker_id: str) -> Optional[float]:
+        """Return the moving average of the remote cache hit rate of a speaker, None if it was never looked up."""
+        if (lookups := self._hit_rates.get(speaker_id)) is None:
+            return None
+        return lookups[1]
+
+    def should_speculate(self, speaker_id: str, max_hit_rate: float) -> bool:
+        """Return True if the speaker's remote cache hit rate is low enough to start a completion early."""
+        lookups, hit_rate = self._hit_rates.get(speaker_id, (0, 0.0))
+        # 조회 기록이 적으면 적중률을 믿을 수 없으므로 미리 생성
+        return lookups < SPECULATION_MIN_LOOKUPS or hit_rate <= max_hit_rate
+
+    def record_lookup(self, speaker_id: str, hit: bool) -> None:
+        """Record a remote cache lookup of a speaker."""
+        lookups, hit_rate = self._hit_rates.get(speaker_id, (0, 0.0))
+        if lookups == 0:
+            hit_rate = float(hit)
+        else:
+            hit_rate += SPECULATION_HIT_RATE_ALPHA * (float(hit) - hit_rate)
+        self._hit_rates[speaker_id] = (lookups + 1, hit_rate)
+        self._hit_rates.move_to_end(speaker_id)
+        while len(self._hit_rates) > self.max_speakers:
+            self._hit_rates.popitem(last=False)
+
+    @callback
+    def record_launched(self) -> None:
+        """Record a speculative completion being started."""
+        self.launched += 1
+        self._async_notify()
+
+    @callback
+    def record_saved(self, lookup_ms: float) -> None:
+        """Record a speculative completion being used, saving the remote cache lookup time."""
+        self.saved += 1
+        self.saved_ms += lookup_ms
+        self._async_notify()
+
+    @callback
+    def record_wasted(self) -> None:
+        """Record a speculative completion being cancelled because the remote cache answered."""
+        self.wasted += 1
+        self._async_notify()
+
+    @callback
+    def record_skipped(self) -> None:
+        """Record a completion not started early because the speaker's hit rate is too high."""
+        self.skipped += 1
+        self._async_notify()
+
+    def as_dict(self) -> dict:
+        """Return the statistics as a dictionary."""
+        return {
+            "launched": self.launched,
+            "saved": self.saved,
+            "wasted": self.wasted,
+            "skipped": self.skipped,
+            "saved_ms": round(self.saved_ms, 1),
+            "speaker_hit_rates": {
+                speaker_id: round(hit_rate, 3) for speaker_id, (_, hit_rate) in self._hit_rates.items()
+            },
+        }
+
+
+class DeadlineStats(StatsPublisher):
+    """Latency of the stages of an utterance and how often each fell back because it ran out of time."""
+
+    def __init__(self):
+        """Initialize the statistics."""
+        super().__init__()
+        self.requests = 0
+        self.degraded_requests = 0
+        self.stage_latency: dict[str, LatencyStats] = {}
+        self.stage_degradations: dict[str, int] = {}
+
+    @callback
+    def record_stage(self, stage: str, elapsed: float, degraded: bool) -> None:
+        """Record one stage of an utterance."""
+        self.stage_latency.setdefault(stage, LatencyStats()).record(elapsed * 1000)
+        if degraded:
+            self.stage_degradations[stage] = self.stage_degradations.get(stage, 0) + 1
+
+    @callback
+    def record_request(self, degraded: bool) -> None:
+        """Record a finished utterance."""
+        self.requests += 1
+        if degraded:
+            self.degraded_requests += 1
+        self._async_notify()
+
+    def as_dict(self) -> dict:
+        """Return the statistics as a dictionary."""
+        return {
+            "requests": self.requests,
+            "degraded_requests": self.degraded_requests,
+            "stages": {
+                stage: {
+                    "count": latency.count,
+                    "avg_ms": round(latency.avg_ms, 1),
+                    "max_ms": round(latency.max_ms, 1),
+                    "degraded": self.stage_degradations.get(stage, 0),
+                }
+                for stage, latency in self.stage_latency.items()
+            },
+        }
+
+
+class EntityRetrievalStats(StatsPublisher):
+    """Prompt tokens saved by entity retrieval and the recall of the entities the model actually used."""
+
+    def __init__(self):
+        """Initialize the statistics."""
+        super().__init__()
+        self.requests = 0
+        self.entities_total = 0
+        self.entities_sent = 0
+        self.full_tokens = 0
+        self.sent_tokens = 0
+        self.used_entities = 0
+        self.used_entities_sent = 0
+
+    @property
+    def recall(self) -> float:
+        """Percentage of the entities used in tool calls that were sent in the prompt."""
+        return round(self.used_entities_sent / self.used_entities * 100, 1) if self.used_entities else 100.0
+
+    @property
+    def saved_tokens(self) -> int:
+        """Prompt tokens saved compared to sending every entity."""
+        return self.full_tokens - self.sent_tokens
+
+    @callback
+    def record_retrieval(self, entities_total: int, entities_sent: int, full_tokens: int, sent_tokens: int) -> None:
+        """Record the entities prompt of one request."""
+        self.requests += 1
+        self.entities_total += entities_total
+        self.entities_sent += entities_sent
+        self.full_tokens += full_tokens
+        self.sent_tokens += sent_tokens
+        self._async_notify()
+
+    @callback
+    def record_usage(self, used_entity_ids: set[str], sent_entity_ids: set[str]) -> None:
+        """Record the entities targeted by the tool calls of a response."""
+        if not used_entity_ids:
+            return
+        self.used_entities += len(used_entity_ids)
+        self.used_entities_sent += len(used_entity_ids & sent_entity_ids)
+        self._async_notify()
+
+    def as_dict(self) -> dict:
+        """Return the statistics as a dictionary."""
+        return {
+            "requests": self.requests,
+            "entities_total": self.entities_total,
+            "entities_sent": self.entities_sent,
+            "full_tokens": self.full_tokens,
+            "sent_tokens": self.sent_tokens,
+            "saved_tokens": self.saved_tokens,
+            "used_entities": self.used_entities,
+            "used_entities_sent": self.used_entities_sent,
+            "recall": self.recall,
+        }
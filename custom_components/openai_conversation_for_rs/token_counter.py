@@ -0,0 +1,89 @@
+"""Token counting of chat completion messages."""
+
+import hashlib
+import json
+import logging
+from collections import OrderedDict
+from typing import Optional
+
+import tiktoken
+from homeassistant.core import HomeAssistant
+
+_LOGGER = logging.getLogger(__name__)
+
+TOKEN_ENCODING = "o200k_base"
+# 메시지마다 role 구분 등으로 붙는 추가 토큰
+MESSAGE_TOKEN_OVERHEAD = 3
+STATIC_COUNT_CACHE_SIZE = 64
+
+
+class TokenCounter:
+    """Count the tokens of chat completion messages.
+
+    The encoder is loaded once in the executor by ``async_load``, so counting never blocks the event loop on loading
+    it. Until it is loaded, or if loading failed, token counts are estimated from the UTF-8 length. Counts of
+    static prompts, such as system prompts, are memoized by the hash of their content.
+    """
+
+    def __init__(self):
+        """Initialize the counter."""
+        self._encoder: Optional[tiktoken.Encoding] = None
+        self._static_counts: OrderedDict[str, int] = OrderedDict()
+
+    @property
+    def loaded(self) -> bool:
+        """Return True if the encoder is loaded."""
+        return self._encoder is not None
+
+    async def async_load(self, hass: HomeAssistant) -> None:
+        """Load the encoder in the executor."""
+        try:
+            self._encoder = await hass.async_add_executor_job(tiktoken.get_encoding, TOKEN_ENCODING)
+        except Exception as err:
+            _LOGGER.warning("Failed to load the %s encoder, estimating token counts: %s", TOKEN_ENCODING, err)
+
+    def count_text(self, text: str) -> int:
+        """Count the tokens of a text."""
+        if self._encoder is None:
+            # 인코더가 없으면 UTF-8 4바이트당 1토큰으로 추정
+            return len(text.encode("utf-8")) // 4 + 1
+        return len(self._encoder.encode(text, disallowed_special=()))
+
+    def count_static(self, text: str) -> int:
+        """Count the tokens of a prompt that rarely changes, memoized by its content hash."""
+        key = hashlib.sha256(text.encode("utf-8")).hexdigest()
+        if (count := self._static_counts.get(key)) is not None:
+            self._static_counts.move_to_end(key)
+            return count
+
+        count = self.count_text(text)
+        # 추정치는 인코더가 로드된 뒤 다시 계산하도록 캐시하지 않음
+        if self.loaded:
+            self._static_counts[key] = count
+            if len(self._static_counts) > STATIC_COUNT_CACHE_SIZE:
+                self._static_counts.popitem(last=False)
+        return count
+
+    def count_message(self, message: dict, volatile: bool = False) -> int:
+        """Count the tokens a message adds to a chat completion request.
+
+        Args:
+            message: message in the chat completion request format
+            volatile: count system content without the memo, for messages that are counted only once or change on
+                every request, so they do not evict the static prompts
+
+        Returns:
+            int: token count of every field value plus the per-message overhead
+
+        """
+        tokens = MESSAGE_TOKEN_OVERHEAD
+        for key, value in message.items():
+            if key == "id" or value is None:
+                continue
+            if key == "content" and message.get("role") == "system" and not volatile:
+                tokens += self.count_static(value)
+                continue
+            if not isinstance(value, str):
+                value = json.dumps(value, ensure_ascii=False)
+            tokens += self.count_text(value)
+        return tokens
@@ -0,0 +1,228 @@
+"""Concurrent scheduler for the tool calls of one model response."""
+
+import asyncio
+import logging
+import time
+from collections.abc import Awaitable, Callable
+from dataclasses import dataclass
+from typing import Any, Optional
+
+from homeassistant.core import HomeAssistant
+
+from .const import DEFAULT_TOOL_CALL_CONCURRENCY, DEFAULT_TOOL_CALL_TIMEOUT
+from .entity_retriever import tool_call_entity_ids
+
+_LOGGER = logging.getLogger(__name__)
+
+
+@dataclass(slots=True)
+class ToolCallResult:
+    """Result of one tool call."""
+
+    tool_call_id: str
+    success: bool
+    elapsed: float
+    timed_out: bool = False
+    # 응답 시간 예산 안에 끝나지 않아 백그라운드에서 계속 실행 중
+    pending: bool = False
+
+    @property
+    def message_content(self) -> str:
+        """Content of the ToolMessage reporting this result."""
+        if self.pending:
+            return "Sent"
+        if self.timed_out:
+            return "Timeout"
+        return "Success" if self.success else "Failed"
+
+    def as_dict(self) -> dict:
+        """Return the result as a dictionary."""
+        return {
+            "tool_call_id": self.tool_call_id,
+            "success": self.success,
+            "elapsed_ms": round(self.elapsed * 1000, 1),
+            "timed_out": self.timed_out,
+            "pending": self.pending,
+        }
+
+
+class ToolCallScheduler:
+    """Run the tool calls of a model response concurrently.
+
+    Calls on disjoint entities run in parallel up to ``max_concurrency``. Calls sharing an entity_id are chained in
+    the order they were submitted, so "turn on, then set the brightness" of one light keeps its order. Automation edits
+    run concurrently too, since AutomationStore serializes and coalesces the writes and reloads of automations.yaml.
+    Every call is bounded by ``timeout``. Service calls that only differ in their entity_id are coalesced into one call
+    targeting all of the entities, unless a call between them targets one of those entities.
+    """
+
+    def __init__(
+        self,
+        hass: HomeAssistant,
+        api_handler: Any,
+        max_concurrency: int = DEFAULT_TOOL_CALL_CONCURRENCY,
+        timeout: float = DEFAULT_TOOL_CALL_TIMEOUT,
+    ):
+        """Initialize the scheduler.
+
+        Args:
+            hass: Home Assistant instance
+            api_handler: HassApiHandler executing the calls
+            max_concurrency: maximum number of calls running at once
+            timeout: seconds before a single call is reported as timed out
+
+        """
+        self.hass = hass
+        self.api_handler = api_handler
+        self.timeout = timeout
+        self.timeouts = 0
+        self.last_results: list[ToolCallResult] = []
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+        # entity_id별로 마지막에 제출된 호출, 같은 엔티티의 다음 호출은 이 호출이 끝난 뒤 실행
+        self._entity_tails: dict[str, asyncio.Task[ToolCallResult]] = {}
+
+    def submit(self, tool_call: Any) -> asyncio.Task[ToolCallResult]:
+        """Start a tool call after the earlier calls on its entities and return the task resolving to its result."""
+        return self._start_chained(
+            tool_call_entity_ids(tool_call.function),
+            tool_call.id,
+            lambda: self.api_handler.process_api_call(tool_call.function),
+        )
+
+    def submit_all(self, tool_calls: list[Any]) -> list[asyncio.Task[ToolCallResult]]:
+        """Start tool calls, coalescing duplicate service calls, and return one task per tool call in order."""
+        batches: dict[str, list[Any]] = {}
+        for members in self._coalesce(tool_calls):
+            if len(members) >= 2:
+                batches.update((member.id, members) for member in members)
+
+        # 묶음은 첫 멤버의 순서에 시작해야 앞선 호출과의 엔티티 순서가 지켜짐
+        batch_tasks: dict[str, asyncio.Task[ToolCallResult]] = {}
+        tasks = []
+        for tool_call in tool_calls:
+            if (members := batches.get(tool_call.id)) is None:
+                tasks.append(self.submit(tool_call))
+                continue
+
+            if (batch_task := batch_tasks.get(members[0].id)) is None:
+                batch_task = batch_tasks[members[0].id] = self._submit_batch(members)
+            tasks.append(self.hass.async_create_task(self._async_batch_member(batch_task, tool_call.id)))
+        return tasks
+
+    def _coalesce(self, tool_calls: list[Any]) -> list[list[Any]]:
+        """Group service calls sharing a batch key, in tool_call order.
+
+        A call only joins an earlier group if none of the calls between them targets one of its entities, since the
+        group runs at the position of its first member.
+        """
+        groups: list[list[Any]] = []
+        # batch_key -> (멤버, 사이에 끼어든 호출의 엔티티)
+        open_groups: dict[tuple, tuple[list[Any], set[str]]] = {}
+        for tool_call in tool_calls:
+            entity_ids = set(tool_call_entity_ids(tool_call.function))
+            batch_key = self.api_handler.service_batch_key(tool_call.function)
+            group = open_groups.get(batch_key) if batch_key else None
+            if group is not None and not entity_ids & group[1]:
+                group[0].append(tool_call)
+            elif batch_key:
+                group = open_groups[batch_key] = ([tool_call], set())
+                groups.append(group[0])
+            else:
+                groups.append([tool_call])
+
+            for members, between_entity_ids in open_groups.values():
+                if members[-1] is not tool_call:
+                    between_entity_ids.update(entity_ids)
+        return groups
+
+    def _submit_batch(self, tool_calls: list[Any]) -> asyncio.Task[ToolCallResult]:
+        """Start coalesced service calls as one call."""
+        tool_call_ids = ",".join(tool_call.id for tool_call in tool_calls)
+        _LOGGER.info("coalesced %d tool calls into one service call: %s", len(tool_calls), tool_call_ids)
+        return self._start_chained(
+            [entity_id for tool_call in tool_calls for entity_id in tool_call_entity_ids(tool_call.function)],
+            tool_call_ids,
+            lambda: self.api_handler.process_service_batch([tool_call.function for tool_call in tool_calls]),
+        )
+
+    async def async_run_all(self, tool_calls: list[Any]) -> list[ToolCallResult]:
+        """Run tool calls concurrently and return their results in tool_call order."""
+        return await self.async_gather(self.submit_all(tool_calls))
+
+    async def async_gather(
+        self,
+        tasks: list[asyncio.Task],
+        timeout: Optional[float] = None,
+        tool_call_ids: Optional[list[str]] = None,
+    ) -> list[ToolCallResult]:
+        """Wait for submitted tool calls and return their results in the given order.
+
+        Args:
+            tasks: tasks from submit or submit_all
+            timeout: seconds to wait; calls still running after it keep running and are reported as pending
+            tool_call_ids: ids of the tool calls of the tasks, required with timeout
+
+        """
+        if timeout is None or not tasks:
+            results = list(await asyncio.gather(*tasks))
+        else:
+            start = time.perf_counter()
+            _, pending = await asyncio.wait(tasks, timeout=timeout)
+            results = [
+                ToolCallResult(tool_call_id, False, time.perf_counter() - start, pending=True)
+                if task in pending
+                else task.result()
+                for task, tool_call_id in zip(tasks, tool_call_ids)
+            ]
+        self.last_results = results
+        return results
+
+    def _start_chained(
+        self, entity_ids: list[str], tool_call_id: str, call: Callable[[], Awaitable[bool]]
+    ) -> asyncio.Task[ToolCallResult]:
+        """Start a call once the calls submitted earlier on any of its entities are done."""
+        predecessors = {self._entity_tails[entity_id] for entity_id in entity_ids if entity_id in self._entity_tails}
+        task = self.hass.async_create_task(self._async_execute_after(predecessors, tool_call_id, call), tool_call_id)
+        for entity_id in entity_ids:
+            self._entity_tails[entity_id] = task
+
+        def release(_task: asyncio.Task) -> None:
+            for entity_id in entity_ids:
+                if self._entity_tails.get(entity_id) is task:
+                    del self._entity_tails[entity_id]
+
+        task.add_done_callback(release)
+        return task
+
+    async def _async_execute_after(
+        self, predecessors: set[asyncio.Task], tool_call_id: str, call: Callable[[], Awaitable[bool]]
+    ) -> ToolCallResult:
+        """Wait for the earlier calls on the same entities, then run the call."""
+        if predecessors:
+            # 앞선 호출의 성공 여부와 관계없이 순서만 지킴
+            await asyncio.wait(predecessors)
+        return await self._async_execute(tool_call_id, call)
+
+    @staticmethod
+    async def _async_batch_member(batch_task: asyncio.Task[ToolCallResult], tool_call_id: str) -> ToolCallResult:
+        """Report the result of a coalesced service call for one of its tool calls."""
+        batch_result = await batch_task
+        return ToolCallResult(tool_call_id, batch_result.success, batch_result.elapsed, batch_result.timed_out)
+
+    async def _async_execute(self, tool_call_id: str, call: Callable[[], Awaitable[bool]]) -> ToolCallResult:
+        """Run one call under the concurrency limit and timeout."""
+        async with self._semaphore:
+            start = time.perf_counter()
+            try:
+                async with asyncio.timeout(self.timeout):
+                    success = await call()
+                result = ToolCallResult(tool_call_id, bool(success), time.perf_counter() - start)
+            except TimeoutError:
+                self.timeouts += 1
+                result = ToolCallResult(tool_call_id, False, time.perf_counter() - start, timed_out=True)
+            except Exception as err:
+                _LOGGER.error("Tool call %s failed: %s", tool_call_id, err)
+                result = ToolCallResult(tool_call_id, False, time.perf_counter() - start)
+
+        _LOGGER.info("tool_call %s: %s in %.0f ms", tool_call_id, result.message_content, result.elapsed * 1000)
+        return result
@@ -0,0 +1 @@
+"""Tests for the Azure OpenAI GPT conversation RS-Tuned integration."""
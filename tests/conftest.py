@@ -0,0 +1,9 @@
+"""Fixtures for the Azure OpenAI GPT conversation RS-Tuned tests."""
+
+from unittest.mock import patch
+
+import netifaces
+
+# 통합구성요소는 import 시점에 스피커의 end0 인터페이스 MAC 주소를 읽으므로 테스트 환경에서는 고정값 사용
+with patch("netifaces.ifaddresses", return_value={netifaces.AF_PACKET: [{"addr": "00:11:22:33:44:55"}]}):
+    import custom_components.openai_conversation_for_rs  # noqa: F401
@@ -0,0 +1,50 @@
+"""Tests for the Home Assistant API handler."""
+
+from types import SimpleNamespace
+
+import voluptuous as vol
+from homeassistant.core import HomeAssistant
+from pytest_homeassistant_custom_component.common import async_mock_service
+
+from custom_components.openai_conversation_for_rs import HassApiHandler
+
+
+async def test_service_batch_splits_comma_separated_entity_ids(hass: HomeAssistant) -> None:
+    """A coalesced call targets every entity of comma-separated entity_id strings once."""
+    calls = async_mock_service(hass, "light", "turn_on")
+    api_handler = HassApiHandler(hass)
+
+    success = await api_handler.process_service_batch(
+        [
+            SimpleNamespace(endpoint="/api/services/light/turn_on", body={"entity_id": "light.a, light.b"}),
+            SimpleNamespace(endpoint="/api/services/light/turn_on", body={"entity_id": ["light.b", "light.c"]}),
+        ]
+    )
+
+    assert success
+    assert len(calls) == 1
+    assert calls[0].data["entity_id"] == ["light.a", "light.b", "light.c"]
+
+
+async def test_reload_without_id_support_reloads_everything(hass: HomeAssistant) -> None:
+    """When automation.reload takes no id, one full reload is issued per flush."""
+    calls = async_mock_service(hass, "automation", "reload", schema=vol.Schema({}))
+    api_handler = HassApiHandler(hass)
+
+    await api_handler._reload_automation(["a"])
+    await api_handler._reload_automation(["a", "b"])
+
+    assert [call.data for call in calls] == [{}, {}]
+    assert api_handler.reload_timings.as_dict().keys() == {"full"}
+
+
+async def test_reload_targets_a_single_automation(hass: HomeAssistant) -> None:
+    """One affected automation is reloaded by id, several are reloaded with one full reload."""
+    calls = async_mock_service(hass, "automation", "reload", schema=vol.Schema({vol.Optional("id"): str}))
+    api_handler = HassApiHandler(hass)
+
+    await api_handler._reload_automation(["a"])
+    await api_handler._reload_automation(["a", "b"])
+    await api_handler._reload_automation(None)
+
+    assert [call.data for call in calls] == [{"id": "a"}, {}, {}]
@@ -0,0 +1,124 @@
+"""Tests for the automations.yaml store."""
+
+import asyncio
+import time
+
+import yaml
+from homeassistant.core import HomeAssistant
+
+from custom_components.openai_conversation_for_rs.automation_store import AutomationStore
+
+
+def _store(hass: HomeAssistant, tmp_path, reloads: list) -> AutomationStore:
+    async def reload(automation_ids):
+        reloads.append(automation_ids)
+
+    store = AutomationStore(hass, reload, write_delay=0.01)
+    store.path = str(tmp_path / "automations.yaml")
+    return store
+
+
+async def test_burst_of_edits_is_one_write_and_one_reload(hass: HomeAssistant, tmp_path) -> None:
+    """Concurrent edits are applied by one flush and reload only the affected automations."""
+    (tmp_path / "automations.yaml").write_text(yaml.dump([{"id": "old", "alias": "기존 자동화"}]))
+    reloads = []
+    store = _store(hass, tmp_path, reloads)
+
+    created_a, created_b, deleted = await asyncio.gather(
+        store.async_create({"id": "a", "alias": "아침 조명"}),
+        store.async_create({"id": "b", "alias": "저녁 조명"}),
+        store.async_delete("기존 자동화"),
+    )
+
+    assert created_a and created_b
+    assert deleted == ["old"]
+    assert reloads == [["a", "b", "old"]]
+    automations = yaml.safe_load((tmp_path / "automations.yaml").read_text())
+    assert [automation["id"] for automation in automations] == ["a", "b"]
+
+
+async def test_external_edit_is_kept_and_reloads_everything(hass: HomeAssistant, tmp_path) -> None:
+    """An edit made outside of the store is loaded again before writing, followed by a full reload."""
+    reloads = []
+    store = _store(hass, tmp_path, reloads)
+    await store.async_create({"id": "a", "alias": "아침 조명"})
+
+    path = tmp_path / "automations.yaml"
+    path.write_text(path.read_text() + yaml.dump([{"id": "ui", "alias": "UI에서 만든 자동화"}]))
+    await store.async_create({"id": "b", "alias": "저녁 조명"})
+
+    assert reloads == [["a"], None]
+    automations = yaml.safe_load(path.read_text())
+    assert [automation["id"] for automation in automations] == ["a", "ui", "b"]
+
+
+async def test_deleting_an_unknown_alias_does_not_write(hass: HomeAssistant, tmp_path) -> None:
+    """A delete without a matching automation leaves the file untouched."""
+    reloads = []
+    store = _store(hass, tmp_path, reloads)
+
+    assert await store.async_delete("없는 자동화") == []
+    assert reloads == []
+    assert not (tmp_path / "automations.yaml").exists()
+
+
+async def test_deleting_an_automation_without_id_reloads_everything(hass: HomeAssistant, tmp_path) -> None:
+    """An automation without an id cannot be reloaded on its own, so every automation is reloaded."""
+    (tmp_path / "automations.yaml").write_text(yaml.dump([{"alias": "id 없는 자동화"}, {"id": "a", "alias": "아침"}]))
+    reloads = []
+    store = _store(hass, tmp_path, reloads)
+
+    assert await store.async_delete("id 없는 자동화") == [None]
+    assert reloads == [None]
+
+
+async def test_failed_reload_keeps_the_written_outcomes(hass: HomeAssistant, tmp_path) -> None:
+    """A reload error after the write still reports the edits that are on disk."""
+
+    async def reload(automation_ids):
+        raise RuntimeError("reload failed")
+
+    store = AutomationStore(hass, reload, write_delay=0.01)
+    store.path = str(tmp_path / "automations.yaml")
+
+    assert await store.async_create({"id": "a", "alias": "아침 조명"})
+    assert await store.async_delete("아침 조명") == ["a"]
+    assert yaml.safe_load((tmp_path / "automations.yaml").read_text()) == []
+
+
+def _read_modify_write(path, automation_config: dict) -> None:
+    """Add an automation the way it was done before the store, parsing and dumping the whole file."""
+    with open(path, encoding="utf-8") as file:
+        automations = yaml.safe_load(file.read()) or []
+    automations.append(automation_config)
+    with open(path, "w", encoding="utf-8") as file:
+        file.write(yaml.dump(automations, default_flow_style=False))
+
+
+async def test_burst_of_edits_beats_read_modify_write_with_500_automations(hass: HomeAssistant, tmp_path) -> None:
+    """Five edits on a file of 500 automations cost one dump instead of five full parses and dumps."""
+    automations = [
+        {"id": f"bench_{index}", "alias": f"자동화 {index}", "trigger": [{"platform": "time", "at": "07:00:00"}]}
+        for index in range(500)
+    ]
+    path = tmp_path / "automations.yaml"
+    path.write_text(yaml.dump(automations, default_flow_style=False))
+    new_automations = [{"id": f"new_{index}", "alias": f"새 자동화 {index}"} for index in range(5)]
+
+    start = time.perf_counter()
+    for automation_config in new_automations:
+        _read_modify_write(path, automation_config)
+    read_modify_write = time.perf_counter() - start
+
+    path.write_text(yaml.dump(automations, default_flow_style=False))
+    reloads = []
+    store = _store(hass, tmp_path, reloads)
+    # 첫 flush에서 파일을 한 번 읽고 이후에는 메모리의 자동화 목록을 사용
+    await store.async_create({"id": "warm", "alias": "준비"})
+    start = time.perf_counter()
+    assert all(await asyncio.gather(*(store.async_create(config) for config in new_automations)))
+    store_burst = time.perf_counter() - start
+
+    assert len(yaml.safe_load(path.read_text())) == 506
+    assert reloads[-1] == [automation_config["id"] for automation_config in new_automations]
+    assert store_burst < read_modify_write
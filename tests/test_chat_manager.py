@@ -0,0 +1,76 @@
+"""Tests for the chat history of the chat manager."""
+
+import statistics
+import time
+
+import pytest
+from homeassistant.core import HomeAssistant
+
+from custom_components.openai_conversation_for_rs.chat_history_store import ChatHistoryStore
+from custom_components.openai_conversation_for_rs.chat_manager import ChatManager, to_request_dict
+from custom_components.openai_conversation_for_rs.message_model import AssistantMessage, UserMessage
+from custom_components.openai_conversation_for_rs.token_counter import TokenCounter
+
+
+def _chat_manager(hass: HomeAssistant, token_budget: int = 10000) -> ChatManager:
+    return ChatManager("speaker", ChatHistoryStore(hass, "entry", TokenCounter()), token_budget=token_budget)
+
+
+async def test_chat_input_is_kept_next_to_the_messages(hass: HomeAssistant) -> None:
+    """The request dictionaries match a fresh serialization of the messages, without ids."""
+    chat_manager = _chat_manager(hass)
+    chat_manager.add_message(UserMessage(content="거실 불 켜줘"))
+    chat_manager.add_message(AssistantMessage(content="거실 불을 켰어요."))
+
+    chat_input = chat_manager.get_chat_input()
+    assert chat_input == [to_request_dict(message) for message in chat_manager.get_messages()]
+    assert all("id" not in message for message in chat_input)
+    assert len(chat_manager.get_chat_input_tokens()) == len(chat_input)
+
+    # 요청을 만들며 목록을 바꿔도 기록은 그대로
+    chat_input.append({"role": "system", "content": "live states"})
+    assert len(chat_manager.get_chat_input()) == 2
+
+
+async def test_chat_input_follows_eviction_and_reset(hass: HomeAssistant) -> None:
+    """Evicted turns leave the request dictionaries and token counts together with their messages."""
+    chat_manager = _chat_manager(hass, token_budget=40)
+    for turn in range(4):
+        chat_manager.add_message(UserMessage(content=f"{turn}번째 명령을 실행해줘"))
+        chat_manager.add_message(AssistantMessage(content=f"{turn}번째 명령을 실행했어요."))
+
+    messages = chat_manager.get_messages()
+    assert len(messages) < 8
+    assert messages[0].role == "user"
+    assert chat_manager.get_chat_input() == [to_request_dict(message) for message in messages]
+    history = chat_manager.chat_cache.get_history()
+    assert history.total_tokens == sum(chat_manager.get_chat_input_tokens())
+
+    chat_manager.reset_messages()
+    assert chat_manager.get_chat_input() == []
+    assert chat_manager.get_chat_input_tokens() == []
+
+
+@pytest.mark.parametrize("message_count", [20, 200, 2000])
+async def test_chat_input_beats_serializing_the_history(hass: HomeAssistant, message_count: int) -> None:
+    """Copying the kept request dictionaries is faster than serializing every retained message again."""
+    chat_manager = _chat_manager(hass, token_budget=10**9)
+    chat_manager.chat_cache.max_messages = message_count
+    for turn in range(message_count // 2):
+        chat_manager.add_message(UserMessage(content=f"{turn}번째 명령을 실행해줘"))
+        chat_manager.add_message(AssistantMessage(content=f"{turn}번째 명령을 실행했어요."))
+    messages = chat_manager.get_messages()
+    assert len(messages) == message_count
+
+    cached = []
+    serialized = []
+    for _ in range(20):
+        start = time.perf_counter()
+        chat_manager.get_chat_input()
+        cached.append(time.perf_counter() - start)
+
+        start = time.perf_counter()
+        [to_request_dict(message) for message in messages]
+        serialized.append(time.perf_counter() - start)
+
+    assert statistics.median(cached) < statistics.median(serialized)
@@ -0,0 +1,99 @@
+"""Tests for assembling streamed chat completions."""
+
+from openai.types.chat import ChatCompletionChunk
+
+from custom_components.openai_conversation_for_rs.chat_stream import ChatStreamAssembler
+
+
+def _chunk(content=None, tool_calls=None, finish_reason=None, choices=True, usage=None) -> ChatCompletionChunk:
+    delta = {}
+    if content is not None:
+        delta["content"] = content
+    if tool_calls is not None:
+        delta["tool_calls"] = tool_calls
+    return ChatCompletionChunk.model_validate(
+        {
+            "id": "chunk",
+            "object": "chat.completion.chunk",
+            "created": 0,
+            "model": "gpt-4o",
+            "choices": [{"index": 0, "delta": delta, "finish_reason": finish_reason}] if choices else [],
+            "usage": usage,
+        }
+    )
+
+
+def _tool_call_delta(index, arguments, call_id=None, name=None) -> dict:
+    function = {"arguments": arguments}
+    if name is not None:
+        function["name"] = name
+    delta = {"index": index, "function": function}
+    if call_id is not None:
+        delta.update(id=call_id, type="function")
+    return delta
+
+
+def test_sentences_are_emitted_as_they_complete() -> None:
+    """Each complete sentence is handed over as soon as the next one starts, short fragments are merged."""
+    sentences = []
+    assembler = ChatStreamAssembler(on_sentence=sentences.append)
+
+    for text in ["네. 거실 ", "온도를 24.5도로 ", "맞췄어요. ", "다른 것도 ", "필요하세요?"]:
+        assembler.add_chunk(_chunk(content=text))
+        if text == "다른 것도 ":
+            assert sentences == ["네. 거실 온도를 24.5도로 맞췄어요."]
+
+    assembler.add_chunk(_chunk(finish_reason="stop"))
+    assembler.finish()
+
+    assert sentences == ["네. 거실 온도를 24.5도로 맞췄어요.", "다른 것도 필요하세요?"]
+    assert assembler.finish_reason == "stop"
+    assert assembler.to_message_dict() == {
+        "role": "assistant",
+        "content": "네. 거실 온도를 24.5도로 맞췄어요. 다른 것도 필요하세요?",
+    }
+
+
+def test_tool_calls_are_merged_and_started_once_complete() -> None:
+    """Tool call deltas are merged by index and each call is reported once, as soon as its arguments are complete."""
+    started = []
+    assembler = ChatStreamAssembler(on_tool_call=started.append)
+
+    assembler.add_chunk(_chunk(tool_calls=[_tool_call_delta(0, "", call_id="call_a", name="execute_services")]))
+    assembler.add_chunk(_chunk(tool_calls=[_tool_call_delta(0, '{"list": [{"domain": "light"}')]))
+    assert started == []
+    assembler.add_chunk(_chunk(tool_calls=[_tool_call_delta(0, "]}")]))
+    assert [tool_call["id"] for tool_call in started] == ["call_a"]
+
+    assembler.add_chunk(_chunk(tool_calls=[_tool_call_delta(1, '{"a": 1}', call_id="call_b", name="get_state")]))
+    assembler.add_chunk(_chunk(finish_reason="tool_calls"))
+    assembler.finish()
+
+    assert [tool_call["id"] for tool_call in started] == ["call_a", "call_b"]
+    assert assembler.finish_reason == "tool_calls"
+    assert assembler.to_message_dict() == {
+        "role": "assistant",
+        "content": None,
+        "tool_calls": [
+            {
+                "id": "call_a",
+                "type": "function",
+                "function": {"name": "execute_services", "arguments": '{"list": [{"domain": "light"}]}'},
+            },
+            {"id": "call_b", "type": "function", "function": {"name": "get_state", "arguments": '{"a": 1}'}},
+        ],
+    }
+
+
+def test_chunks_without_choices_are_skipped() -> None:
+    """Content filter chunks without choices carry nothing, the usage chunk is kept."""
+    assembler = ChatStreamAssembler()
+
+    assert not assembler.add_chunk(_chunk(choices=False))
+    assert assembler.add_chunk(_chunk(content="안녕하세요"))
+    assert not assembler.add_chunk(
+        _chunk(choices=False, usage={"prompt_tokens": 10, "completion_tokens": 2, "total_tokens": 12})
+    )
+
+    assert assembler.content == "안녕하세요"
+    assert assembler.usage.total_tokens == 12
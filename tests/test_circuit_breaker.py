@@ -0,0 +1,135 @@
+"""Tests for the circuit breakers of the remote endpoints."""
+
+import asyncio
+from unittest.mock import MagicMock, patch
+
+import pytest
+from aiohttp import web
+from homeassistant.core import HomeAssistant
+from pytest_homeassistant_custom_component.common import MockConfigEntry
+
+from custom_components.openai_conversation_for_rs import AzureOpenAIAgent
+from custom_components.openai_conversation_for_rs.circuit_breaker import (
+    MIN_CALLS,
+    STATE_CLOSED,
+    STATE_HALF_OPEN,
+    STATE_OPEN,
+    CircuitBreaker,
+)
+from custom_components.openai_conversation_for_rs.const import DOMAIN
+from custom_components.openai_conversation_for_rs.http_client import EndpointTimings, create_client_session
+
+
+@pytest.fixture
+def clock():
+    """Patch the monotonic clock of the breaker with a settable one."""
+    now = [1000.0]
+    with patch("custom_components.openai_conversation_for_rs.circuit_breaker.time.monotonic", lambda: now[0]):
+        yield now
+
+
+def _open_breaker(breaker: CircuitBreaker) -> None:
+    for _ in range(breaker.min_calls):
+        assert breaker.allow_request()
+        breaker.record(0.1, False)
+
+
+def test_breaker_opens_on_failures_and_slow_calls(clock) -> None:
+    """The circuit opens once enough calls were made and half of them failed or were slow."""
+    breaker = CircuitBreaker("cache", min_calls=4, slow_call_threshold=1.0)
+    breaker.record(0.1, True)
+    breaker.record(0.1, False)
+    breaker.record(0.1, True)
+    assert breaker.state == STATE_CLOSED
+
+    breaker.record(2.0, True)
+    assert breaker.state == STATE_OPEN
+    assert not breaker.allow_request()
+    assert breaker.skipped == 1
+
+
+def test_half_open_probe_closes_the_circuit(clock) -> None:
+    """After the open duration one probe is let through, and a good probe closes the circuit."""
+    breaker = CircuitBreaker("cache", open_duration=5.0)
+    _open_breaker(breaker)
+
+    clock[0] += 5.0
+    assert breaker.allow_request()
+    assert breaker.state == STATE_HALF_OPEN
+    # probe가 끝나기 전의 다른 요청은 건너뜀
+    assert not breaker.allow_request()
+
+    breaker.record(0.1, True)
+    assert breaker.state == STATE_CLOSED
+    assert breaker.failure_rate == 0.0
+    assert breaker.allow_request()
+
+
+def test_failed_probe_doubles_the_open_duration(clock) -> None:
+    """A bad probe opens the circuit again for twice as long, up to the maximum."""
+    breaker = CircuitBreaker("cache", open_duration=5.0, max_open_duration=15.0)
+    _open_breaker(breaker)
+    clock[0] += 5.0
+
+    for duration in (10.0, 15.0):
+        assert breaker.allow_request()
+        breaker.record(0.1, False)
+        assert breaker.state == STATE_OPEN
+
+        clock[0] += duration - 0.1
+        assert not breaker.allow_request()
+        clock[0] += 0.1
+
+    assert breaker.allow_request()
+    assert breaker.opened == 3
+
+
+async def test_post_json_skips_the_stub_server_while_open(
+    hass: HomeAssistant, socket_enabled, aiohttp_server
+) -> None:
+    """Requests to a failing stub server open the circuit, and a good probe closes it again."""
+    status = [500]
+    received = []
+
+    async def handle(request: web.Request) -> web.Response:
+        received.append(await request.json())
+        if status[0] != 200:
+            return web.Response(status=status[0], text="unavailable")
+        return web.json_response({"role": "assistant", "content": "캐시"})
+
+    app = web.Application()
+    app.router.add_post("/api/v1/cache", handle)
+    server = await aiohttp_server(app)
+    url = str(server.make_url("/api/v1/cache"))
+
+    entry = MockConfigEntry(domain=DOMAIN, data={"api_key": "key", "deployment_name": "gpt-4o"})
+    timings = EndpointTimings()
+    session = create_client_session(timings)
+    agent = AzureOpenAIAgent(hass, entry, MagicMock(), session, timings)
+    # 실제 시계로 기다릴 수 있도록 짧게 열리는 차단기를 사용
+    agent.circuit_breakers._breakers["cache"] = CircuitBreaker("cache", open_duration=0.05)
+    try:
+        for _ in range(MIN_CALLS):
+            assert await agent._async_post_json("cache", url, {"input_text": "거실 불 켜줘"}) is None
+        assert agent.circuit_breakers.get("cache").state == STATE_OPEN
+
+        # 차단기가 열려 있으면 서버에 요청하지 않음
+        assert await agent._async_post_json("cache", url, {"input_text": "거실 불 켜줘"}) is None
+        assert len(received) == MIN_CALLS
+        assert agent.circuit_breakers.as_dict()["cache"]["skipped"] == 1
+
+        status[0] = 200
+        await asyncio.sleep(0.05)
+        assert await agent._async_post_json("cache", url, {"input_text": "거실 불 켜줘"}) == {
+            "role": "assistant",
+            "content": "캐시",
+        }
+        assert agent.circuit_breakers.get("cache").state == STATE_CLOSED
+
+        stats = timings.as_dict()["cache"]
+        assert stats["count"] == MIN_CALLS + 1
+        # 같은 세션으로 연결을 재사용
+        assert stats["new_connections"] + stats["reused_connections"] == MIN_CALLS + 1
+        assert stats["reused_connections"] >= MIN_CALLS
+    finally:
+        await session.close()
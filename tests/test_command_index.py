@@ -0,0 +1,91 @@
+"""Tests for the fuzzy command index of the local command cache."""
+
+import itertools
+import statistics
+import time
+
+from custom_components.openai_conversation_for_rs.command_index import CommandIndex, normalize_command
+from custom_components.openai_conversation_for_rs.const import DEFAULT_CACHE_SIMILARITY_THRESHOLD
+
+LONG_COMMAND = "거실 에어컨 희망 온도 냉방 모드로 바꾸고 바람 세기 강하게 하고 타이머도 맞춰줘"
+
+# (캐시된 명령, 같은 명령으로 처리되어야 하는 입력)
+SAME_COMMANDS = [
+    ("거실 불 켜 줘", "거실불을 켜주세요"),
+    ("안방 조명이랑 거실 조명 다 꺼줘", "안방 조명 거실 조명 다 꺼줘"),
+    (LONG_COMMAND, "거실 에어컨 희망 온도 냉방 모드로 바꾸고 바람 세기 강하게 하고 타이머 맞춰줘"),
+    ("주방 조명 밝기를 50퍼센트로 하고 식탁등도 같이 켜줘", "주방 조명 밝기 50퍼센트로 하고 식탁등 같이 켜줘"),
+    ("거실 티비 켜고 넷플릭스 틀어주고 볼륨도 좀 높여줘", "거실 티비 켜고 넷플릭스 틀어주고 볼륨 높여줘"),
+]
+
+# (캐시된 명령, 다른 명령으로 처리되어야 하는 입력)
+DIFFERENT_COMMANDS = [
+    (LONG_COMMAND, "거실 에어컨 희망 온도 난방 모드로 바꾸고 바람 세기 강하게 하고 타이머도 맞춰줘"),
+    (LONG_COMMAND, "거실 에어컨 희망 온도 냉방 모드로 바꾸고 바람 세기 약하게 하고 타이머도 맞춰줘"),
+    (LONG_COMMAND, "안방 에어컨 희망 온도 냉방 모드로 바꾸고 바람 세기 강하게 하고 타이머도 맞춰줘"),
+    ("거실 불 켜줘", "거실 불 꺼줘"),
+    ("에어컨 온도 24도로 맞춰줘", "에어컨 온도 26도로 맞춰줘"),
+    ("거실 티비 켜고 왓챠 틀어주고 볼륨 높여줘", "거실 티비 켜고 유튜브 틀어주고 볼륨 높여줘"),
+    ("거실 커튼 열고 안방 커튼도 같이 열어줘", "거실 커튼 닫고 안방 커튼도 같이 열어줘"),
+    ("작은방 조명 밝기 최대로 하고 색온도 따뜻하게 바꿔줘", "작은방 조명 밝기 최소로 하고 색온도 따뜻하게 바꿔줘"),
+]
+
+
+def _lookup(cached: str, text: str):
+    index = CommandIndex()
+    index.add(normalize_command(cached))
+    return index.lookup(normalize_command(text), DEFAULT_CACHE_SIMILARITY_THRESHOLD)
+
+
+def test_same_commands_hit() -> None:
+    """Commands that only differ in particles, fillers or spacing reuse the cached command."""
+    for cached, text in SAME_COMMANDS:
+        match = _lookup(cached, text)
+        assert match is not None, text
+        assert match[0] == normalize_command(cached)
+
+
+def test_different_commands_miss() -> None:
+    """Commands with a different content word never reuse the cached command, however long they are."""
+    false_hits = [text for cached, text in DIFFERENT_COMMANDS if _lookup(cached, text) is not None]
+    assert false_hits == []
+
+
+def test_lookup_picks_the_matching_command() -> None:
+    """With every command indexed, each input matches its own command or nothing."""
+    index = CommandIndex()
+    for cached, _ in SAME_COMMANDS + DIFFERENT_COMMANDS:
+        index.add(normalize_command(cached))
+
+    for cached, text in SAME_COMMANDS:
+        match = index.lookup(normalize_command(text), DEFAULT_CACHE_SIMILARITY_THRESHOLD)
+        assert match is not None and match[0] == normalize_command(cached)
+    for _, text in DIFFERENT_COMMANDS:
+        match = index.lookup(normalize_command(text), DEFAULT_CACHE_SIMILARITY_THRESHOLD)
+        assert match is None or match[0] == normalize_command(text)
+
+
+def test_lookup_is_sub_millisecond_with_10k_commands() -> None:
+    """Lookups stay below a millisecond with 10k indexed commands."""
+    areas = ["거실", "안방", "주방", "작은방", "서재", "현관", "욕실", "베란다", "드레스룸", "아이방"]
+    devices = ["조명", "에어컨", "티비", "커튼", "선풍기", "공기청정기", "가습기", "스피커", "보일러", "제습기"]
+    actions = ["켜줘", "꺼줘", "열어줘", "닫아줘", "바꿔줘"]
+    modes = ["", "냉방 모드로", "취침 모드로", "자동으로", "약하게", "강하게", "조용하게", "밝게", "어둡게", "천천히"]
+    values = ["", "1분 뒤에", "5분 뒤에", "10분 뒤에", "30분 뒤에"]
+    index = CommandIndex()
+    commands = [
+        normalize_command(" ".join(part for part in parts if part))
+        for parts in itertools.product(areas, devices, modes, values, actions)
+    ][:10000]
+    for command in commands:
+        index.add(command)
+    assert len(index) >= 9000
+
+    queries = [command + "도" for command in commands[::50]]
+    durations = []
+    for query in queries:
+        start = time.perf_counter()
+        index.lookup(query, DEFAULT_CACHE_SIMILARITY_THRESHOLD)
+        durations.append(time.perf_counter() - start)
+
+    assert statistics.median(durations) < 0.001
@@ -0,0 +1,158 @@
+"""Tests for the query-aware entity retrieval."""
+
+import pytest
+
+from custom_components.openai_conversation_for_rs.entity_retriever import EntityRetriever
+from custom_components.openai_conversation_for_rs.prompt_generator import PromptGenerator
+from custom_components.openai_conversation_for_rs.token_counter import TokenCounter
+
+
+def _entity(entity_id: str, name: str, area: str | None = None) -> dict:
+    """Return an entity info shaped like the ones of HaCrawler."""
+    return {
+        "entity_id": entity_id,
+        "name": name,
+        "state": "off",
+        "domain": entity_id.split(".")[0],
+        "device": None,
+        "area": {"id": area, "name": area} if area else None,
+        "labels": [],
+    }
+
+
+ENTITIES = [
+    _entity("light.living_room", "거실등", "거실"),
+    _entity("light.bedroom", "안방 스탠드", "안방"),
+    _entity("light.kitchen", "주방 조명", "주방"),
+    _entity("media_player.living_room_tv", "거실 TV", "거실"),
+    _entity("climate.living_room", "거실 에어컨", "거실"),
+    _entity("sensor.living_room_temperature", "거실 온도", "거실"),
+    _entity("switch.fan", "선풍기", "안방"),
+    _entity("cover.living_room", "거실 커튼", "거실"),
+]
+
+
+def _retrieve(query: str, top_k: int = 2, always_include=()) -> list[str]:
+    entities = EntityRetriever().retrieve(ENTITIES, query, top_k, always_include=always_include)
+    return [entity["entity_id"] for entity in entities]
+
+
+def test_entities_are_found_by_their_kind() -> None:
+    """Commands naming only the kind of device find it through the domain aliases."""
+    assert _retrieve("티비 켜줘") == ["media_player.living_room_tv"]
+    assert _retrieve("지금 몇 도야") == ["climate.living_room", "sensor.living_room_temperature"]
+    assert _retrieve("안방 불 켜줘")[0] == "light.bedroom"
+
+
+def test_all_words_lift_the_top_k_limit() -> None:
+    """Commands about every device of a kind get all of them, not only the top_k."""
+    lights = ["light.living_room", "light.bedroom", "light.kitchen"]
+    assert set(lights) <= set(_retrieve("불 다 꺼줘"))
+    assert set(lights) <= set(_retrieve("모든 조명 꺼줘"))
+
+
+def test_unmatched_query_gets_the_whole_snapshot() -> None:
+    """A query matching no entity falls back to the snapshot itself."""
+    assert EntityRetriever().retrieve(ENTITIES, "고마워", 2) is ENTITIES
+
+
+def test_top_k_and_recent_entities() -> None:
+    """Only the top_k entities are returned, plus those of the previous turns, in snapshot order."""
+    assert _retrieve("거실 커튼 열어줘", top_k=1, always_include=["switch.fan"]) == [
+        "switch.fan",
+        "cover.living_room",
+    ]
+
+
+# 평가용 집: (영역 id, 영역 이름)별 조명, 에어컨, 커튼, 온도 센서와 몇 가지 기기
+AREAS = [
+    ("living_room", "거실"),
+    ("bedroom", "안방"),
+    ("kitchen", "주방"),
+    ("small_room", "작은방"),
+    ("study", "서재"),
+    ("bathroom", "욕실"),
+    ("dress_room", "드레스룸"),
+    ("kids_room", "아이방"),
+]
+EVALUATION_ENTITIES = [
+    *(_entity(f"light.{area_id}", f"{area} 조명", area) for area_id, area in AREAS),
+    *(_entity(f"climate.{area_id}", f"{area} 에어컨", area) for area_id, area in AREAS[:5]),
+    *(_entity(f"cover.{area_id}", f"{area} 커튼", area) for area_id, area in AREAS[:5]),
+    *(_entity(f"sensor.{area_id}_temperature", f"{area} 온도", area) for area_id, area in AREAS),
+    *(_entity(f"sensor.{area_id}_humidity", f"{area} 습도", area) for area_id, area in AREAS),
+    _entity("light.study_stand", "서재 스탠드", "서재"),
+    _entity("media_player.living_room_tv", "거실 TV", "거실"),
+    _entity("media_player.bedroom_speaker", "안방 스피커", "안방"),
+    _entity("fan.bedroom", "안방 선풍기", "안방"),
+    _entity("fan.bathroom", "욕실 환풍기", "욕실"),
+    _entity("humidifier.kids_room", "아이방 가습기", "아이방"),
+    _entity("vacuum.robot", "로봇청소기", "거실"),
+    _entity("lock.front_door", "현관 도어락", "현관"),
+    _entity("switch.kitchen_outlet", "주방 커피머신 플러그", "주방"),
+]
+LIGHTS = [entity["entity_id"] for entity in EVALUATION_ENTITIES if entity["domain"] == "light"]
+
+# (발화, tool call에 쓰여야 하는 엔티티)
+UTTERANCES = [
+    ("거실 불 켜줘", ["light.living_room"]),
+    ("안방 조명 꺼줘", ["light.bedroom"]),
+    ("주방 불 좀 켜줄래", ["light.kitchen"]),
+    ("아이방 불 꺼", ["light.kids_room"]),
+    ("서재 스탠드 켜줘", ["light.study_stand"]),
+    ("거실이랑 주방 불 꺼줘", ["light.living_room", "light.kitchen"]),
+    ("불 다 꺼줘", LIGHTS),
+    ("거실 에어컨 24도로 맞춰줘", ["climate.living_room"]),
+    ("작은방 에어컨 꺼줘", ["climate.small_room"]),
+    ("안방 커튼 닫아줘", ["cover.bedroom"]),
+    ("서재 커튼 열어줘", ["cover.study"]),
+    ("작은방 온도 몇 도야", ["sensor.small_room_temperature"]),
+    ("아이방 습도 알려줘", ["sensor.kids_room_humidity"]),
+    ("티비 꺼줘", ["media_player.living_room_tv"]),
+    ("안방 스피커 볼륨 올려줘", ["media_player.bedroom_speaker"]),
+    ("선풍기 켜줘", ["fan.bedroom"]),
+    ("욕실 환풍기 켜줘", ["fan.bathroom"]),
+    ("가습기 틀어줘", ["humidifier.kids_room"]),
+    ("로봇청소기 돌려줘", ["vacuum.robot"]),
+    ("현관 문 잠가줘", ["lock.front_door"]),
+    ("커피머신 켜줘", ["switch.kitchen_outlet"]),
+]
+EVALUATION_TOP_K = 5
+
+
+@pytest.fixture
+def evaluation_states() -> dict:
+    """Return HA states shaped like HaCrawler.get_ha_states for the evaluation home."""
+    return {
+        "time": "12:00:00",
+        "date": "2026-01-01",
+        "weekday": "Thursday",
+        "entities": EVALUATION_ENTITIES,
+        "entity_versions": {entity["entity_id"]: 0 for entity in EVALUATION_ENTITIES},
+    }
+
+
+def test_retrieval_recall_and_token_savings(evaluation_states: dict) -> None:
+    """At the evaluated top_k every entity used by a tool call is sent, with far fewer prompt tokens."""
+    retriever = EntityRetriever()
+    prompt_generator = PromptGenerator()
+    token_counter = TokenCounter()
+    full_prompt = prompt_generator.get_entities_system_prompt(evaluation_states)
+    full_tokens = token_counter.count_text(full_prompt["content"])
+
+    found = expected = sent_tokens = 0
+    missed = []
+    for text, used_entity_ids in UTTERANCES:
+        entities = retriever.retrieve(evaluation_states["entities"], text, EVALUATION_TOP_K)
+        sent_ids = {entity["entity_id"] for entity in entities}
+        found += len(sent_ids.intersection(used_entity_ids))
+        expected += len(used_entity_ids)
+        missed.extend((text, entity_id) for entity_id in used_entity_ids if entity_id not in sent_ids)
+        prompt = prompt_generator.get_entities_system_prompt(evaluation_states, entities)
+        sent_tokens += token_counter.count_text(prompt["content"])
+
+    recall = found / expected
+    savings = 1 - sent_tokens / (full_tokens * len(UTTERANCES))
+    assert missed == []
+    assert recall == 1.0
+    assert savings > 0.8
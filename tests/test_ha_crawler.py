@@ -0,0 +1,95 @@
+"""Tests for the event-driven entity index of HaCrawler."""
+
+import statistics
+import time
+
+import pytest
+from homeassistant.core import HomeAssistant
+from homeassistant.helpers import entity_registry as er
+
+from custom_components.openai_conversation_for_rs.const import DOMAIN
+from custom_components.openai_conversation_for_rs.ha_crawler import HaCrawler
+
+
+async def test_snapshot_survives_unrendered_changes(hass: HomeAssistant) -> None:
+    """Attribute-only changes and filtered entities keep the snapshot."""
+    hass.states.async_set("light.living_room", "on", {"friendly_name": "거실 조명"})
+    crawler = HaCrawler(hass)
+    crawler.async_start()
+    snapshot = crawler.get_ha_states()["entities"]
+
+    hass.states.async_set("light.living_room", "on", {"friendly_name": "거실 조명", "brightness": 10})
+    hass.states.async_set("light.living_room", "on", {"friendly_name": "거실 조명", "brightness": 10}, force_update=True)
+    hass.states.async_set("sun.sun", "above_horizon")
+    await hass.async_block_till_done()
+    assert crawler.get_ha_states()["entities"] is snapshot
+
+    hass.states.async_set("light.living_room", "off", {"friendly_name": "거실 조명"})
+    await hass.async_block_till_done()
+    entities = crawler.get_ha_states()["entities"]
+    assert entities is not snapshot
+    assert [entity["state"] for entity in entities] == ["off"]
+    crawler.async_stop()
+
+
+async def test_index_matches_full_crawl(hass: HomeAssistant) -> None:
+    """The patched index equals an index crawled from scratch."""
+    hass.states.async_set("light.living_room", "on", {"friendly_name": "거실 조명"})
+    hass.states.async_set("switch.fan", "off", {"friendly_name": "선풍기"})
+    crawler = HaCrawler(hass)
+    crawler.async_start()
+    crawler.get_ha_states()
+
+    hass.states.async_set("switch.fan", "on", {"friendly_name": "선풍기"})
+    hass.states.async_set("climate.aircon", "cool", {"friendly_name": "에어컨"})
+    hass.states.async_remove("light.living_room")
+    await hass.async_block_till_done()
+
+    fresh = HaCrawler(hass)
+    fresh.async_start()
+    assert crawler.get_ha_states()["entities"] == fresh.get_ha_states()["entities"]
+    crawler.async_stop()
+    fresh.async_stop()
+
+
+async def test_own_entities_are_not_indexed(hass: HomeAssistant) -> None:
+    """The statistics sensors of this integration stay out of the prompt and keep the snapshot."""
+    registry_entry = er.async_get(hass).async_get_or_create("sensor", DOMAIN, "entry_response_cache_hits")
+    hass.states.async_set("light.living_room", "on", {"friendly_name": "거실 조명"})
+    crawler = HaCrawler(hass)
+    crawler.async_start()
+    snapshot = crawler.get_ha_states()["entities"]
+
+    hass.states.async_set(registry_entry.entity_id, "1")
+    hass.states.async_set(registry_entry.entity_id, "2")
+    await hass.async_block_till_done()
+    assert crawler.get_ha_states()["entities"] is snapshot
+    assert [entity["entity_id"] for entity in snapshot] == ["light.living_room"]
+    crawler.async_stop()
+
+
+@pytest.mark.parametrize("entity_count", [100, 1000, 10000])
+async def test_incremental_read_beats_cold_rebuild(hass: HomeAssistant, entity_count: int) -> None:
+    """Reading the snapshot after one state change is faster than crawling every entity again."""
+    for index in range(entity_count):
+        hass.states.async_set(f"light.bench_{index}", "off", {"friendly_name": f"조명 {index}"})
+    crawler = HaCrawler(hass)
+    crawler.async_start()
+    crawler.get_ha_states()
+
+    cold = []
+    for _ in range(5):
+        start = time.perf_counter()
+        HaCrawler(hass).get_ha_states()
+        cold.append(time.perf_counter() - start)
+
+    incremental = []
+    for index in range(20):
+        hass.states.async_set(f"light.bench_{index}", "on", {"friendly_name": f"조명 {index}"})
+        start = time.perf_counter()
+        entities = crawler.get_ha_states()["entities"]
+        incremental.append(time.perf_counter() - start)
+    crawler.async_stop()
+
+    assert len(entities) == entity_count
+    assert statistics.median(incremental) < statistics.median(cold)
@@ -0,0 +1,217 @@
+"""Tests for the chat message models."""
+
+import json
+import statistics
+import time
+import tracemalloc
+from typing import Any, Literal
+
+import pytest
+from openai.types.chat.chat_completion_message_tool_call import ChatCompletionMessageToolCall, Function
+from pydantic import BaseModel, ValidationError
+
+from custom_components.openai_conversation_for_rs.message_model import (
+    AssistantMessage,
+    SystemMessage,
+    ToolMessage,
+    UserMessage,
+    message_from_dict,
+)
+
+TOOL_CALL = {
+    "id": "call_1",
+    "type": "function",
+    "function": {
+        "name": "home_assistant_api",
+        "arguments": json.dumps(
+            {"method": "post", "endpoint": "/api/services/light/turn_on", "body": {"entity_id": "light.거실"}},
+            ensure_ascii=False,
+        ),
+    },
+}
+
+
+def test_assistant_message_round_trips_the_completion_format() -> None:
+    """A model response is parsed once and serialized back to the same request format."""
+    message = AssistantMessage.from_dict({"role": "assistant", "content": None, "tool_calls": [TOOL_CALL]})
+
+    tool_call = message.tool_calls[0]
+    assert tool_call.function.arguments.endpoint == "/api/services/light/turn_on"
+    assert tool_call.function.arguments.body == {"entity_id": "light.거실"}
+
+    request_dict = message.to_dict()
+    assert request_dict["tool_calls"][0]["id"] == "call_1"
+    assert json.loads(request_dict["tool_calls"][0]["function"]["arguments"]) == json.loads(
+        TOOL_CALL["function"]["arguments"]
+    )
+    # 저장용 형식은 인자를 dict로 두고, 다시 읽어도 같은 메시지
+    assert message_from_dict(message.to_dict(to_str_arguments=False)) == message
+
+
+def test_invalid_tool_calls_are_rejected_at_the_boundary() -> None:
+    """Tool calls from outside are validated by the pydantic schemas."""
+    arguments = json.dumps({"method": "patch", "endpoint": "/api/states"})
+    invalid = {**TOOL_CALL, "function": {**TOOL_CALL["function"], "arguments": arguments}}
+
+    with pytest.raises(ValidationError):
+        AssistantMessage.from_dict({"role": "assistant", "tool_calls": [invalid]})
+
+
+@pytest.mark.parametrize(
+    "message",
+    [
+        UserMessage(id=1, content="거실 불 켜줘", name="speaker"),
+        SystemMessage(id=2, content="현재 시각"),
+        ToolMessage(id=3, content="Success", tool_call_id="call_1"),
+    ],
+)
+def test_messages_round_trip_their_stored_form(message) -> None:
+    """Stored messages are restored to equal slotted messages."""
+    restored = message_from_dict(message.to_dict())
+
+    assert restored == message
+    assert not hasattr(restored, "__dict__")
+
+
+class PydanticUserMessage(BaseModel):
+    """User message as the pydantic model used before the slotted dataclasses."""
+
+    id: int | None = None
+    role: str = "user"
+    content: str
+    name: str | None = None
+
+    def to_dict(self) -> dict:
+        """Convert the message to a dictionary."""
+        ret = {"id": self.id, "role": self.role, "content": self.content}
+        if self.name:
+            ret["name"] = self.name
+        return ret
+
+
+class PydanticToolMessage(BaseModel):
+    """Tool message as the pydantic model used before the slotted dataclasses."""
+
+    id: int | None = None
+    role: str = "tool"
+    content: str
+    tool_call_id: str
+
+    def to_dict(self) -> dict:
+        """Convert the message to a dictionary."""
+        return {"id": self.id, "role": self.role, "content": self.content, "tool_call_id": self.tool_call_id}
+
+
+class PydanticApiCall(BaseModel):
+    """API call as the pydantic model used before the slotted dataclasses."""
+
+    method: Literal["get", "post", "delete"]
+    endpoint: str
+    body: dict = {}
+
+
+class PydanticApiCallFunction(Function):
+    """API call function as the pydantic model used before the slotted dataclasses."""
+
+    arguments: PydanticApiCall
+
+
+class PydanticToolCall(ChatCompletionMessageToolCall):
+    """Tool call as the pydantic model used before the slotted dataclasses."""
+
+    function: PydanticApiCallFunction
+
+
+class PydanticAssistantMessage(BaseModel):
+    """Assistant message as the pydantic model used before the slotted dataclasses."""
+
+    id: int | None = None
+    role: str = "assistant"
+    content: str | None = None
+    tool_calls: list[PydanticToolCall] = []
+
+    def __init__(self, /, **data: Any) -> None:
+        """Parse the JSON arguments of the tool calls before validating them."""
+        for tool_call in data.get("tool_calls", []):
+            if isinstance(tool_call["function"]["arguments"], str):
+                tool_call["function"]["arguments"] = json.loads(tool_call["function"]["arguments"])
+        super().__init__(**data)
+
+    def to_dict(self) -> dict:
+        """Convert the message to a dictionary with JSON tool call arguments."""
+        ret = {"id": self.id, "role": self.role}
+        if self.content:
+            ret["content"] = self.content
+        if self.tool_calls:
+            tool_calls = []
+            for tool_call in self.tool_calls:
+                tool_call_dict = tool_call.model_dump()
+                tool_call_dict["function"] = {
+                    "arguments": tool_call.function.arguments.model_dump_json(),
+                    "name": tool_call.function.name,
+                }
+                tool_calls.append(tool_call_dict)
+            ret["tool_calls"] = tool_calls
+        return ret
+
+
+def _median_seconds(func, repeat: int = 7, number: int = 500) -> float:
+    """Return the median time of ``number`` calls of func."""
+    durations = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for _ in range(number):
+            func()
+        durations.append(time.perf_counter() - start)
+    return statistics.median(durations)
+
+
+def _assistant_data() -> dict:
+    tool_call = {**TOOL_CALL, "function": dict(TOOL_CALL["function"])}
+    return {"role": "assistant", "content": None, "tool_calls": [tool_call]}
+
+
+HOT_PATH_MESSAGES = [
+    (UserMessage, PydanticUserMessage, {"content": "거실 불 켜줘", "name": "speaker"}),
+    (ToolMessage, PydanticToolMessage, {"content": "Success", "tool_call_id": "call_1"}),
+]
+
+
+@pytest.mark.parametrize(("message_type", "pydantic_type", "fields"), HOT_PATH_MESSAGES)
+def test_slotted_messages_are_faster_to_create_and_serialize(message_type, pydantic_type, fields) -> None:
+    """Creating a message and serializing it for a request costs less than with the pydantic model."""
+    assert message_type(**fields).to_dict() == pydantic_type(**fields).to_dict()
+
+    slotted = _median_seconds(lambda: message_type(**fields).to_dict())
+    pydantic = _median_seconds(lambda: pydantic_type(**fields).to_dict())
+
+    assert slotted < pydantic
+
+
+@pytest.mark.parametrize(("message_type", "pydantic_type", "fields"), HOT_PATH_MESSAGES)
+def test_slotted_messages_use_less_memory(message_type, pydantic_type, fields) -> None:
+    """A history of slotted messages allocates less memory than the same pydantic messages."""
+
+    def allocated(model) -> int:
+        tracemalloc.start()
+        messages = [model(id=index, **fields) for index in range(1000)]
+        size = tracemalloc.get_traced_memory()[0]
+        tracemalloc.stop()
+        assert len(messages) == 1000
+        return size
+
+    assert allocated(message_type) < allocated(pydantic_type)
+
+
+def test_assistant_message_keeps_up_with_the_pydantic_model() -> None:
+    """Tool calls are validated by pydantic at the boundary, so parsing and serializing cost about the same."""
+    slotted_message = AssistantMessage.from_dict(_assistant_data())
+    pydantic_message = PydanticAssistantMessage(**_assistant_data())
+    assert json.loads(slotted_message.to_dict()["tool_calls"][0]["function"]["arguments"]) == json.loads(
+        pydantic_message.to_dict()["tool_calls"][0]["function"]["arguments"]
+    )
+
+    parse = _median_seconds(lambda: AssistantMessage.from_dict(_assistant_data()))
+    pydantic_parse = _median_seconds(lambda: PydanticAssistantMessage(**_assistant_data()))
+    assert parse < pydantic_parse * 2
+    assert _median_seconds(slotted_message.to_dict) < _median_seconds(pydantic_message.to_dict) * 2
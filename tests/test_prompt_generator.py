@@ -0,0 +1,251 @@
+"""Tests for the prompt generator."""
+
+import asyncio
+import statistics
+import time
+import tracemalloc
+from types import SimpleNamespace
+
+import yaml
+
+from custom_components.openai_conversation_for_rs.ha_crawler import ServicesCatalog
+from custom_components.openai_conversation_for_rs.prompt_generator import (
+    EntitiesPromptRenderer,
+    GptHaAssistant,
+    PromptGenerator,
+)
+from custom_components.openai_conversation_for_rs.token_counter import TokenCounter
+
+
+class CountingTokenCounter(TokenCounter):
+    """Count one token per character and remember every counted text."""
+
+    def __init__(self):
+        """Initialize the counter."""
+        super().__init__()
+        self.counted: list[str] = []
+
+    @property
+    def loaded(self) -> bool:
+        """Pretend the encoder is loaded."""
+        return True
+
+    def count_text(self, text: str) -> int:
+        """Count one token per character."""
+        self.counted.append(text)
+        return len(text)
+
+
+def _entity(entity_id: str, name: str, state: str, area: str | None = None) -> dict:
+    """Return an entity info shaped like the ones of HaCrawler."""
+    return {
+        "entity_id": entity_id,
+        "name": name,
+        "state": state,
+        "domain": entity_id.split(".")[0],
+        "device": {
+            "id": f"{entity_id}_device",
+            "name": f"{name} 디바이스",
+            "name_by_user": None,
+            "model": "Model with a rather long description that wraps past the default YAML line width",
+            "manufacturer": "Manufacturer",
+        },
+        "area": {"id": area, "name": area} if area else None,
+        "labels": ["조명"] if entity_id.startswith("light.") else [],
+    }
+
+
+def _full_dump(entities: list[dict]) -> str:
+    """Dump the whole entity list at once, as the prompt was built before fragments."""
+    return yaml.dump(entities).encode("utf-8").decode("unicode_escape")
+
+
+def test_entities_renderer_matches_full_dump() -> None:
+    """Joined fragments are byte-identical to dumping the whole list, also after updates."""
+    entities = [
+        _entity("light.living_room", "거실 조명", "on", "거실"),
+        _entity("climate.aircon", "거실 에어컨", "cool", "거실"),
+        _entity("switch.fan", "선풍기", "off"),
+    ]
+    versions = {entity["entity_id"]: index for index, entity in enumerate(entities)}
+    renderer = EntitiesPromptRenderer()
+    assert renderer.render(entities, versions) == _full_dump(entities)
+
+    entities = [entities[0], _entity("climate.aircon", "거실 에어컨", "heat", "거실"), entities[2]]
+    versions["climate.aircon"] = 10
+    assert renderer.render(entities, versions) == _full_dump(entities)
+
+    subset = entities[1:]
+    assert renderer.render(subset, versions, prune=False) == _full_dump(subset)
+    # 부분 렌더링은 나머지 엔티티의 조각을 지우지 않음
+    assert renderer.render(entities, versions) == _full_dump(entities)
+
+
+def test_entities_overview_renderer_leaves_out_state() -> None:
+    """The overview renderer dumps the entities without their state."""
+    entities = [_entity("light.living_room", "거실 조명", "on", "거실"), _entity("switch.fan", "선풍기", "off")]
+    versions = {"light.living_room": 1, "switch.fan": 2}
+    stateless = [{key: value for key, value in entity.items() if key != "state"} for entity in entities]
+
+    assert EntitiesPromptRenderer(include_state=False).render(entities, versions) == _full_dump(stateless)
+
+
+def test_entities_renderer_beats_full_dump_with_1_percent_churn() -> None:
+    """With 1k entities and 10 changed per request, rendering changed fragments beats dumping the whole list."""
+    entities = [_entity(f"light.bench_{index}", f"조명 {index}", "off", "거실") for index in range(1000)]
+    versions = {entity["entity_id"]: 0 for entity in entities}
+    renderer = EntitiesPromptRenderer()
+    renderer.render(entities, versions)
+
+    incremental = []
+    full = []
+    for request in range(1, 4):
+        for index in range(request * 10, request * 10 + 10):
+            entities[index] = _entity(f"light.bench_{index}", f"조명 {index}", "on", "거실")
+            versions[entities[index]["entity_id"]] = request
+
+        start = time.perf_counter()
+        rendered = renderer.render(entities, versions)
+        incremental.append(time.perf_counter() - start)
+
+        start = time.perf_counter()
+        expected = _full_dump(entities)
+        full.append(time.perf_counter() - start)
+        assert rendered == expected
+
+    assert statistics.median(incremental) * 5 < statistics.median(full)
+
+
+def test_crop_chat_history_reuses_known_token_counts() -> None:
+    """Only messages without a known count and prompts that changed are counted."""
+    counter = CountingTokenCounter()
+    assistant = GptHaAssistant("gpt-4o", "init prompt", "automation script", [], None, counter, max_prompt_tokens=1000)
+    services_prompt = {"role": "system", "name": "homeassistant_services_overview", "content": "services"}
+    chat_history = [
+        {"role": "user", "content": "거실 불 켜줘"},
+        {"role": "assistant", "content": "켰어요"},
+        {"role": "system", "name": "homeassistant_live_states", "content": "live states 1"},
+        {"role": "user", "content": "에어컨도 켜줘"},
+    ]
+
+    assistant.crop_chat_history(chat_history, "patterns", [services_prompt], [10, 10, None, 10])
+    assert {"init prompt", "automation script", "patterns", "services", "live states 1"} <= set(counter.counted)
+    assert "거실 불 켜줘" not in counter.counted
+
+    counter.counted.clear()
+    chat_history[2] = {**chat_history[2], "content": "live states 2"}
+    assistant.crop_chat_history(chat_history, "patterns", [services_prompt], [10, 10, None, 10])
+    # 메모된 프롬프트는 role과 name만 다시 셈
+    assert set(counter.counted) == {
+        "system",
+        "homeassistant_services_overview",
+        "homeassistant_live_states",
+        "live states 2",
+    }
+    # 매번 바뀌는 메시지는 정적 프롬프트 메모를 밀어내지 않음
+    assert len(counter._static_counts) == 4
+
+
+def test_crop_chat_history_keeps_pattern_counts_across_speakers() -> None:
+    """Switching between speakers does not count their pattern prompts again."""
+    counter = CountingTokenCounter()
+    assistant = GptHaAssistant("gpt-4o", "init prompt", "", [], None, counter, max_prompt_tokens=1000)
+    chat_history = [{"role": "user", "content": "거실 불 켜줘"}]
+
+    for pattern in ("거실 패턴", "안방 패턴"):
+        assistant.crop_chat_history(chat_history, pattern, message_tokens=[10])
+    counter.counted.clear()
+    for pattern in ("거실 패턴", "안방 패턴", "거실 패턴"):
+        assistant.crop_chat_history(chat_history, pattern, message_tokens=[10])
+
+    assert counter.counted == []
+
+
+def test_crop_chat_history_drops_oldest_user_turns() -> None:
+    """The oldest user turns are dropped whole until the prompt fits."""
+    assistant = GptHaAssistant("gpt-4o", "", "", [], None, CountingTokenCounter(), max_prompt_tokens=25)
+    chat_history = [
+        {"role": "user", "content": "1"},
+        {"role": "assistant", "content": "2"},
+        {"role": "user", "content": "3"},
+        {"role": "assistant", "content": "4"},
+    ]
+
+    assert assistant.crop_chat_history(chat_history, message_tokens=[10, 10, 10, 10]) == chat_history[2:]
+
+
+async def test_shared_assistant_keeps_concurrent_requests_apart() -> None:
+    """Concurrent requests on one assistant each send their own pattern prompt and history."""
+    sent = {}
+
+    async def create(**kwargs):
+        messages = kwargs["messages"]
+        user_text = messages[-1]["content"]
+        # 다른 요청이 끼어들 수 있도록 양보한 뒤 보낸 메시지를 기록
+        await asyncio.sleep(0.01)
+        sent[user_text] = messages
+        return SimpleNamespace(usage=None)
+
+    client = SimpleNamespace(chat=SimpleNamespace(completions=SimpleNamespace(create=create)))
+    assistant = GptHaAssistant("gpt-4o", "init prompt", "", [], client, CountingTokenCounter())
+
+    await asyncio.gather(
+        assistant.chat([{"role": "user", "content": "거실 불 켜줘"}], user_pattern_prompt="거실 패턴"),
+        assistant.chat([{"role": "user", "content": "안방 불 켜줘"}], user_pattern_prompt="안방 패턴"),
+    )
+
+    for user_text, pattern in (("거실 불 켜줘", "거실 패턴"), ("안방 불 켜줘", "안방 패턴")):
+        contents = [message["content"] for message in sent[user_text]]
+        assert contents == ["init prompt", pattern, user_text]
+
+
+def _peak_request_bytes(build_request) -> int:
+    """Return the peak memory traced while building one request, after a warm-up request."""
+    build_request()
+    tracemalloc.start()
+    build_request()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return peak
+
+
+def test_shared_assistant_allocates_less_per_request() -> None:
+    """Reusing the assistant and prompt generator allocates less per request than building them for each request."""
+    entities = [_entity(f"light.bench_{index}", f"조명 {index}", "off", "거실") for index in range(200)]
+    ha_contexts = {
+        "time": "12:00:00",
+        "date": "2026-01-01",
+        "weekday": "Thursday",
+        "entities": entities,
+        "entity_versions": {entity["entity_id"]: 0 for entity in entities},
+    }
+    services = [{"domain": "light", "services": {"turn_on": {"name": "turn_on", "description": "", "fields": {}}}}]
+    services_yaml = _full_dump(services)
+    services_catalog = ServicesCatalog(services, services_yaml, "hash")
+    init_prompt = "init prompt " * 2000
+    chat_history = [{"role": "user", "content": "거실 불 켜줘"}]
+    renderers = (EntitiesPromptRenderer(), EntitiesPromptRenderer(include_state=False))
+
+    def build_request(prompt_generator: PromptGenerator, assistant: GptHaAssistant) -> list[dict]:
+        messages = [
+            *chat_history,
+            prompt_generator.get_datetime_prompt(ha_contexts),
+            prompt_generator.get_entities_system_prompt(ha_contexts),
+            prompt_generator.get_services_system_prompt(services_catalog),
+        ]
+        return assistant.build_messages(messages, "patterns")
+
+    def per_request() -> list[dict]:
+        # 요청마다 생성기와 assistant를 새로 만들던 방식
+        prompt_generator = PromptGenerator(*renderers)
+        assistant = GptHaAssistant("gpt-4o", init_prompt, "", [prompt_generator.tool], None, CountingTokenCounter())
+        return build_request(prompt_generator, assistant)
+
+    shared_generator = PromptGenerator(*renderers)
+    shared_assistant = GptHaAssistant("gpt-4o", init_prompt, "", [shared_generator.tool], None, CountingTokenCounter())
+
+    def shared() -> list[dict]:
+        return build_request(shared_generator, shared_assistant)
+
+    assert [message["content"] for message in shared()] == [message["content"] for message in per_request()]
+    assert _peak_request_bytes(shared) < _peak_request_bytes(per_request)
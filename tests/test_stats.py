@@ -0,0 +1,40 @@
+"""Tests for the runtime statistics."""
+
+import asyncio
+
+from custom_components.openai_conversation_for_rs.stats import SpeculationStats, StatsPublisher
+
+
+async def test_notifications_are_coalesced() -> None:
+    """A burst of changes notifies at once and then once more after the interval."""
+    publisher = StatsPublisher(notify_interval=0.05)
+    calls = []
+    remove_listener = publisher.async_add_listener(lambda: calls.append(None))
+
+    for _ in range(5):
+        publisher._async_notify()
+    assert len(calls) == 1
+
+    await asyncio.sleep(0.2)
+    assert len(calls) == 2
+
+    # 리스너가 모두 제거되면 예약된 알림도 취소
+    publisher._async_notify()
+    publisher._async_notify()
+    assert len(calls) == 3
+    remove_listener()
+    await asyncio.sleep(0.2)
+    assert len(calls) == 3
+
+
+def test_hit_rates_keep_the_most_recent_speakers() -> None:
+    """Only the hit rates of the most recently looked up speakers are kept."""
+    stats = SpeculationStats(max_speakers=2)
+    stats.record_lookup("speaker_1", True)
+    stats.record_lookup("speaker_2", False)
+    stats.record_lookup("speaker_1", True)
+    stats.record_lookup("speaker_3", False)
+
+    assert stats.hit_rate("speaker_1") == 1.0
+    assert stats.hit_rate("speaker_2") is None
+    assert stats.hit_rate("speaker_3") == 0.0
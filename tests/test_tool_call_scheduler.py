@@ -0,0 +1,97 @@
+"""Tests for the concurrent tool call scheduler."""
+
+import asyncio
+from types import SimpleNamespace
+
+from homeassistant.core import HomeAssistant
+
+from custom_components.openai_conversation_for_rs.tool_call_scheduler import ToolCallScheduler
+
+
+class FakeApiHandler:
+    """Record when each service call starts and ends."""
+
+    def __init__(self, coalesce: bool = False):
+        """Initialize an empty event log."""
+        self.coalesce = coalesce
+        self.events: list[tuple[str, str]] = []
+
+    def service_batch_key(self, api_call):
+        """Group calls by endpoint when coalescing is enabled."""
+        if self.coalesce:
+            return (api_call.arguments.endpoint,)
+        return None
+
+    async def process_api_call(self, api_call):
+        """Log the start and end of a call."""
+        label = api_call.arguments.body["label"]
+        self.events.append(("start", label))
+        await asyncio.sleep(0.01)
+        self.events.append(("end", label))
+        return True
+
+    async def process_service_batch(self, api_calls):
+        """Log a coalesced call with the labels of its members."""
+        label = "+".join(api_call.arguments.body["label"] for api_call in api_calls)
+        self.events.append(("start", label))
+        await asyncio.sleep(0.01)
+        self.events.append(("end", label))
+        return True
+
+
+def _tool_call(call_id: str, entity_id: str, label: str, service: str = "turn_on") -> SimpleNamespace:
+    arguments = SimpleNamespace(endpoint=f"/api/services/light/{service}", body={"entity_id": entity_id, "label": label})
+    return SimpleNamespace(id=call_id, function=SimpleNamespace(arguments=arguments))
+
+
+async def test_calls_on_the_same_entity_are_chained(hass: HomeAssistant) -> None:
+    """Calls sharing an entity run in tool_call order, calls on other entities run alongside them."""
+    api_handler = FakeApiHandler()
+    scheduler = ToolCallScheduler(hass, api_handler)
+
+    results = await scheduler.async_run_all(
+        [
+            _tool_call("call_1", "light.a", "a on"),
+            _tool_call("call_2", "light.b", "b on"),
+            _tool_call("call_3", "light.a, light.c", "a dim"),
+        ]
+    )
+
+    assert [result.tool_call_id for result in results] == ["call_1", "call_2", "call_3"]
+    events = api_handler.events
+    assert events.index(("end", "a on")) < events.index(("start", "a dim"))
+    assert events.index(("start", "b on")) < events.index(("end", "a on"))
+    assert scheduler._entity_tails == {}
+
+
+async def test_streamed_and_pending_calls_share_the_chain(hass: HomeAssistant) -> None:
+    """A call submitted after a streamed call on the same entity waits for it."""
+    api_handler = FakeApiHandler()
+    scheduler = ToolCallScheduler(hass, api_handler)
+
+    streamed = scheduler.submit(_tool_call("call_1", "light.a", "a on"))
+    pending = scheduler.submit_all([_tool_call("call_2", "light.a", "a off")])
+    await scheduler.async_gather([streamed, *pending])
+
+    assert api_handler.events == [("start", "a on"), ("end", "a on"), ("start", "a off"), ("end", "a off")]
+
+
+async def test_calls_are_only_coalesced_across_unrelated_calls(hass: HomeAssistant) -> None:
+    """Calls with the same service are coalesced unless a call between them targets one of their entities."""
+    api_handler = FakeApiHandler(coalesce=True)
+    scheduler = ToolCallScheduler(hass, api_handler)
+
+    results = await scheduler.async_run_all(
+        [
+            _tool_call("call_1", "light.a", "a on"),
+            _tool_call("call_2", "light.b", "b off", service="turn_off"),
+            _tool_call("call_3", "light.c", "c on"),
+            _tool_call("call_4", "light.b", "b on"),
+        ]
+    )
+
+    assert [result.tool_call_id for result in results] == ["call_1", "call_2", "call_3", "call_4"]
+    events = api_handler.events
+    # light.b를 끄는 호출보다 먼저 켜지면 안 되므로 call_4는 묶이지 않음
+    assert ("start", "a on+c on") in events
+    assert events.index(("end", "b off")) < events.index(("start", "b on"))